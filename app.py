@@ -5,12 +5,68 @@ from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import pandas as pd
 import os
-from pipeline.prediction_pipeline import PredictionPipeline
-from pipeline.training_pipeline import TrainingPipeline
-from constants import APP_HOST, APP_PORT
-from uvicorn import run as app_run
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager, nullcontext
+from logger import logging, configure_logger
+from pipeline.prediction_pipeline import PredictionPipeline, get_inference_bundle, latest_trained_run_dir
+from pipeline.shadow_scoring import get_shadow_scorer
+from pipeline.feature_index import FeatureIndexNotReady, get_feature_index
+from pipeline.admission_control import AdmissionController, AdmissionRejected
+from pipeline.request_validator import get_request_validator
+from pipeline.model_versions import get_model_versions, UnknownModelVersion
+from pipeline.prediction_sink import get_prediction_sink
+from constants import (
+	APP_HOST, APP_PORT, SHADOW_MODE_ENABLED, FEATURE_INDEX_ENABLED, FEATURE_INDEX_MAX_IDS, ADMISSION_CONTROL_ENABLED,
+	MODEL_VERSIONS_ENABLED, MODEL_VERSION_HEADER, PREDICTION_SINK_ENABLED
+)
+
+# Set once the serving models are loaded and warmed up; /ready reports it to the load balancer
+readiness = {"ready": False, "error": None, "warmup_seconds": None}
+# Limits concurrent scoring and sheds requests that cannot meet their deadline
+admission = AdmissionController()
+
+
+def warm_up():
+	"""Loads the bundles /predict will use and scores warm-up batches through them."""
+	start = time.perf_counter()
+	try:
+		if SHADOW_MODE_ENABLED:
+			scorer = get_shadow_scorer()
+			bundles = [b for b in (scorer.champion, scorer.challenger) if b is not None]
+		else:
+			bundles = [get_inference_bundle(latest_trained_run_dir())]
+		for bundle in bundles:
+			bundle.warm_up()
+		if FEATURE_INDEX_ENABLED:
+			try:
+				get_feature_index().refresh(bundles[0])
+			except Exception as e:
+				# /predict does not need the index; /predict/by-id retries building it
+				logging.warning(f"Feature index not built during warm-up: {e}")
+		readiness.update(ready=True, error=None, warmup_seconds=round(time.perf_counter() - start, 3))
+	except Exception as e:
+		logging.error(f"Warm-up failed; not ready: {e}")
+		readiness.update(ready=False, error=str(e))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	# Log through the background listener thread while serving
+	configure_logger()
+	# Warm up in the background so /ready can answer "not ready" meanwhile
+	task = asyncio.create_task(asyncio.to_thread(warm_up))
+	if PREDICTION_SINK_ENABLED:
+		get_prediction_sink()
+	yield
+	task.cancel()
+	if PREDICTION_SINK_ENABLED:
+		# Writes (or spills) the predictions still buffered
+		await asyncio.to_thread(get_prediction_sink().stop)
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
 	CORSMiddleware,
 	allow_origins=["*"],
@@ -33,19 +89,115 @@ def about(request: Request):
 @app.get("/train")
 def train(request: Request):
 	try:
+		# Imported on first use: serving replicas never load the training/MongoDB stack
+		from pipeline.training_pipeline import TrainingPipeline
 		pipeline = TrainingPipeline()
 		pipeline.run()
+		if not readiness["ready"]:
+			# A fresh deployment had nothing to serve until this run
+			warm_up()
 		return templates.TemplateResponse("train.html", {"request": request, "message": "Training completed successfully."})
 	except Exception as e:
 		return templates.TemplateResponse("train.html", {"request": request, "message": f"Training failed: {e}"})
 
+@app.get("/ready")
+def ready():
+	status_code = 200 if readiness["ready"] else 503
+	return JSONResponse(content=readiness, status_code=status_code)
+
 @app.get("/predict")
 def predict_page(request: Request):
 	return templates.TemplateResponse("predict.html", {"request": request})
 
 
+def admitted(request: Request, rows: int):
+	"""Admission control slot for scoring this many rows (a no-op when disabled)."""
+	if not ADMISSION_CONTROL_ENABLED:
+		return nullcontext()
+	try:
+		deadline = float(request.headers["X-Request-Deadline-Ms"]) / 1000
+	except (KeyError, ValueError):
+		deadline = None
+	if deadline is not None and math.isnan(deadline):
+		deadline = None
+	return admission.admit(rows, deadline)
+
+
+def serving_run_id() -> str:
+	"""Run answering requests that do not ask for a version."""
+	if SHADOW_MODE_ENABLED:
+		return get_shadow_scorer().champion.run_id
+	return os.path.basename(latest_trained_run_dir())
+
+
+def score_rows(df: pd.DataFrame, explain: bool, version: str = None, request_df: pd.DataFrame = None) -> dict:
+	# request_df: the caller's rows behind df, recorded with their id and any fields outside the schema
+	if version is not None:
+		# A pinned run chosen by the caller; not shadowed
+		versions = get_model_versions()
+		if explain:
+			preds, explanations = versions.predict_explain(version, df)
+			content = {
+				"version": version,
+				"predictions": preds,
+				"explanations": explanations,
+				"explain_truncated": len(explanations) < len(preds),
+			}
+		else:
+			content = {"version": version, "predictions": versions.predict(version, df)}
+	elif explain:
+		# Feature contributions for the first EXPLAIN_MAX_ROWS rows
+		if SHADOW_MODE_ENABLED:
+			preds, explanations = get_shadow_scorer().predict_explain(df)
+		else:
+			preds, explanations = PredictionPipeline().explain_from_df(df)
+		content = {
+			"predictions": preds,
+			"explanations": explanations,
+			"explain_truncated": len(explanations) < len(preds),
+		}
+	elif SHADOW_MODE_ENABLED:
+		# Champion answers; the challenger scores the same rows in the background
+		content = {"predictions": get_shadow_scorer().predict(df)}
+	else:
+		pipeline = PredictionPipeline()
+		content = {"predictions": pipeline.predict_from_df(df)}
+	if PREDICTION_SINK_ENABLED:
+		# Buffered here; written to MongoDB by the sink's background thread
+		recorded_df = df if request_df is None else request_df
+		get_prediction_sink().record(recorded_df, content["predictions"], version or serving_run_id(), "predict")
+	return content
+
+
+def score_ids(ids: list) -> dict:
+	# Same model as /predict: the champion in shadow mode, else the latest trained run
+	bundle = get_shadow_scorer().champion if SHADOW_MODE_ENABLED else get_inference_bundle(latest_trained_run_dir())
+	# Until the index catches up with a new champion, the previous one scores from its rows
+	preds, missing, model_run_id = get_feature_index().predict(ids, bundle)
+	if PREDICTION_SINK_ENABLED:
+		get_prediction_sink().record(pd.DataFrame({"id": ids}), preds, model_run_id, "predict_by_id")
+	return {"ids": ids, "predictions": preds, "missing": missing}
+
+
+def rejected(e: AdmissionRejected) -> JSONResponse:
+	return JSONResponse(content={"error": str(e)}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+
+
 @app.post("/predict")
-async def predict(request: Request):
+async def predict(request: Request, explain: bool = False):
+	# Callers pinned to a run name it in the header; otherwise the default model answers
+	version = request.headers.get(MODEL_VERSION_HEADER) if MODEL_VERSIONS_ENABLED else None
+	return await predict_rows(request, explain, version)
+
+
+@app.post("/models/{version}/predict")
+async def predict_version(request: Request, version: str, explain: bool = False):
+	if not MODEL_VERSIONS_ENABLED:
+		return JSONResponse(content={"error": "Serving by model version is disabled."}, status_code=404)
+	return await predict_rows(request, explain, version)
+
+
+async def predict_rows(request: Request, explain: bool, version: str = None):
 	try:
 		data = await request.json()
 		# Accept both single dict and list of dicts for batch prediction
@@ -56,13 +208,143 @@ async def predict(request: Request):
 		else:
 			return JSONResponse(content={"error": "Invalid input format. Must be dict or list of dicts."}, status_code=400)
 
-		pipeline = PredictionPipeline()
-		preds = pipeline.predict_from_df(df)
-		return JSONResponse(content={"predictions": preds})
+		# Invalid rows are rejected here, before admission and before any encoding or scoring
+		valid_df, valid_rows, errors, error_count = get_request_validator().validate(df)
+		if not valid_rows:
+			return JSONResponse(content={"error": "No valid rows to score.", "errors": errors,
+										 "error_count": error_count}, status_code=422)
+
+		# Scoring runs on a worker thread once admitted, so the event loop keeps accepting and shedding
+		async with admitted(request, len(valid_df)):
+			request_df = df.iloc[valid_rows].reset_index(drop=True)
+			content = await asyncio.to_thread(score_rows, valid_df, explain, version, request_df)
+		if errors:
+			# Align with the request: rejected rows get None and are described in "errors"
+			predictions = [None] * len(df)
+			for row, prediction in zip(valid_rows, content["predictions"]):
+				predictions[row] = prediction
+			content["predictions"] = predictions
+			content["errors"] = errors
+			content["error_count"] = error_count
+		if explain:
+			for row, explanation in zip(valid_rows, content["explanations"]):
+				explanation["row"] = row
+		return JSONResponse(content=content)
+	except AdmissionRejected as e:
+		return rejected(e)
+	except UnknownModelVersion as e:
+		return JSONResponse(content={"error": str(e)}, status_code=404)
+	except ValueError as e:
+		return JSONResponse(content={"error": str(e)}, status_code=400)
+	except Exception as e:
+		return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.post("/predict/by-id")
+async def predict_by_id(request: Request):
+	"""Scores customers already ingested, from their pre-encoded rows in the feature index."""
+	if not FEATURE_INDEX_ENABLED:
+		return JSONResponse(content={"error": "Scoring by id is disabled."}, status_code=404)
+	try:
+		data = await request.json()
+		# Accept {"id": 1}, {"ids": [1, 2]} or a bare list of ids
+		if isinstance(data, dict):
+			ids = data.get("ids", [data["id"]] if "id" in data else None)
+		else:
+			ids = data
+		if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+			return JSONResponse(content={"error": "Invalid input format. Must be an id or a non-empty list of integer ids."}, status_code=400)
+		if len(ids) > FEATURE_INDEX_MAX_IDS:
+			return JSONResponse(content={"error": f"At most {FEATURE_INDEX_MAX_IDS} ids per request."}, status_code=400)
+
+		async with admitted(request, len(ids)):
+			content = await asyncio.to_thread(score_ids, ids)
+		return JSONResponse(content=content)
+	except AdmissionRejected as e:
+		return rejected(e)
+	except FeatureIndexNotReady as e:
+		return JSONResponse(content={"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+	except Exception as e:
+		return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.get("/metrics")
+async def metrics():
+	"""Admission control state: in-flight and queued requests, shed counts, queue wait."""
+	# On the event loop, like every change to the admission state, so the snapshot is consistent
+	if not ADMISSION_CONTROL_ENABLED:
+		return JSONResponse(content={"error": "Admission control is disabled."}, status_code=404)
+	return JSONResponse(content=admission.stats())
+
+
+@app.get("/models")
+def models():
+	"""Resident model versions with their pinning, size, usage and latency."""
+	if not MODEL_VERSIONS_ENABLED:
+		return JSONResponse(content={"error": "Serving by model version is disabled."}, status_code=404)
+	try:
+		return JSONResponse(content=get_model_versions().stats())
+	except Exception as e:
+		return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.post("/models/{version}/pin")
+def pin_model(version: str):
+	"""Keeps a run resident and out of artifact garbage collection until unpinned."""
+	if not MODEL_VERSIONS_ENABLED:
+		return JSONResponse(content={"error": "Serving by model version is disabled."}, status_code=404)
+	try:
+		get_model_versions().pin(version)
+		return JSONResponse(content={"pinned": version})
+	except UnknownModelVersion as e:
+		return JSONResponse(content={"error": str(e)}, status_code=404)
+	except Exception as e:
+		return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.delete("/models/{version}/pin")
+def unpin_model(version: str):
+	if not MODEL_VERSIONS_ENABLED:
+		return JSONResponse(content={"error": "Serving by model version is disabled."}, status_code=404)
+	try:
+		get_model_versions().unpin(version)
+		return JSONResponse(content={"unpinned": version})
+	except Exception as e:
+		return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.get("/prediction-sink/stats")
+def prediction_sink_stats():
+	"""Rows buffered, written to MongoDB, spilled to disk and replayed."""
+	if not PREDICTION_SINK_ENABLED:
+		return JSONResponse(content={"error": "Prediction write-back is disabled."}, status_code=404)
+	return JSONResponse(content=get_prediction_sink().stats())
+
+
+@app.get("/shadow/stats")
+def shadow_stats():
+	if not SHADOW_MODE_ENABLED:
+		return JSONResponse(content={"error": "Shadow scoring is disabled."}, status_code=404)
+	try:
+		return JSONResponse(content=get_shadow_scorer().stats())
+	except Exception as e:
+		return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.post("/shadow/promote")
+def shadow_promote():
+	if not SHADOW_MODE_ENABLED:
+		return JSONResponse(content={"error": "Shadow scoring is disabled."}, status_code=404)
+	try:
+		run_id = get_shadow_scorer().promote()
+		return JSONResponse(content={"champion": run_id})
+	except ValueError as e:
+		return JSONResponse(content={"error": str(e)}, status_code=409)
 	except Exception as e:
 		return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
 
 if __name__ == "__main__":
+	from uvicorn import run as app_run
 	app_run(app, host=APP_HOST, port=APP_PORT)
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Measures the cost of explain mode against plain prediction.
+
+For each batch size, scores rows from the run's test split with InferenceBundle.predict and
+with InferenceBundle.predict_explain (both including the input transformations) and reports
+the median latency of each and their ratio.
+
+Usage: python -m benchmarks.explain_overhead [--batch-sizes 1 10 100] [--run-dir artifacts/<run_id>]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import yaml
+
+from pipeline.prediction_pipeline import get_inference_bundle, latest_trained_run_dir
+from utils.blob_store import read_csv
+
+
+def _median_ms(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-dir", default=None, help="Run directory (default: latest trained run)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--output", default=None, help="Optional YAML file for the results")
+    args = parser.parse_args()
+
+    run_dir = args.run_dir or latest_trained_run_dir()
+    bundle = get_inference_bundle(run_dir)
+    test_df = read_csv(os.path.join(run_dir, "dataingestion", "split", "test", "test.csv"))
+    test_df = test_df.drop(columns=[bundle._dt._schema_config.get("target_column")], errors="ignore")
+    # Builds the explainer (and loads the full forest if a compact model is served) up front
+    bundle.predict_explain(test_df.head(1))
+
+    results = {}
+    for size in args.batch_sizes:
+        batch = test_df.iloc[np.arange(size) % len(test_df)]
+        predict_ms = _median_ms(lambda: bundle.predict(batch), args.repeats)
+        explain_ms = _median_ms(lambda: bundle.predict_explain(batch, max_rows=size), args.repeats)
+        results[size] = {
+            "predict_ms": round(predict_ms, 3),
+            "predict_explain_ms": round(explain_ms, 3),
+            "overhead_ratio": round(explain_ms / predict_ms, 2),
+        }
+        print(f"batch {size}: {results[size]}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            yaml.dump({"run_dir": run_dir, "model": type(bundle.model).__name__, "results": results}, f, sort_keys=False)
+
+
+if __name__ == "__main__":
+    main()
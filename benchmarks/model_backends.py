@@ -0,0 +1,82 @@
+"""
+Compares the registered model backends on the latest run's transformed data.
+
+Reports fit time, single-row and batch predict latency, pickled model size and test
+accuracy/ROC-AUC per backend.
+
+Usage: python -m benchmarks.model_backends [--backends random_forest hist_gradient_boosting]
+"""
+import argparse
+import io
+import os
+import time
+
+import joblib
+import numpy as np
+import yaml
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+from components.model_backends import MODEL_BACKENDS, get_model_backend
+from utils.artifact_registry import ArtifactRegistry
+
+
+def _median_seconds(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def benchmark_backend(name: str, X_train, y_train, X_test, y_test, batch_size: int, repeats: int) -> dict:
+    model = get_model_backend(name).build()
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+
+    single_row = X_test[:1]
+    batch = X_test[:batch_size]
+    proba = model.predict_proba(X_test)[:, 1]
+    return {
+        "fit_seconds": round(fit_seconds, 4),
+        "predict_1_row_ms": round(_median_seconds(lambda: model.predict(single_row), repeats) * 1e3, 3),
+        f"predict_{len(batch)}_rows_ms": round(_median_seconds(lambda: model.predict(batch), repeats) * 1e3, 3),
+        "model_size_bytes": buffer.getbuffer().nbytes,
+        "accuracy": round(float(accuracy_score(y_test, proba >= 0.5)), 6),
+        "roc_auc": round(float(roc_auc_score(y_test, proba)), 6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-dir", default=None, help="Run directory (default: latest under artifacts/)")
+    parser.add_argument("--backends", nargs="+", default=sorted(MODEL_BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default=None, help="Optional YAML file for the results")
+    args = parser.parse_args()
+
+    run_dir = args.run_dir or ArtifactRegistry().latest_run_dir("data_transformation")
+    transformation_dir = os.path.join(run_dir, "data_transformation")
+    train_arr = np.load(os.path.join(transformation_dir, "train.npy"))
+    test_arr = np.load(os.path.join(transformation_dir, "test.npy"))
+    X_train = np.ascontiguousarray(train_arr[:, :-1], dtype=np.float32)
+    X_test = np.ascontiguousarray(test_arr[:, :-1], dtype=np.float32)
+    y_train, y_test = train_arr[:, -1], test_arr[:, -1]
+
+    results = {}
+    for name in args.backends:
+        results[name] = benchmark_backend(name, X_train, y_train, X_test, y_test, args.batch_size, args.repeats)
+        print(f"{name}: {results[name]}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            yaml.dump({"run_dir": run_dir, "train_rows": int(len(y_train)), "results": results}, f, sort_keys=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures single-request prediction latency under the logging configurations.
+
+Scores one-row requests with the latest trained run's InferenceBundle (what /predict does)
+with logging written synchronously on the request thread, through the QueueListener thread,
+and queued with hot-path sampling. Reports mean/p50/p95/p99 latency per mode.
+
+The console handler writes to stderr; redirect it (2>/dev/null or to a file) so the numbers
+reflect the logging setup rather than terminal rendering.
+
+Usage: python -m benchmarks.predict_logging [--requests 2000] [--run-dir artifacts/<run_id>]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import yaml
+
+import logger
+from pipeline.prediction_pipeline import get_inference_bundle, latest_trained_run_dir
+from utils.blob_store import read_csv
+
+MODES = {
+    "sync": dict(queued=False, sample_hot_path=False),
+    "queued": dict(queued=True, sample_hot_path=False),
+    "queued_sampled": dict(queued=True, sample_hot_path=True),
+}
+
+
+def benchmark_mode(bundle, rows: list, warmup: int) -> dict:
+    for row in rows[:warmup]:
+        bundle.predict(row)
+    timings = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        bundle.predict(row)
+        timings[i] = time.perf_counter() - start
+    timings *= 1e3
+    return {
+        "mean_ms": round(float(timings.mean()), 4),
+        "p50_ms": round(float(np.percentile(timings, 50)), 4),
+        "p95_ms": round(float(np.percentile(timings, 95)), 4),
+        "p99_ms": round(float(np.percentile(timings, 99)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-dir", default=None, help="Run directory (default: latest trained run)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--output", default=None, help="Optional YAML file for the results")
+    args = parser.parse_args()
+
+    run_dir = args.run_dir or latest_trained_run_dir()
+    bundle = get_inference_bundle(run_dir)
+    test_df = read_csv(os.path.join(run_dir, "dataingestion", "split", "test", "test.csv"))
+    test_df = test_df.drop(columns=[bundle._dt._schema_config.get("target_column")], errors="ignore")
+    rows = [test_df.iloc[[i % len(test_df)]] for i in range(args.requests)]
+
+    results = {}
+    for mode in args.modes:
+        logger.configure_logger(**MODES[mode])
+        results[mode] = benchmark_mode(bundle, rows, args.warmup)
+    logger.configure_logger()
+    for mode, result in results.items():
+        print(f"{mode}: {result}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            yaml.dump({"run_dir": run_dir, "requests": args.requests, "results": results}, f, sort_keys=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+End-to-end scale benchmark: the training pipeline and batch scoring at several row counts.
+
+For each scale a fresh interpreter, working in its own directory under --workdir (so the
+benchmark runs never become the latest or promoted run of the real artifacts/), generates
+synthetic schema.yaml data (utils/synthetic_data.py), runs TrainingPipeline on it and scores
+the test split in batches. Per stage it reports wall time, CPU time, peak memory and rows from
+the run's run_profile.yaml, plus the scaling exponent between consecutive scales (1.0 is
+linear; clearly above 1 is where a stage stops scaling).
+
+With --baseline (the --output of an earlier run) every stage whose wall time grew by more
+than --tolerance at the same scale is reported as a regression and the exit code is 1.
+
+Usage: python -m benchmarks.scale_benchmark [--rows 100000 1000000 10000000] [--source file|mongo]
+           [--baseline previous.yaml] [--output results.yaml]
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Wall-time differences below this many seconds are noise, not regressions
+MIN_REGRESSION_SECONDS = 1.0
+
+
+def run_scale(rows: int, positive_ratio: float, source: str, score_batch: int) -> dict:
+    """Runs inside the per-scale interpreter, with the scale's working directory as cwd."""
+    import numpy as np
+
+    from utils.synthetic_data import SyntheticDataGenerator
+    from utils.run_profiler import RunProfiler
+    from pipeline.training_pipeline import TrainingPipeline
+    from pipeline.prediction_pipeline import get_inference_bundle
+    from utils.blob_store import read_csv
+
+    generator = SyntheticDataGenerator(positive_ratio=positive_ratio)
+    start = time.perf_counter()
+    if source == "mongo":
+        generator.load_mongo(rows)
+        source_path = None
+    else:
+        source_path = generator.write_csv(os.path.join("data", "synthetic.csv"), rows)
+    generate_seconds = time.perf_counter() - start
+
+    pipeline = TrainingPipeline(run_id=f"scale_{rows}", source_path=source_path)
+    pipeline.run()
+
+    bundle = get_inference_bundle(pipeline.run_dir)
+    test_path = os.path.join(pipeline.run_dir, "dataingestion", "split", "test", "test.csv")
+    test_df = read_csv(test_path).drop(columns=[generator.target_column])
+    with RunProfiler(pipeline.run_dir).profile("batch_scoring", rows=len(test_df)):
+        for offset in range(0, len(test_df), score_batch):
+            bundle.predict(test_df.iloc[offset:offset + score_batch])
+
+    with open(os.path.join(pipeline.run_dir, "run_profile.yaml")) as f:
+        profile = yaml.safe_load(f)
+    stages = {
+        stage: {key: entry[key] for key in ("wall_seconds", "cpu_seconds", "peak_rss_mb", "worker_max_rss_mb", "rows")}
+        for stage, entry in profile["stages"].items()
+    }
+    return {
+        "generate_seconds": round(generate_seconds, 3),
+        "stages": stages,
+        "total_wall_seconds": round(float(np.sum([s["wall_seconds"] for s in stages.values()])), 3),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def scaling_exponents(results: dict) -> dict:
+    """log(t2 / t1) / log(n2 / n1) per stage between consecutive scales."""
+    exponents = {}
+    scales = sorted(results)
+    for small, large in zip(scales, scales[1:]):
+        for stage, entry in results[large]["stages"].items():
+            before = results[small]["stages"].get(stage)
+            if before and before["wall_seconds"] > 0 and entry["wall_seconds"] > 0:
+                exponent = math.log(entry["wall_seconds"] / before["wall_seconds"]) / math.log(large / small)
+                exponents.setdefault(stage, {})[f"{small}->{large}"] = round(exponent, 2)
+    return exponents
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for rows, result in results.items():
+        previous = baseline.get(rows)
+        if not previous:
+            continue
+        for stage, entry in result["stages"].items():
+            before = previous["stages"].get(stage)
+            if not before:
+                continue
+            now, then = entry["wall_seconds"], before["wall_seconds"]
+            if now > then * (1 + tolerance) and now - then > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{stage} at {rows} rows: {then}s -> {now}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--positive-ratio", type=float, default=0.123)
+    parser.add_argument("--source", choices=["file", "mongo"], default="file",
+                        help="ingest from a generated CSV, or load the rows into MongoDB first "
+                             "(CONNECTION_URL/DB_NAME/COLLECTION_NAME; MONGODB_TLS=false for a local mongod)")
+    parser.add_argument("--score-batch", type=int, default=10_000, help="rows per batch scoring call")
+    parser.add_argument("--workdir", default=os.path.join("benchmarks", "_scale_runs"))
+    parser.add_argument("--keep", action="store_true", help="keep the per-scale working directories")
+    parser.add_argument("--baseline", default=None, help="earlier --output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed wall-time growth per stage")
+    parser.add_argument("--output", default=None, help="Optional YAML file for the results")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_scale(args.worker, args.positive_ratio, args.source, args.score_batch)))
+        return
+
+    results = {}
+    for rows in sorted(args.rows):
+        scale_dir = os.path.abspath(os.path.join(args.workdir, str(rows)))
+        shutil.rmtree(scale_dir, ignore_errors=True)
+        os.makedirs(scale_dir)
+        shutil.copy(os.path.join(REPO_ROOT, "schema.yaml"), scale_dir)
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.scale_benchmark", "--worker", str(rows),
+             "--positive-ratio", str(args.positive_ratio), "--source", args.source,
+             "--score-batch", str(args.score_batch)],
+            cwd=scale_dir, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")]))},
+        )
+        if completed.returncode != 0:
+            # Running out of memory or time at a scale is a result too: record it and stop there
+            results[rows] = {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else
+                             f"exit code {completed.returncode}"}
+            print(f"{rows} rows: failed ({results[rows]['error']})")
+            break
+        results[rows] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{rows} rows: {results[rows]['total_wall_seconds']}s, max RSS {results[rows]['max_rss_mb']} MB")
+        for stage, entry in results[rows]["stages"].items():
+            print(f"  {stage}: {entry}")
+        if not args.keep:
+            shutil.rmtree(scale_dir, ignore_errors=True)
+
+    finished = {rows: result for rows, result in results.items() if "error" not in result}
+    exponents = scaling_exponents(finished)
+    if exponents:
+        print(yaml.safe_dump({"scaling_exponents": exponents}, sort_keys=False))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = (yaml.safe_load(f) or {}).get("results", {})
+        regressions = find_regressions(finished, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            yaml.dump({
+                "rows": sorted(args.rows), "source": args.source, "score_batch": args.score_batch,
+                "results": results, "scaling_exponents": exponents, "regressions": regressions,
+            }, f, sort_keys=False)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
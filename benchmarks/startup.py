@@ -0,0 +1,77 @@
+"""
+Measures serving replica cold start.
+
+Each repeat starts a fresh interpreter that imports app (import time), then scores one row
+the way POST /predict does (time to first prediction, which includes loading the model and
+preprocessor). Also reports whether training-only modules (pymongo, imblearn, the training
+pipeline) were loaded on the serving path, which they should not be.
+
+Usage: python -m benchmarks.startup [--repeats 5] [--run-dir artifacts/<run_id>]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import yaml
+
+from pipeline.prediction_pipeline import latest_trained_run_dir
+
+TRAINING_MODULES = ("pymongo", "imblearn", "dotenv", "pipeline.training_pipeline", "components.data_ingestion")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from constants import SHADOW_MODE_ENABLED
+from utils.blob_store import read_csv
+df = read_csv(sys.argv[1]).head(1)
+if SHADOW_MODE_ENABLED:
+    preds = app.get_shadow_scorer().predict(df)
+else:
+    preds = app.PredictionPipeline().predict_from_df(df)
+predicted = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "first_prediction_seconds": predicted - start,
+    "training_modules_loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def run_probe(row_path: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE % (TRAINING_MODULES,), row_path],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-dir", default=None, help="Run whose test split provides the request row")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Optional YAML file for the results")
+    args = parser.parse_args()
+
+    run_dir = args.run_dir or latest_trained_run_dir()
+    row_path = os.path.join(run_dir, "dataingestion", "split", "test", "test.csv")
+    probes = [run_probe(row_path) for _ in range(args.repeats)]
+
+    results = {}
+    for key in ("import_seconds", "first_prediction_seconds"):
+        values = np.array([p[key] for p in probes])
+        results[key] = {"median": round(float(np.median(values)), 4), "max": round(float(values.max()), 4)}
+    results["training_modules_loaded"] = sorted({m for p in probes for m in p["training_modules_loaded"]})
+    print(yaml.safe_dump(results, sort_keys=False))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            yaml.dump({"run_dir": run_dir, "repeats": args.repeats, "results": results}, f, sort_keys=False)
+
+
+if __name__ == "__main__":
+    main()
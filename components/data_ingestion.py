@@ -6,7 +6,12 @@ import pandas as pd
 from sklearn.model_selection import train_test_split
 from exception import MyException
 from dotenv import load_dotenv
-from constants import train_test_split_ratio
+from constants import (
+	train_test_split_ratio, train_test_split_random_state, DATA_INGESTION_SORT_COLUMN,
+	DATA_INGESTION_SPLIT_HASH_COLUMN
+)
+from utils.artifact_registry import ArtifactRegistry
+from utils.blob_store import BlobStore
 
 load_dotenv()
 
@@ -14,31 +19,55 @@ load_dotenv()
 import datetime
 
 class DataIngestion:
-	def __init__(self):
+	def __init__(self, run_id: str = None, source_path: str = None):
 		self.collection_name = os.getenv("COLLECTION_NAME")
+		# A CSV file read instead of the MongoDB collection (e.g. utils/synthetic_data.py output)
+		self.source_path = source_path or os.getenv("DATA_SOURCE_FILE")
 		self.train_test_split_ratio = train_test_split_ratio
-		self.timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+		self.timestamp = run_id or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 		self.base_dir = os.path.join("artifacts", self.timestamp, "dataingestion")
+		self.blob_store = BlobStore()
 
 	def fetch_and_save_raw_data(self) -> pd.DataFrame:
 		try:
-			logging.info(f"Fetching data from MongoDB collection: {self.collection_name}")
-			data_access = DataAccess()
-			df = data_access.fetch_data(collection_name=self.collection_name)
+			if self.source_path:
+				logging.info(f"Reading data from file: {self.source_path}")
+				df = pd.read_csv(self.source_path)
+			else:
+				logging.info(f"Fetching data from MongoDB collection: {self.collection_name}")
+				data_access = DataAccess()
+				df = data_access.fetch_data(collection_name=self.collection_name)
 			logging.info(f"Fetched data shape: {df.shape}")
+			if DATA_INGESTION_SORT_COLUMN in df.columns:
+				df = df.sort_values(DATA_INGESTION_SORT_COLUMN, kind="stable", ignore_index=True)
 			raw_dir = os.path.join(self.base_dir, "raw")
 			os.makedirs(raw_dir, exist_ok=True)
 			raw_file_path = os.path.join(raw_dir, "raw_data.csv")
-			df.to_csv(raw_file_path, index=False, header=True)
+			self.blob_store.save_csv(df, raw_file_path)
 			logging.info(f"Raw data saved to {raw_file_path}")
 			return df
 		except Exception as e:
 			logging.error(f"Error in fetch_and_save_raw_data: {e}")
 			raise MyException(e, sys)
 
+	def hash_split(self, df: pd.DataFrame, column: str) -> tuple:
+		"""Puts a row in test when the hash of its column value falls in the lowest split ratio of buckets."""
+		# hash_pandas_object uses a fixed key, so an id hashes the same in every run and process
+		buckets = pd.util.hash_pandas_object(df[column], index=False).to_numpy() % 10000
+		is_test = buckets < round(self.train_test_split_ratio * 10000)
+		return df[~is_test], df[is_test]
+
 	def split_and_save_train_test(self, df: pd.DataFrame):
 		try:
-			train_set, test_set = train_test_split(df, test_size=self.train_test_split_ratio)
+			if DATA_INGESTION_SPLIT_HASH_COLUMN in df.columns:
+				train_set, test_set = self.hash_split(df, DATA_INGESTION_SPLIT_HASH_COLUMN)
+				logging.info(f"Split {len(df)} rows by the hash of {DATA_INGESTION_SPLIT_HASH_COLUMN}")
+			else:
+				logging.warning(f"No {DATA_INGESTION_SPLIT_HASH_COLUMN} column to split by: rows may change sides "
+								f"between runs, so incremental training can be scored on rows it was fitted on")
+				train_set, test_set = train_test_split(
+					df, test_size=self.train_test_split_ratio, random_state=train_test_split_random_state
+				)
 			split_dir = os.path.join(self.base_dir, "split")
 			train_dir = os.path.join(split_dir, "train")
 			test_dir = os.path.join(split_dir, "test")
@@ -46,8 +75,8 @@ class DataIngestion:
 			os.makedirs(test_dir, exist_ok=True)
 			train_file_path = os.path.join(train_dir, "train.csv")
 			test_file_path = os.path.join(test_dir, "test.csv")
-			train_set.to_csv(train_file_path, index=False, header=True)
-			test_set.to_csv(test_file_path, index=False, header=True)
+			self.blob_store.save_csv(train_set, train_file_path)
+			self.blob_store.save_csv(test_set, test_file_path)
 			logging.info(f"Train data saved to {train_file_path}")
 			logging.info(f"Test data saved to {test_file_path}")
 		except Exception as e:
@@ -55,6 +84,7 @@ class DataIngestion:
 			raise MyException(e, sys)
 
 	def run(self):
+		ArtifactRegistry().register_run(self.timestamp)
 		df = self.fetch_and_save_raw_data()
 		self.split_and_save_train_test(df)
     
@@ -1,5 +1,7 @@
 import os
 import sys
+import joblib
+import yaml
 import numpy as np
 import pandas as pd
 from logger import logging
@@ -8,14 +10,25 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.compose import ColumnTransformer
 from utils.main_utils import read_yaml_file
+from utils.artifact_registry import ArtifactRegistry
+from utils.blob_store import BlobStore, output_exists, read_csv
+from components.model_backends import previous_trained_run_dir
+from constants import MODEL_TRAINER_TRAINING_MODE, MODEL_TRAINER_BACKEND
 
 
 class DataTransformation:
-    def __init__(self):
+    def __init__(self, run_dir: str = None, training_mode: str = MODEL_TRAINER_TRAINING_MODE):
         """
-        Loads train and test DataFrames from the latest timestamped artifacts directory.
+        Loads train and test DataFrames from the latest timestamped artifacts directory
+        (or from run_dir when given).
         Also loads the schema configuration once and stores it on the instance.
+        In "incremental" training mode the previous model's fitted preprocessor is reused
+        instead of refitted, so the trees grown on top of that model see features on its scale.
         """
+        self.run_dir = run_dir
+        self.training_mode = training_mode
+        # Levels of each categorical column in the training data; None encodes whatever values appear
+        self.category_levels = None
 
     def prepare_data_transformation(self):
         try:
@@ -31,13 +44,8 @@ class DataTransformation:
                 logging.error("Artifacts directory not found.")
                 raise FileNotFoundError("Artifacts directory not found.")
 
-            timestamps = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
-            if not timestamps:
-                logging.error("No timestamped directories found in artifacts.")
-                raise FileNotFoundError("No timestamped directories found in artifacts.")
-
-            latest_timestamp = sorted(timestamps)[-1]
-            artifact_dir = os.path.join(base_dir, latest_timestamp)
+            artifact_dir = self.run_dir or ArtifactRegistry(base_dir).latest_run_dir()
+            self.artifact_dir = artifact_dir
             split_dir = os.path.join(artifact_dir, "dataingestion", "split")
             train_path = os.path.join(split_dir, "train", "train.csv")
             test_path = os.path.join(split_dir, "test", "test.csv")
@@ -45,12 +53,12 @@ class DataTransformation:
             logging.info(f"Loading train data from: {train_path}")
             logging.info(f"Loading test data from: {test_path}")
 
-            if not os.path.exists(train_path) or not os.path.exists(test_path):
+            if not output_exists(train_path) or not output_exists(test_path):
                 logging.error("Train or test CSV file not found in latest split directory.")
                 raise FileNotFoundError("Train or test CSV file not found in latest split directory.")
 
-            self.train_df = pd.read_csv(train_path)
-            self.test_df = pd.read_csv(test_path)
+            self.train_df = read_csv(train_path)
+            self.test_df = read_csv(test_path)
 
             logging.info(f"Train data shape: {self.train_df.shape}")
             logging.info(f"Test data shape: {self.test_df.shape}")
@@ -99,6 +107,26 @@ class DataTransformation:
             logging.exception("Exception occurred in get_data_transformer_object")
             raise MyException(e, sys) from e
 
+    def _previous_preprocessor(self):
+        """
+        Returns (preprocessor, report) of the run whose model incremental training will grow, or
+        (None, None) when there is none or it predates saved preprocessors.
+        """
+        previous_run_dir = previous_trained_run_dir(self.artifact_dir, MODEL_TRAINER_BACKEND)
+        if previous_run_dir is None:
+            return None, None
+        transformation_dir = os.path.join(previous_run_dir, "data_transformation")
+        preprocessor_path = os.path.join(transformation_dir, "preprocessor.pkl")
+        report_path = os.path.join(transformation_dir, "data_transformation_report.yaml")
+        if not os.path.exists(preprocessor_path) or not os.path.exists(report_path):
+            return None, None
+        with open(report_path) as f:
+            report = yaml.safe_load(f) or {}
+        if not report.get("input_columns"):
+            return None, None
+        logging.info(f"Reusing the fitted preprocessor of {previous_run_dir} for incremental training")
+        return joblib.load(preprocessor_path), report
+
     def _map_gender_column(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Map Gender column to 0 for Female and 1 for Male.
@@ -122,8 +150,17 @@ class DataTransformation:
         return df
 
     def _create_dummy_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create dummy variables for categorical features (drop_first=True)."""
+        """
+        Create dummy variables for categorical features (drop_first=True).
+        With category_levels set, the columns are fixed to the training levels, so a batch
+        that holds only some of the values (a single row) is encoded the same way.
+        """
         logging.info("Creating dummy variables for categorical features")
+        if self.category_levels:
+            df = df.assign(**{
+                col: pd.Categorical(df[col], categories=levels)
+                for col, levels in self.category_levels.items() if col in df.columns
+            })
         return pd.get_dummies(df, drop_first=True)
 
     def _rename_columns(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -154,7 +191,7 @@ class DataTransformation:
         existing = [c for c in drop_cols if c in df.columns]
         if existing:
             df = df.drop(columns=existing)
-            logging.info(f"Dropped columns: {existing}")
+            logging.info("Dropped columns: %s", existing)
         else:
             logging.info("No configured drop columns present in DataFrame.")
         return df
@@ -177,15 +214,35 @@ class DataTransformation:
             logging.info("Input and Target cols defined for both train and test df.")
 
             # Apply custom transformations
-            for func in [self._map_gender_column, self._drop_id_column, self._create_dummy_columns, self._rename_columns]:
+            for func in [self._map_gender_column, self._drop_id_column]:
+                input_feature_train_df = func(input_feature_train_df)
+                input_feature_test_df = func(input_feature_test_df)
+            previous_preprocessor, previous_report = None, None
+            if self.training_mode == "incremental":
+                previous_preprocessor, previous_report = self._previous_preprocessor()
+            categorical = input_feature_train_df.select_dtypes(include=["object", "category"]).columns
+            self.category_levels = {
+                col: sorted(input_feature_train_df[col].dropna().unique().tolist()) for col in categorical
+            }
+            if previous_report is not None and previous_report.get("category_levels"):
+                # Same dummy columns as the run whose preprocessor is reused
+                self.category_levels = previous_report["category_levels"]
+            for func in [self._create_dummy_columns, self._rename_columns]:
                 input_feature_train_df = func(input_feature_train_df)
                 input_feature_test_df = func(input_feature_test_df)
             logging.info("Custom transformations applied to train and test data")
 
             # Data transformation
-            preprocessor = self.get_data_transformer_object()
-            logging.info("Got the preprocessor object")
-            input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
+            if previous_report is not None and previous_report["input_columns"] == input_feature_train_df.columns.tolist():
+                preprocessor = previous_preprocessor
+                input_feature_train_arr = preprocessor.transform(input_feature_train_df)
+            else:
+                if previous_report is not None:
+                    logging.warning("Columns differ from the previous run's; fitting a new preprocessor "
+                                    "(incremental training will fall back to a full fit)")
+                preprocessor = self.get_data_transformer_object()
+                logging.info("Got the preprocessor object")
+                input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
             input_feature_test_arr = preprocessor.transform(input_feature_test_df)
             logging.info("Transformation done end to end to train-test df.")
 
@@ -194,20 +251,24 @@ class DataTransformation:
             test_arr = np.c_[input_feature_test_arr, np.array(target_feature_test_df)]
             logging.info("feature-target concatenation done for train-test df.")
 
-            # Save numpy arrays and transformed CSVs in correct timestamped directory
-            base_dir = "artifacts"
-            timestamps = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
-            latest_timestamp = sorted(timestamps)[-1]
-            transformation_dir = os.path.join(base_dir, latest_timestamp, "data_transformation")
+            # Save numpy arrays and transformed CSVs in the run directory the data came from
+            transformation_dir = os.path.join(self.artifact_dir, "data_transformation")
 
             os.makedirs(transformation_dir, exist_ok=True)
             train_np_path = os.path.join(transformation_dir, "train.npy")
             test_np_path = os.path.join(transformation_dir, "test.npy")
-            np.save(train_np_path, train_arr)
-            np.save(test_np_path, test_arr)
+            # Content-addressed: unchanged arrays are linked to the existing blob, not rewritten
+            blob_store = BlobStore(os.path.dirname(os.path.normpath(self.artifact_dir)))
+            blob_store.save_numpy(train_arr, train_np_path)
+            blob_store.save_numpy(test_arr, test_np_path)
             logging.info(f"Saved train numpy array at: {train_np_path}")
             logging.info(f"Saved test numpy array at: {test_np_path}")
 
+            # Save the fitted preprocessor so serving never has to refit it
+            preprocessor_path = os.path.join(transformation_dir, "preprocessor.pkl")
+            blob_store.save_object(preprocessor, preprocessor_path)
+            logging.info(f"Saved fitted preprocessor at: {preprocessor_path}")
+
             # Build column names for transformed data
             feature_names = []
             try:
@@ -221,14 +282,18 @@ class DataTransformation:
             report = {
                 "train_numpy_path": train_np_path,
                 "test_numpy_path": test_np_path,
-                "train_shape": train_arr.shape,
-                "test_shape": test_arr.shape,
+                "preprocessor_path": preprocessor_path,
+                # Columns the preprocessor expects after the custom transformations
+                "input_columns": input_feature_train_df.columns.tolist(),
+                # Levels the dummy columns were built from, reused when encoding requests
+                "category_levels": self.category_levels,
+                "train_shape": list(train_arr.shape),
+                "test_shape": list(test_arr.shape),
                 "train_columns": train_columns,
                 "test_columns": test_columns,
                 "train_dtype": str(train_arr.dtype),
                 "test_dtype": str(test_arr.dtype)
             }
-            import yaml
             report_path = os.path.join(transformation_dir, "data_transformation_report.yaml")
             with open(report_path, "w") as f:
                 yaml.dump(report, f)
@@ -7,6 +7,8 @@ import yaml
 from logger import logging
 from exception import MyException
 from utils.main_utils import read_yaml_file
+from utils.artifact_registry import ArtifactRegistry
+from utils.blob_store import output_exists, read_csv
 
 
 class DataValidation:
@@ -14,8 +16,9 @@ class DataValidation:
     Loads the latest train/test datasets under artifacts/<timestamp>/dataingestion/split
     and validates them against a schema.yaml.
     """
-    def __init__(self):
-        "initialized "
+    def __init__(self, run_dir: str = None):
+        "initialized; run_dir pins a run directory instead of picking the most recent one"
+        self.run_dir = run_dir
 
 
     def prepare_data_validation(self, artifacts_dir: str = "artifacts", schema_path: str = "schema.yaml"):
@@ -26,12 +29,10 @@ class DataValidation:
             if not base_dir.exists():
                 raise FileNotFoundError(f"Artifacts directory not found at {base_dir!s}")
 
-            # choose most-recent directory by mtime
-            subdirs = [p for p in base_dir.iterdir() if p.is_dir()]
-            if not subdirs:
-                raise FileNotFoundError("No timestamped directories found in artifacts.")
-            latest_dir = max(subdirs, key=lambda p: p.stat().st_mtime)
-            self.artifact_dir = latest_dir
+            if self.run_dir is not None:
+                self.artifact_dir = Path(self.run_dir)
+            else:
+                self.artifact_dir = Path(ArtifactRegistry(artifacts_dir).latest_run_dir())
 
             split_dir = self.artifact_dir / "dataingestion" / "split"
             train_path = split_dir / "train" / "train.csv"
@@ -40,11 +41,11 @@ class DataValidation:
             logging.info(f"Loading train data from: {train_path}")
             logging.info(f"Loading test data from:  {test_path}")
 
-            if not train_path.exists() or not test_path.exists():
+            if not output_exists(str(train_path)) or not output_exists(str(test_path)):
                 raise FileNotFoundError("Train or test CSV file not found in latest split directory.")
 
-            self.train_df = pd.read_csv(train_path)
-            self.test_df  = pd.read_csv(test_path)
+            self.train_df = read_csv(str(train_path))
+            self.test_df  = read_csv(str(test_path))
 
             logging.info(f"Train shape: {self.train_df.shape} | Test shape: {self.test_df.shape}")
         except Exception as e:
@@ -0,0 +1,144 @@
+import os
+import sys
+
+import joblib
+import yaml
+
+from logger import logging
+from exception import MyException
+from utils.artifact_registry import ArtifactRegistry
+from constants import *
+
+
+class ModelBackend:
+    """
+    A trainable model family.
+
+    build(params, n_jobs) returns an unfitted estimator with the configured defaults overridden
+    by params. size_param names the hyperparameter that counts trees/iterations, which is what
+    incremental (warm-start) training grows.
+    """
+    def __init__(self, name: str, build, param_grid: dict, size_param: str):
+        self.name = name
+        self.build = build
+        self.param_grid = param_grid
+        self.size_param = size_param
+
+    @property
+    def model_file_name(self) -> str:
+        return f"{self.name}_model.pkl"
+
+    def __repr__(self) -> str:
+        return f"ModelBackend({self.name!r})"
+
+
+def _build_random_forest(params: dict = None, n_jobs: int = MODEL_TRAINER_N_JOBS):
+    from sklearn.ensemble import RandomForestClassifier
+    defaults = dict(
+        n_estimators=MODEL_TRAINER_N_ESTIMATORS,
+        min_samples_split=MODEL_TRAINER_MIN_SAMPLES_SPLIT,
+        min_samples_leaf=MODEL_TRAINER_MIN_SAMPLES_LEAF,
+        max_depth=MIN_SAMPLES_SPLIT_MAX_DEPTH,
+        criterion=MIN_SAMPLES_SPLIT_CRITERION,
+        random_state=MIN_SAMPLES_SPLIT_RANDOM_STATE,
+        n_jobs=n_jobs,
+        max_samples=MODEL_TRAINER_MAX_SAMPLES
+    )
+    defaults.update(params or {})
+    return RandomForestClassifier(**defaults)
+
+
+def _build_hist_gradient_boosting(params: dict = None, n_jobs: int = MODEL_TRAINER_N_JOBS):
+    # Threads are controlled through OpenMP (threadpoolctl), not an n_jobs argument
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    defaults = dict(
+        max_iter=MODEL_TRAINER_HGB_MAX_ITER,
+        learning_rate=MODEL_TRAINER_HGB_LEARNING_RATE,
+        max_leaf_nodes=MODEL_TRAINER_HGB_MAX_LEAF_NODES,
+        max_depth=MIN_SAMPLES_SPLIT_MAX_DEPTH,
+        min_samples_leaf=MODEL_TRAINER_HGB_MIN_SAMPLES_LEAF,
+        random_state=MIN_SAMPLES_SPLIT_RANDOM_STATE
+    )
+    defaults.update(params or {})
+    return HistGradientBoostingClassifier(**defaults)
+
+
+MODEL_BACKENDS = {
+    "random_forest": ModelBackend(
+        "random_forest", _build_random_forest, MODEL_TUNER_PARAM_GRID, "n_estimators"
+    ),
+    "hist_gradient_boosting": ModelBackend(
+        "hist_gradient_boosting", _build_hist_gradient_boosting, MODEL_TUNER_HGB_PARAM_GRID, "max_iter"
+    ),
+}
+
+
+def get_model_backend(name: str = MODEL_TRAINER_BACKEND) -> ModelBackend:
+    try:
+        return MODEL_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model backend '{name}'. Available: {sorted(MODEL_BACKENDS)}")
+
+
+def load_tuned_params(run_dir: str, backend_name: str) -> dict:
+    """Returns the best parameters ModelTuner found for this backend in run_dir, or {} if it did not run."""
+    best_params_path = os.path.join(run_dir, "model_tuner", "best_params.yaml")
+    if not os.path.exists(best_params_path):
+        return {}
+    with open(best_params_path) as f:
+        best = yaml.safe_load(f) or {}
+    if best.get("backend", "random_forest") != backend_name:
+        logging.info(f"Tuned parameters at {best_params_path} are for another backend; ignoring them.")
+        return {}
+    tuned = best.get("best_params") or {}
+    logging.info(f"Using tuned parameters from {best_params_path}: {tuned}")
+    return tuned
+
+
+def previous_trained_run_dir(run_dir: str, backend_name: str = MODEL_TRAINER_BACKEND):
+    """Newest run before run_dir that saved a model of this backend (the one incremental training grows), or None."""
+    base_dir, run_id = os.path.split(os.path.normpath(run_dir))
+    for previous_id in ArtifactRegistry(base_dir).previous_run_ids(run_id, "model_training"):
+        previous_dir = os.path.join(base_dir, previous_id)
+        if os.path.exists(os.path.join(previous_dir, "model_trainer", get_model_backend(backend_name).model_file_name)):
+            return previous_dir
+    return None
+
+
+def get_model_path(run_dir: str) -> tuple:
+    """
+    Returns (model_path, backend_name) for the model trained in run_dir.
+    Reads model_trainer_report.yaml and falls back to the legacy random forest file name.
+    """
+    model_dir = os.path.join(run_dir, "model_trainer")
+    report_path = os.path.join(model_dir, "model_trainer_report.yaml")
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = yaml.safe_load(f) or {}
+        backend_name = report.get("backend", "random_forest")
+        return os.path.join(model_dir, get_model_backend(backend_name).model_file_name), backend_name
+    return os.path.join(model_dir, MODEL_BACKENDS["random_forest"].model_file_name), "random_forest"
+
+
+def load_model(run_dir: str, prefer_compact: bool = MODEL_SERVING_PREFER_COMPACT):
+    """
+    Loads the trained model of a run directory, whatever backend produced it.
+    With prefer_compact, the compacted forest is returned when ModelCompaction accepted one.
+    """
+    try:
+        if prefer_compact:
+            report_path = os.path.join(run_dir, "model_compaction", "model_compaction_report.yaml")
+            if os.path.exists(report_path):
+                with open(report_path) as f:
+                    report = yaml.safe_load(f) or {}
+                compact_path = report.get("compact_model_path")
+                if report.get("accepted") and compact_path and os.path.exists(compact_path):
+                    logging.info(f"Loading compact model from: {compact_path}")
+                    return joblib.load(compact_path)
+        model_path, backend_name = get_model_path(run_dir)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model not found at {model_path}")
+        logging.info(f"Loading {backend_name} model from: {model_path}")
+        return joblib.load(model_path)
+    except Exception as e:
+        raise MyException(e, sys) from e
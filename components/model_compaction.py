@@ -0,0 +1,293 @@
+import io
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import yaml
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+from logger import logging
+from exception import MyException
+from components.model_backends import get_model_path, load_model
+from utils.artifact_registry import ArtifactRegistry
+from utils.blob_store import BlobStore
+from constants import *
+
+
+class CompactForest:
+    """
+    Inference-only forest stored as flat arrays over all trees.
+
+    Nodes of every tree are concatenated; leaves point to themselves so a batch of rows can be
+    pushed down all trees at once for max_depth steps without branching on leaf-ness.
+    Features are int16, thresholds float32, children int32 and leaf class probabilities
+    uint8 (or float16), against 80+ bytes per node in a pickled sklearn tree.
+    """
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, n_features_in,
+                 value_scale: float = 1.0):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+        self.value_scale = value_scale
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.feature)
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Returns the leaf index reached in every tree, shape (n_rows, n_trees)."""
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X, chunk_size: int = 4096) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            leaves = self._leaves(X[start:start + chunk_size])
+            chunk = self.value[leaves].astype(np.float64).mean(axis=1) * self.value_scale
+            proba[start:start + chunk_size] = chunk / chunk.sum(axis=1, keepdims=True)
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def _quantize(proba: np.ndarray, leaf_dtype: str) -> tuple:
+    if leaf_dtype == "uint8":
+        return np.rint(proba * 255).astype(np.uint8), 1 / 255
+    if leaf_dtype == "float16":
+        return proba.astype(np.float16), 1.0
+    raise ValueError(f"Unsupported leaf dtype: {leaf_dtype}")
+
+
+def _float32_threshold(threshold: np.ndarray) -> np.ndarray:
+    """
+    Rounds float64 split thresholds down to float32. Inputs are compared as float32, and no
+    float32 lies between the rounded-down value and the original, so every split decides
+    exactly as before; plain rounding could move a threshold onto a training value.
+    """
+    rounded = threshold.astype(np.float32)
+    too_high = rounded.astype(np.float64) > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def _compact_tree(tree, leaf_dtype: str) -> tuple:
+    """
+    Quantizes one fitted sklearn tree and merges sibling leaves that became identical,
+    repeating bottom-up so whole redundant subtrees collapse. Returns compacted node arrays
+    with local child indices (leaves point to themselves) and the tree depth.
+    """
+    left = tree.children_left.copy()
+    right = tree.children_right.copy()
+    value = tree.value[:, 0, :]
+    value, _ = _quantize(value / value.sum(axis=1, keepdims=True), leaf_dtype)
+    is_leaf = left == -1
+
+    # Children always have higher indices than their parent, so a reverse scan is bottom-up
+    for node in range(len(left) - 1, -1, -1):
+        if is_leaf[node]:
+            continue
+        l, r = left[node], right[node]
+        if is_leaf[l] and is_leaf[r] and np.array_equal(value[l], value[r]):
+            value[node] = value[l]
+            is_leaf[node] = True
+
+    # Re-index the reachable nodes in depth-first order
+    order, depth = [], {}
+    stack = [(0, 0)]
+    while stack:
+        node, d = stack.pop()
+        order.append(node)
+        depth[node] = d
+        if not is_leaf[node]:
+            stack.append((right[node], d + 1))
+            stack.append((left[node], d + 1))
+    new_index = {old: new for new, old in enumerate(order)}
+    order = np.array(order)
+
+    new_left = np.array([new_index[left[n]] if not is_leaf[n] else new_index[n] for n in order], dtype=np.int32)
+    new_right = np.array([new_index[right[n]] if not is_leaf[n] else new_index[n] for n in order], dtype=np.int32)
+    feature = np.where(is_leaf[order], 0, tree.feature[order]).astype(np.int16)
+    threshold = _float32_threshold(np.where(is_leaf[order], 0, tree.threshold[order]))
+    return feature, threshold, new_left, new_right, value[order], max(depth.values())
+
+
+def build_compact_forest(forest: RandomForestClassifier, tree_indices, leaf_dtype: str = MODEL_COMPACTION_LEAF_DTYPE) -> CompactForest:
+    """Builds a CompactForest from the selected trees of a fitted forest."""
+    parts = [_compact_tree(forest.estimators_[i].tree_, leaf_dtype) for i in tree_indices]
+    offsets = np.cumsum([0] + [len(p[0]) for p in parts[:-1]]).astype(np.int32)
+    _, scale = _quantize(np.zeros((1, 1)), leaf_dtype)
+    return CompactForest(
+        feature=np.concatenate([p[0] for p in parts]),
+        threshold=np.concatenate([p[1] for p in parts]),
+        left=np.concatenate([p[2] + off for p, off in zip(parts, offsets)]),
+        right=np.concatenate([p[3] + off for p, off in zip(parts, offsets)]),
+        value=np.concatenate([p[4] for p in parts]),
+        roots=offsets,
+        max_depth=max(p[5] for p in parts),
+        classes=forest.classes_,
+        n_features_in=forest.n_features_in_,
+        value_scale=scale
+    )
+
+
+def _tree_proba(forest: RandomForestClassifier, X: np.ndarray, positive: int) -> np.ndarray:
+    """Positive-class probability of every tree on X, shape (n_trees, n_rows), as float32."""
+    tree_proba = np.empty((len(forest.estimators_), len(X)), dtype=np.float32)
+    for i, tree in enumerate(forest.estimators_):
+        tree_proba[i] = tree.predict_proba(X)[:, positive]
+    return tree_proba
+
+
+def _score(metric: str, y_true: np.ndarray, proba: np.ndarray) -> float:
+    if metric == "accuracy":
+        return float(accuracy_score(y_true, proba > 0.5))
+    if metric == "roc_auc":
+        return float(roc_auc_score(y_true, proba))
+    raise ValueError(f"Unsupported compaction metric: {metric}")
+
+
+class ModelCompaction:
+    """
+    Shrinks a trained random forest into a CompactForest.
+
+    Trees are ordered by greedy forward selection (each step adds the tree that most lowers
+    the Brier score of the running average) on a slice of the test split; the smallest prefix
+    whose metrics stay within MODEL_COMPACTION_TOLERANCE on held-out check rows of the split
+    is kept. The kept trees are quantized and their redundant leaves merged, and the result
+    is accepted only if every metric in MODEL_COMPACTION_METRICS on the check rows is within
+    the tolerance of the original forest. The selection rows never take part in that check,
+    so the accepted loss is not biased by the rows the trees were picked on. Per-tree
+    probabilities are only computed for the (capped) selection and check rows.
+    """
+    def __init__(self, run_dir: str = None):
+        self.run_dir = run_dir
+        logging.info("ModelCompaction initialized")
+
+    @staticmethod
+    def _greedy_tree_order(tree_proba: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Forward selection by Brier score, vectorized over all remaining candidate trees."""
+        n_trees = len(tree_proba)
+        remaining = np.ones(n_trees, dtype=bool)
+        running = np.zeros(tree_proba.shape[1])
+        order = []
+        for k in range(1, n_trees + 1):
+            candidates = np.flatnonzero(remaining)
+            means = (running + tree_proba[candidates]) / k
+            brier = ((means - y) ** 2).mean(axis=1)
+            best = candidates[np.argmin(brier)]
+            order.append(best)
+            remaining[best] = False
+            running += tree_proba[best]
+        return np.array(order)
+
+    def initiate_model_compaction(self):
+        try:
+            run_dir = self.run_dir or ArtifactRegistry().latest_run_dir()
+            model_path, backend_name = get_model_path(run_dir)
+            forest = load_model(run_dir, prefer_compact=False)
+            if not isinstance(forest, RandomForestClassifier):
+                logging.info(f"Model compaction only applies to random forests; skipping {backend_name}.")
+                return None
+
+            test_np_path = os.path.join(run_dir, "data_transformation", "test.npy")
+            test_arr = np.load(test_np_path)
+            X_test = np.ascontiguousarray(test_arr[:, :-1], dtype=np.float32)
+            y_test = test_arr[:, -1]
+            positive = list(forest.classes_).index(1) if 1 in forest.classes_ else len(forest.classes_) - 1
+            y_binary = (y_test == forest.classes_[positive]).astype(float)
+
+            start = time.perf_counter()
+            rng = np.random.default_rng(MIN_SAMPLES_SPLIT_RANDOM_STATE)
+            shuffled = rng.permutation(len(y_test))
+            n_select = min(int(len(y_test) * MODEL_COMPACTION_SELECTION_FRACTION), MODEL_COMPACTION_MAX_SELECTION_ROWS)
+            n_check = min(len(y_test) - n_select, MODEL_COMPACTION_MAX_CHECK_ROWS)
+            select_idx, check_idx = shuffled[:n_select], shuffled[n_select:n_select + n_check]
+            X_check, y_check = X_test[check_idx], y_binary[check_idx]
+
+            order = self._greedy_tree_order(_tree_proba(forest, X_test[select_idx], positive), y_binary[select_idx])
+            check_proba = _tree_proba(forest, X_check, positive)
+            check_baseline = {m: _score(m, y_check, check_proba.mean(axis=0)) for m in MODEL_COMPACTION_METRICS}
+            n_keep = len(order)
+            running = np.zeros(len(check_idx), dtype=np.float64)
+            for k, tree in enumerate(order, start=1):
+                running += check_proba[tree]
+                if all(_score(m, y_check, running / k) >= check_baseline[m] - MODEL_COMPACTION_TOLERANCE
+                       for m in MODEL_COMPACTION_METRICS):
+                    n_keep = k
+                    break
+            del check_proba
+
+            # Quantization can cost a little more; grow the prefix until the check rows agree
+            while True:
+                compact = build_compact_forest(forest, np.sort(order[:n_keep]))
+                compact_proba = compact.predict_proba(X_check)[:, positive]
+                compact_scores = {m: _score(m, y_check, compact_proba) for m in MODEL_COMPACTION_METRICS}
+                accepted = all(compact_scores[m] >= check_baseline[m] - MODEL_COMPACTION_TOLERANCE
+                               for m in MODEL_COMPACTION_METRICS)
+                if accepted or n_keep == len(order):
+                    break
+                n_keep = min(len(order), n_keep + max(1, n_keep // 4))
+            elapsed = time.perf_counter() - start
+
+            compaction_dir = os.path.join(run_dir, "model_compaction")
+            os.makedirs(compaction_dir, exist_ok=True)
+            compact_path = os.path.join(compaction_dir, "compact_model.pkl")
+            if accepted:
+                BlobStore(os.path.dirname(os.path.normpath(run_dir))).save_object(compact, compact_path)
+                compact_bytes = os.path.getsize(compact_path)
+            else:
+                buffer = io.BytesIO()
+                joblib.dump(compact, buffer)
+                compact_bytes = buffer.getbuffer().nbytes
+                logging.warning("Compact model exceeds the accuracy tolerance; keeping the full model only.")
+
+            report = {
+                "accepted": bool(accepted),
+                "tolerance": MODEL_COMPACTION_TOLERANCE,
+                "leaf_dtype": MODEL_COMPACTION_LEAF_DTYPE,
+                "trees_before": len(forest.estimators_),
+                "trees_after": int(compact.n_estimators),
+                "nodes_before": int(sum(t.tree_.node_count for t in forest.estimators_)),
+                "nodes_after": int(compact.node_count),
+                "size_bytes_before": os.path.getsize(model_path),
+                "size_bytes_after": int(compact_bytes),
+                # Both measured on the check rows, which tree selection did not see
+                "selection_rows": int(len(select_idx)),
+                "check_rows": int(len(check_idx)),
+                "metrics_before": check_baseline,
+                "metrics_after": compact_scores,
+                "compaction_seconds": round(elapsed, 3),
+                "model_path": model_path,
+                "compact_model_path": compact_path if accepted else None
+            }
+            report_path = os.path.join(compaction_dir, "model_compaction_report.yaml")
+            with open(report_path, "w") as f:
+                yaml.dump(report, f, sort_keys=False)
+            logging.info(f"Compaction: {report['trees_before']} -> {report['trees_after']} trees, "
+                         f"{report['size_bytes_before']} -> {report['size_bytes_after']} bytes, accepted={accepted}")
+            return report_path
+        except Exception as e:
+            logging.error(f"Error in model compaction: {e}")
+            raise MyException(e, sys)
+
+    def run(self):
+        self.initiate_model_compaction()
@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import yaml
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+from threadpoolctl import threadpool_limits
+
+from logger import logging
+from exception import MyException
+from components.model_backends import get_model_backend, load_tuned_params
+from components.model_evaluation import predict_proba_chunked, ranking_metrics
+from utils.artifact_registry import ArtifactRegistry
+from constants import *
+
+# Metrics aggregated over the folds
+FOLD_METRICS = ("roc_auc", "pr_auc", "accuracy", "f1_positive")
+
+# Bytes per cell of a fold's materialized fit rows (float32 features)
+_FIT_BYTES_PER_CELL = 4
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+# Per-process state for the worker pool; the train array is memory-mapped once per worker
+_worker_arr = None
+
+
+def _init_worker(train_np_path: str, n_threads: int) -> None:
+    global _worker_arr
+    _worker_arr = np.load(train_np_path, mmap_mode="r")
+    threadpool_limits(n_threads)
+
+
+def _fit_fold(fold: int, backend_name: str, params: dict, fit_idx: np.ndarray, val_idx: np.ndarray,
+              n_jobs: int) -> dict:
+    """Fits one fold on its rows of the shared memory-mapped array and scores the held-out rows."""
+    start = time.perf_counter()
+    X_fit = np.ascontiguousarray(_worker_arr[fit_idx, :-1], dtype=np.float32)
+    y_fit = _worker_arr[fit_idx, -1]
+    model = get_model_backend(backend_name).build(params, n_jobs=n_jobs)
+    model.fit(X_fit, y_fit)
+    fit_seconds = time.perf_counter() - start
+    del X_fit
+
+    start = time.perf_counter()
+    y_val = np.asarray(_worker_arr[val_idx, -1])
+    proba = predict_proba_chunked(model, _worker_arr[val_idx, :-1])
+    positive = len(model.classes_) - 1
+    score = proba[:, positive]
+    y_binary = (y_val == model.classes_[positive]).astype(np.float64)
+    y_pred = model.classes_.take(np.argmax(proba, axis=1))
+    ranking = ranking_metrics(y_binary, score)
+    return {
+        "fold": fold,
+        "fit_rows": int(len(fit_idx)),
+        "validation_rows": int(len(val_idx)),
+        "roc_auc": ranking["roc_auc"],
+        "pr_auc": ranking["pr_auc"],
+        "accuracy": float(accuracy_score(y_val, y_pred)),
+        "f1_positive": float(f1_score(y_val, y_pred, pos_label=1, zero_division=0)),
+        "fit_seconds": round(fit_seconds, 3),
+        "score_seconds": round(time.perf_counter() - start, 3),
+        # High-water mark of the worker process so far, including the folds it fitted before
+        "worker_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT / 2**20, 1),
+    }
+
+
+class ModelCrossValidation:
+    """
+    Stratified k-fold cross-validation of the configured backend (with the run's tuned
+    parameters) on the transformed train split, as a spread to read the single test-split
+    evaluation against.
+
+    Folds are fitted concurrently in a process pool. Workers memory-map train.npy once each
+    and receive only their fold's row indices, so the array is never pickled or copied per
+    worker; every fold only materializes its own fit rows, (k-1)/k of the array. The folds
+    fitting at once are capped so those copies stay within memory_limit_mb, and the report
+    records the resulting peak. Sampling strategies of the trainer are not applied. Writes
+    model_cross_validation/cross_validation_report.yaml.
+    """
+    def __init__(self, backend: str = MODEL_TRAINER_BACKEND, n_folds: int = MODEL_CV_N_FOLDS, run_dir: str = None,
+                 memory_limit_mb: float = MODEL_CV_MEMORY_MB):
+        if n_folds < 2:
+            raise ValueError(f"Cross-validation needs at least 2 folds, got {n_folds}")
+        self.run_dir = run_dir
+        self.backend = get_model_backend(backend)
+        self.n_folds = n_folds
+        self.memory_limit_mb = memory_limit_mb
+        logging.info(f"ModelCrossValidation initialized (backend={self.backend.name}, folds={n_folds})")
+
+    def initiate_cross_validation(self) -> str:
+        try:
+            run_dir = self.run_dir or ArtifactRegistry().latest_run_dir()
+            train_np_path = os.path.join(run_dir, "data_transformation", "train.npy")
+            logging.info(f"Cross-validating on train numpy array: {train_np_path}")
+            train_arr = np.load(train_np_path, mmap_mode="r")
+            y = train_arr[:, -1]
+            folds = list(StratifiedKFold(
+                n_splits=self.n_folds, shuffle=True, random_state=MIN_SAMPLES_SPLIT_RANDOM_STATE
+            ).split(np.zeros(len(y)), y))
+            params = load_tuned_params(run_dir, self.backend.name)
+
+            n_cores = os.cpu_count() or 1
+            fold_bytes = max(len(fit_idx) for fit_idx, _ in folds) * (train_arr.shape[1] - 1) * _FIT_BYTES_PER_CELL
+            memory_folds = int(self.memory_limit_mb * 2**20) // max(fold_bytes, 1)
+            if memory_folds < 1:
+                logging.warning(f"One fold's fit rows ({fold_bytes / 2**20:.1f} MB) exceed the "
+                                f"{self.memory_limit_mb} MB cross-validation memory limit; fitting folds one at a time")
+            n_workers = max(1, min(MODEL_CV_N_WORKERS or n_cores, self.n_folds, memory_folds))
+            # Cores left over when there are fewer folds than cores go to each fit
+            n_jobs = max(1, n_cores // n_workers)
+            start = time.perf_counter()
+            results = []
+            # spawn: the stage runs beside training in the pipeline's threads, where fork is unsafe
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(train_np_path, n_jobs)) as executor:
+                futures = [
+                    executor.submit(_fit_fold, i, self.backend.name, params, fit_idx, val_idx, n_jobs)
+                    for i, (fit_idx, val_idx) in enumerate(folds)
+                ]
+                for future in as_completed(futures):
+                    result = future.result()
+                    results.append(result)
+                    logging.info(f"Fold {result['fold']}: ROC-AUC {result['roc_auc']}, fit {result['fit_seconds']}s")
+            wall_seconds = time.perf_counter() - start
+            results.sort(key=lambda r: r["fold"])
+
+            aggregate = {}
+            for metric in FOLD_METRICS:
+                values = np.array([r[metric] for r in results if r[metric] is not None], dtype=np.float64)
+                if len(values):
+                    aggregate[metric] = {
+                        "mean": round(float(values.mean()), 6),
+                        "std": round(float(values.std(ddof=1)) if len(values) > 1 else 0.0, 6),
+                        "min": round(float(values.min()), 6),
+                        "max": round(float(values.max()), 6),
+                    }
+            fold_seconds = sum(r["fit_seconds"] + r["score_seconds"] for r in results)
+            timings = {
+                "wall_seconds": round(wall_seconds, 3),
+                "fold_seconds_total": round(fold_seconds, 3),
+                "parallel_speedup": round(fold_seconds / wall_seconds, 2) if wall_seconds > 0 else None,
+                "workers": n_workers,
+                "threads_per_fold": n_jobs,
+            }
+            memory = {
+                "limit_mb": self.memory_limit_mb,
+                "fold_fit_rows_mb": round(fold_bytes / 2**20, 3),
+                # Fit rows materialized at once when every worker is mid-fit
+                "peak_fit_rows_mb": round(n_workers * fold_bytes / 2**20, 3),
+                "peak_worker_rss_mb": max(r["worker_peak_rss_mb"] for r in results),
+            }
+            logging.info(f"{self.n_folds}-fold ROC-AUC {aggregate.get('roc_auc')} in {timings['wall_seconds']}s")
+
+            cv_dir = os.path.join(run_dir, "model_cross_validation")
+            os.makedirs(cv_dir, exist_ok=True)
+            report_path = os.path.join(cv_dir, "cross_validation_report.yaml")
+            with open(report_path, "w") as f:
+                yaml.dump({
+                    "backend": self.backend.name,
+                    "params": params,
+                    "n_folds": self.n_folds,
+                    "train_rows": int(len(y)),
+                    "aggregate": aggregate,
+                    "folds": results,
+                    "timings": timings,
+                    "memory": memory,
+                }, f, sort_keys=False)
+            logging.info(f"Cross-validation report saved at: {report_path}")
+            return report_path
+        except Exception as e:
+            logging.error(f"Error in cross-validation: {e}")
+            raise MyException(e, sys) from e
+
+    def run(self):
+        self.initiate_cross_validation()
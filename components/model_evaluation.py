@@ -1,56 +1,255 @@
 import os
 import sys
+import time
 import numpy as np
-import joblib
-from sklearn.metrics import accuracy_score, precision_score, classification_report
+import yaml
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report
 from logger import logging
 from exception import MyException
+from components.model_backends import get_model_path, load_model
+from utils.bootstrap import bootstrap_confidence_intervals
+from utils.artifact_registry import ArtifactRegistry
+from utils.blob_store import BlobStore
+from constants import *
+
+
+def predict_proba_chunked(model, X: np.ndarray, chunk_size: int = MODEL_EVALUATION_CHUNK_SIZE) -> np.ndarray:
+	"""Scores X in chunks so large (memory-mapped) test sets never need a full float copy."""
+	proba = np.empty((len(X), len(model.classes_)), dtype=np.float64)
+	for start in range(0, len(X), chunk_size):
+		proba[start:start + chunk_size] = model.predict_proba(np.asarray(X[start:start + chunk_size]))
+	return proba
+
+
+def ranking_metrics(y_true: np.ndarray, score: np.ndarray) -> dict:
+	"""
+	ROC-AUC, PR-AUC (average precision) and the exact F1-optimal threshold from one sort.
+	Cumulative true/false positive counts at every distinct score give the full curves.
+	"""
+	order = np.argsort(-score, kind="mergesort")
+	score_sorted = score[order]
+	y_sorted = y_true[order]
+	# Last index of every run of equal scores: one curve point per distinct threshold
+	cut = np.r_[np.flatnonzero(np.diff(score_sorted)), len(score_sorted) - 1]
+	tps = np.cumsum(y_sorted)[cut]
+	fps = (cut + 1) - tps
+	n_pos, n_neg = tps[-1], fps[-1]
+
+	tpr = np.r_[0.0, tps / n_pos] if n_pos else np.zeros(len(cut) + 1)
+	fpr = np.r_[0.0, fps / n_neg] if n_neg else np.zeros(len(cut) + 1)
+	roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)) if n_pos and n_neg else None
+
+	precision = tps / (tps + fps)
+	recall = tps / n_pos if n_pos else np.zeros(len(cut))
+	pr_auc = float(np.sum(np.diff(np.r_[0.0, recall]) * precision)) if n_pos else None
+
+	f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(cut)), where=(precision + recall) > 0)
+	best = int(np.argmax(f1))
+	return {
+		"roc_auc": roc_auc,
+		"pr_auc": pr_auc,
+		"best_f1_threshold": float(score_sorted[cut[best]]),
+		"best_f1": float(f1[best]),
+	}
+
+
+def threshold_sweep(y_true: np.ndarray, score: np.ndarray, n_points: int = MODEL_EVALUATION_SWEEP_POINTS) -> dict:
+	"""Precision/recall/F1 at evenly spaced thresholds (predict positive when score >= threshold)."""
+	thresholds = np.linspace(0.0, 1.0, n_points)
+	order = np.argsort(score, kind="mergesort")
+	score_sorted = score[order]
+	# Positives and rows at or above each threshold, read off suffix sums of the sorted labels
+	pos_suffix = np.r_[np.cumsum(y_true[order][::-1])[::-1], 0]
+	first = np.searchsorted(score_sorted, thresholds, side="left")
+	predicted = len(score) - first
+	tp = pos_suffix[first]
+	n_pos = pos_suffix[0]
+	precision = np.divide(tp, predicted, out=np.zeros(n_points), where=predicted > 0)
+	recall = tp / n_pos if n_pos else np.zeros(n_points)
+	f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(n_points), where=(precision + recall) > 0)
+	return {
+		"thresholds": np.round(thresholds, 6).tolist(),
+		"precision": np.round(precision, 6).tolist(),
+		"recall": np.round(recall, 6).tolist(),
+		"f1": np.round(f1, 6).tolist(),
+		"predicted_positive": predicted.astype(int).tolist(),
+	}
+
+
+def calibration_bins(y_true: np.ndarray, score: np.ndarray, n_bins: int = MODEL_EVALUATION_CALIBRATION_BINS) -> dict:
+	"""Reliability table over equal-width score bins plus the expected calibration error."""
+	bins = np.minimum((score * n_bins).astype(int), n_bins - 1)
+	counts = np.bincount(bins, minlength=n_bins)
+	mean_score = np.divide(np.bincount(bins, weights=score, minlength=n_bins), counts,
+	                       out=np.zeros(n_bins), where=counts > 0)
+	positive_rate = np.divide(np.bincount(bins, weights=y_true, minlength=n_bins), counts,
+	                          out=np.zeros(n_bins), where=counts > 0)
+	ece = float(np.sum(counts * np.abs(mean_score - positive_rate)) / max(len(score), 1))
+	return {
+		"bin_edges": np.round(np.linspace(0.0, 1.0, n_bins + 1), 6).tolist(),
+		"count": counts.astype(int).tolist(),
+		"mean_predicted": np.round(mean_score, 6).tolist(),
+		"fraction_positive": np.round(positive_rate, 6).tolist(),
+		"expected_calibration_error": round(ece, 6),
+	}
+
 
 class ModelEvaluation:
-	def __init__(self):
+	def __init__(self, run_dir: str = None):
+		self.run_dir = run_dir
 		logging.info("ModelEvaluation initialized")
 
+	@staticmethod
+	def _read_yaml(path: str) -> dict:
+		if not os.path.exists(path):
+			return {}
+		with open(path) as f:
+			return yaml.safe_load(f) or {}
+
+	def _previous_evaluation(self, base_dir: str, latest_timestamp: str) -> tuple:
+		"""Returns (timestamp, report) of the most recent earlier run that has an evaluation report."""
+		for timestamp in ArtifactRegistry(base_dir).previous_run_ids(latest_timestamp, "model_evaluation"):
+			report = self._read_yaml(os.path.join(base_dir, timestamp, "model_evaluation", "model_evaluation_report.yaml"))
+			if report:
+				return timestamp, report
+		return None, {}
+
 	def evaluate_model(self):
 		"""
 		Loads model and test numpy array from latest timestamped directory, evaluates, and saves report in model_evaluation directory.
+
+		The model is scored once with predict_proba (in chunks); labels, accuracy/precision,
+		ROC-AUC, PR-AUC, calibration bins and the threshold sweep are all derived from those
+		probabilities, which are also cached in model_evaluation/test_predictions.npy.
 		"""
 		try:
-			base_dir = "artifacts"
-			timestamps = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
-			latest_timestamp = sorted(timestamps)[-1]
+			run_dir = self.run_dir or ArtifactRegistry().latest_run_dir()
+			base_dir, latest_timestamp = os.path.split(os.path.normpath(run_dir))
 			transformation_dir = os.path.join(base_dir, latest_timestamp, "data_transformation")
 			test_np_path = os.path.join(transformation_dir, "test.npy")
-			model_dir = os.path.join(base_dir, latest_timestamp, "model_trainer")
-			model_path = os.path.join(model_dir, "random_forest_model.pkl")
+			model_path, backend_name = get_model_path(run_dir)
 
+			timings = {}
+			start = time.perf_counter()
 			logging.info(f"Loading test numpy array from: {test_np_path}")
-			test_arr = np.load(test_np_path)
-			X_test, y_test = test_arr[:, :-1], test_arr[:, -1]
+			test_arr = np.load(test_np_path, mmap_mode="r")
+			X_test, y_test = test_arr[:, :-1], np.asarray(test_arr[:, -1])
 
-			logging.info(f"Loading model from: {model_path}")
-			model = joblib.load(model_path)
+			model = load_model(run_dir, prefer_compact=False)
+			timings["load_seconds"] = time.perf_counter() - start
 
 			logging.info("Evaluating model...")
-			y_pred = model.predict(X_test)
+			start = time.perf_counter()
+			proba = predict_proba_chunked(model, X_test)
+			timings["predict_proba_seconds"] = time.perf_counter() - start
+
+			start = time.perf_counter()
+			classes = np.asarray(model.classes_)
+			y_pred = classes.take(np.argmax(proba, axis=1))
+			positive = int(np.flatnonzero(classes == 1)[0]) if (classes == 1).any() else len(classes) - 1
+			score = proba[:, positive]
+			y_binary = (y_test == classes[positive]).astype(np.float64)
 			acc = accuracy_score(y_test, y_pred)
 			prec = precision_score(y_test, y_pred, average='weighted')
+			recall_pos = recall_score(y_test, y_pred, pos_label=1, zero_division=0)
+			f1_pos = f1_score(y_test, y_pred, pos_label=1, zero_division=0)
 			report = classification_report(y_test, y_pred)
 			logging.info(f"Accuracy: {acc}")
 			logging.info(f"Precision: {prec}")
+			logging.info(f"Recall (positive class): {recall_pos}")
 			logging.info(f"Classification Report:\n{report}")
+			timings["label_metrics_seconds"] = time.perf_counter() - start
+
+			start = time.perf_counter()
+			ranking = ranking_metrics(y_binary, score)
+			sweep = threshold_sweep(y_binary, score)
+			calibration = calibration_bins(y_binary, score)
+			timings["ranking_metrics_seconds"] = time.perf_counter() - start
+			logging.info(f"ROC-AUC: {ranking['roc_auc']} | PR-AUC: {ranking['pr_auc']}")
+
+			confidence_intervals = None
+			if MODEL_EVALUATION_BOOTSTRAP_REPLICATES > 0:
+				start = time.perf_counter()
+				confidence_intervals = bootstrap_confidence_intervals(
+					y_binary, score, (y_pred == classes[positive]).astype(np.float64),
+					n_replicates=MODEL_EVALUATION_BOOTSTRAP_REPLICATES,
+					time_budget=MODEL_EVALUATION_BOOTSTRAP_TIME_BUDGET_SECONDS,
+					confidence=MODEL_EVALUATION_BOOTSTRAP_CONFIDENCE,
+					n_workers=MODEL_EVALUATION_BOOTSTRAP_N_WORKERS,
+					memory_limit_mb=MODEL_EVALUATION_BOOTSTRAP_MEMORY_MB,
+					seed=MIN_SAMPLES_SPLIT_RANDOM_STATE
+				)
+				timings["bootstrap_seconds"] = time.perf_counter() - start
+				logging.info(f"Bootstrap intervals from {confidence_intervals['replicates_completed']} replicates: "
+				             f"{confidence_intervals['intervals']}")
 
 			# Save evaluation report
 			eval_dir = os.path.join(base_dir, latest_timestamp, "model_evaluation")
 			os.makedirs(eval_dir, exist_ok=True)
-			import yaml
+			predictions_path = os.path.join(eval_dir, "test_predictions.npy")
+			BlobStore(base_dir).save_numpy(np.c_[y_binary, score], predictions_path)
+			metrics = {
+				"accuracy": float(acc),
+				"precision": float(prec),
+				"recall_positive": float(recall_pos),
+				"f1_positive": float(f1_pos),
+				"roc_auc": ranking["roc_auc"],
+				"pr_auc": ranking["pr_auc"]
+			}
+
+			# Training cost and sampling mode of this run, compared with the previous evaluated run
+			trainer_report = self._read_yaml(os.path.join(run_dir, "model_trainer", "model_trainer_report.yaml"))
+			training = {
+				"sampling_strategy": trainer_report.get("sampling_strategy"),
+				"fit_seconds": trainer_report.get("fit_seconds"),
+				"train_rows": trainer_report.get("train_rows"),
+				"fitted_rows": trainer_report.get("fitted_rows")
+			}
+			# Fold spread from the cross-validation stage, when it ran for this run
+			cv_report = self._read_yaml(os.path.join(run_dir, "model_cross_validation", "cross_validation_report.yaml"))
+			cross_validation = None
+			if cv_report:
+				cross_validation = {
+					"n_folds": cv_report.get("n_folds"),
+					"aggregate": cv_report.get("aggregate"),
+					"wall_seconds": (cv_report.get("timings") or {}).get("wall_seconds")
+				}
+			previous_timestamp, previous = self._previous_evaluation(base_dir, latest_timestamp)
+			comparison = None
+			if previous:
+				previous_training = previous.get("training") or {}
+				deltas = {
+					k: round(v - previous[k], 6) for k, v in metrics.items()
+					if v is not None and previous.get(k) is not None
+				}
+				if training["fit_seconds"] is not None and previous_training.get("fit_seconds") is not None:
+					deltas["fit_seconds"] = round(training["fit_seconds"] - previous_training["fit_seconds"], 4)
+				comparison = {
+					"previous_run": previous_timestamp,
+					"previous_sampling_strategy": previous_training.get("sampling_strategy"),
+					"deltas": deltas
+				}
+				logging.info(f"Metric deltas vs run {previous_timestamp}: {deltas}")
+
 			report_path = os.path.join(eval_dir, "model_evaluation_report.yaml")
 			with open(report_path, "w") as f:
 				yaml.dump({
-					"accuracy": float(acc),
-					"precision": float(prec),
+					**metrics,
 					"classification_report": report,
 					"model_path": model_path,
-					"test_numpy_path": test_np_path
+					"backend": backend_name,
+					"test_numpy_path": test_np_path,
+					"test_predictions_path": predictions_path,
+					"test_rows": int(len(y_test)),
+					"best_f1_threshold": ranking["best_f1_threshold"],
+					"best_f1": ranking["best_f1"],
+					"confidence_intervals": confidence_intervals,
+					"calibration": calibration,
+					"threshold_sweep": sweep,
+					"timings": {k: round(v, 4) for k, v in timings.items()},
+					"training": training,
+					"cross_validation": cross_validation,
+					"comparison": comparison
 				}, f)
 			logging.info(f"Evaluation report saved at: {report_path}")
 
@@ -0,0 +1,59 @@
+import sys
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.ensemble import RandomForestClassifier
+
+from logger import logging
+from exception import MyException
+
+
+class ForestExplainer:
+    """
+    Per-feature contributions to a random forest's positive-class probability (Saabas method).
+
+    Walking a row down a tree, every split moves the node's positive-class probability from
+    the parent's value to the child's; that change is credited to the feature the parent split
+    on. The probability is then bias (mean root value) plus the sum of the contributions.
+
+    All trees are flattened into one (total_nodes, n_features) sparse matrix holding each node's
+    change divided by the number of trees, so the contributions of a batch are a single sparse
+    product with the forest's decision-path indicator matrix.
+    """
+    def __init__(self, forest: RandomForestClassifier):
+        try:
+            if not isinstance(forest, RandomForestClassifier):
+                raise ValueError("Feature contributions are only available for random forest models.")
+            self.forest = forest
+            # Labels are 0/1: the positive class is the larger one
+            positive = len(forest.classes_) - 1
+            n_trees = len(forest.estimators_)
+            rows, cols, deltas, root_values = [], [], [], []
+            offset = 0
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                value = tree.value[:, 0, :]
+                proba = value[:, positive] / value.sum(axis=1)
+                internal = np.flatnonzero(tree.children_left != -1)
+                parent = np.full(tree.node_count, -1)
+                parent[tree.children_left[internal]] = internal
+                parent[tree.children_right[internal]] = internal
+                child = np.flatnonzero(parent >= 0)
+                rows.append(child + offset)
+                cols.append(tree.feature[parent[child]])
+                deltas.append(proba[child] - proba[parent[child]])
+                root_values.append(proba[0])
+                offset += tree.node_count
+            self.deltas = csr_matrix(
+                (np.concatenate(deltas) / n_trees, (np.concatenate(rows), np.concatenate(cols))),
+                shape=(offset, forest.n_features_in_),
+            )
+            self.bias = float(np.mean(root_values))
+            logging.info(f"Forest explainer built over {n_trees} trees and {offset} nodes")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def explain(self, X: np.ndarray) -> np.ndarray:
+        """Returns contributions of shape (n_rows, n_features); bias + row sum is the probability."""
+        indicator, _ = self.forest.decision_path(X)
+        return (indicator @ self.deltas).toarray()
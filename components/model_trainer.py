@@ -1,62 +1,240 @@
-
 import sys
-from sklearn.ensemble import RandomForestClassifier
+import time
+from sklearn.metrics import accuracy_score
 from logger import logging
 from exception import MyException
+from components.model_backends import get_model_backend, load_tuned_params, previous_trained_run_dir
+from utils.artifact_registry import ArtifactRegistry
+from utils.blob_store import BlobStore
 import numpy as np
 import joblib
+import yaml
 import os
 from constants import *
 
 
 
 class ModelTrainer():
-    def __init__(self):
-        logging.info("ModelTrainer initialized")
+    def __init__(self, training_mode: str = MODEL_TRAINER_TRAINING_MODE, backend: str = MODEL_TRAINER_BACKEND,
+                 sampling_strategy: str = MODEL_TRAINER_SAMPLING_STRATEGY, run_dir: str = None):
+        if training_mode not in ("parallel", "incremental"):
+            raise ValueError(f"Unknown training mode: {training_mode}")
+        if sampling_strategy not in (None, "undersample", "balanced_bagging"):
+            raise ValueError(f"Unknown sampling strategy: {sampling_strategy}")
+        self.training_mode = training_mode
+        self.run_dir = run_dir
+        self.backend = get_model_backend(backend)
+        self.sampling_strategy = sampling_strategy
+        logging.info(f"ModelTrainer initialized (mode={training_mode}, backend={self.backend.name}, "
+                     f"sampling={sampling_strategy})")
+
+    @staticmethod
+    def _load_features(np_path: str):
+        """
+        Memory-maps a transformed array and returns (X, y) with X as a C-contiguous float32 copy.
+        Tree models convert their input to float32 anyway; doing it once here keeps a single
+        feature matrix resident, which every worker thread then shares.
+        """
+        arr = np.load(np_path, mmap_mode="r")
+        X = np.ascontiguousarray(arr[:, :-1], dtype=np.float32)
+        y = np.asarray(arr[:, -1])
+        return X, y
+
+    def _build_model(self, tuned_params: dict = None):
+        return self.backend.build(tuned_params, n_jobs=MODEL_TRAINER_N_JOBS)
+
+    def _undersample(self, X: np.ndarray, y: np.ndarray):
+        """Randomly drops majority-class rows down to MODEL_TRAINER_SAMPLING_RATIO."""
+        from imblearn.under_sampling import RandomUnderSampler
+        sampler = RandomUnderSampler(
+            sampling_strategy=MODEL_TRAINER_SAMPLING_RATIO, random_state=MIN_SAMPLES_SPLIT_RANDOM_STATE
+        )
+        X_res, y_res = sampler.fit_resample(X, y)
+        logging.info(f"Undersampled train rows: {len(y)} -> {len(y_res)}")
+        return np.ascontiguousarray(X_res, dtype=np.float32), y_res
+
+    def _balanced_bagging(self, model):
+        """
+        Wraps the model so that every ensemble member is fitted on its own balanced sample.
+        Forests become a BalancedRandomForestClassifier (one undersampled bootstrap per tree);
+        other backends are bagged with BalancedBaggingClassifier.
+        """
+        from imblearn.ensemble import BalancedBaggingClassifier, BalancedRandomForestClassifier
+        if self.backend.name == "random_forest":
+            params = model.get_params()
+            params.update(sampling_strategy=MODEL_TRAINER_SAMPLING_RATIO, replacement=True, bootstrap=False)
+            return BalancedRandomForestClassifier(**params)
+        return BalancedBaggingClassifier(
+            estimator=model,
+            n_estimators=MODEL_TRAINER_BALANCED_BAGGING_N_ESTIMATORS,
+            sampling_strategy=MODEL_TRAINER_SAMPLING_RATIO,
+            n_jobs=MODEL_TRAINER_N_JOBS,
+            random_state=MIN_SAMPLES_SPLIT_RANDOM_STATE
+        )
+
+    @staticmethod
+    def _fitted_state(preprocessor) -> list:
+        """Columns and fitted statistics of every step of a preprocessor, for comparing two of them."""
+        state = []
+        for name, transformer, columns in preprocessor.named_steps["preprocessor"].transformers_:
+            fitted = transformer if isinstance(transformer, str) else {
+                k: v for k, v in vars(transformer).items() if k.endswith("_") and not k.startswith("_")
+            }
+            state.append((name, list(columns) if not isinstance(columns, slice) else columns, fitted))
+        return state
 
+    def _same_preprocessor(self, previous_run_dir: str, run_dir: str) -> bool:
+        """True when both runs encoded their features with identically fitted preprocessors."""
+        paths = [os.path.join(d, "data_transformation", "preprocessor.pkl") for d in (previous_run_dir, run_dir)]
+        if not all(os.path.exists(p) for p in paths):
+            return False
+        previous, current = (self._fitted_state(joblib.load(p)) for p in paths)
+        if len(previous) != len(current):
+            return False
+        for (name_a, cols_a, fit_a), (name_b, cols_b, fit_b) in zip(previous, current):
+            if name_a != name_b or cols_a != cols_b or type(fit_a) is not type(fit_b):
+                return False
+            if isinstance(fit_a, str):
+                if fit_a != fit_b:
+                    return False
+            elif fit_a.keys() != fit_b.keys() or not all(
+                    np.array_equal(np.asarray(fit_a[k]), np.asarray(fit_b[k])) for k in fit_a):
+                return False
+        return True
 
+    def _load_previous_model(self, run_dir: str, n_features: int):
+        """
+        Returns the most recent model of this backend trained before this run, or None if there
+        is none, it was fitted on a different feature layout, or its run scaled the features
+        differently: its split thresholds only hold in the space its preprocessor produced.
+        """
+        previous_run_dir = previous_trained_run_dir(run_dir, self.backend.name)
+        if previous_run_dir is None:
+            return None, None
+        model_path = os.path.join(previous_run_dir, "model_trainer", self.backend.model_file_name)
+        if not self._same_preprocessor(previous_run_dir, run_dir):
+            logging.warning(f"Previous model at {model_path} was trained on features scaled by another "
+                            f"preprocessor; ignoring it.")
+            return None, None
+        model = joblib.load(model_path)
+        if getattr(model, "n_features_in_", None) != n_features:
+            logging.warning(f"Previous model at {model_path} has a different feature layout; ignoring it.")
+            return None, None
+        return model, model_path
 
     def initiate_model_training(self):
         """
-        Train RandomForest model using train numpy array from latest timestamped directory, save model in artifacts/model_trainer.
+        Train the configured backend using train numpy array from latest timestamped directory, save model in artifacts/model_trainer.
+
+        In "parallel" mode the model is refitted from scratch across all cores. In "incremental"
+        mode the previous run's model is warm-started and MODEL_TRAINER_INCREMENTAL_N_ESTIMATORS
+        new trees/iterations are fitted on this run's data; it falls back to a full fit when no
+        usable previous model exists, or when this run's preprocessor differs from the one the
+        previous model was trained behind (DataTransformation reuses it in incremental mode).
+        Ingestion still fetches the whole collection, so the new trees are fitted on all current
+        rows, not only on the newly ingested ones.
+
+        MODEL_TRAINER_SAMPLING_STRATEGY makes the fit imbalance-aware: "undersample" drops
+        majority rows once before fitting, "balanced_bagging" gives every ensemble member its
+        own balanced sample. Either way the fitting cost scales with the minority class.
         """
         try:
             logging.info("Model training started...")
             # Get train numpy path from latest timestamped directory
-            base_dir = "artifacts"
-            timestamps = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
-            latest_timestamp = sorted(timestamps)[-1]
+            run_dir = self.run_dir or ArtifactRegistry().latest_run_dir()
+            base_dir, latest_timestamp = os.path.split(os.path.normpath(run_dir))
             transformation_dir = os.path.join(base_dir, latest_timestamp, "data_transformation")
             train_np_path = os.path.join(transformation_dir, "train.npy")
             logging.info(f"Loading train numpy array from: {train_np_path}")
-            train_arr = np.load(train_np_path)
-            X_train, y_train = train_arr[:, :-1], train_arr[:, -1]
-
-            logging.info("Training RandomForestClassifier...")
-            model = RandomForestClassifier(
-                n_estimators=MODEL_TRAINER_N_ESTIMATORS,
-                min_samples_split=MODEL_TRAINER_MIN_SAMPLES_SPLIT,
-                min_samples_leaf=MODEL_TRAINER_MIN_SAMPLES_LEAF,
-                max_depth=MIN_SAMPLES_SPLIT_MAX_DEPTH,
-                criterion=MIN_SAMPLES_SPLIT_CRITERION,
-                random_state=MIN_SAMPLES_SPLIT_RANDOM_STATE
-            )
-            model.fit(X_train, y_train)
+            X_train, y_train = self._load_features(train_np_path)
+            train_rows = int(X_train.shape[0])
+            minority_rows = int(np.bincount(y_train.astype(int)).min())
+            X_fit, y_fit = X_train, y_train
+            if self.sampling_strategy == "undersample":
+                X_fit, y_fit = self._undersample(X_train, y_train)
+
+            mode = self.training_mode
+            if mode == "incremental" and self.sampling_strategy == "balanced_bagging":
+                logging.info("Balanced bagging cannot warm-start a previous model; using a full fit.")
+                mode = "parallel"
+            previous_model_path = None
+            model = None
+            if mode == "incremental":
+                model, previous_model_path = self._load_previous_model(run_dir, X_train.shape[1])
+                if model is None:
+                    logging.info("No previous model found; falling back to a full parallel fit.")
+                    mode = "parallel"
+                else:
+                    size = model.get_params()[self.backend.size_param]
+                    logging.info(f"Warm-starting from {previous_model_path} ({self.backend.size_param}={size})")
+                    model.set_params(warm_start=True, **{
+                        self.backend.size_param: size + MODEL_TRAINER_INCREMENTAL_N_ESTIMATORS
+                    })
+                    if "n_jobs" in model.get_params():
+                        model.set_params(n_jobs=MODEL_TRAINER_N_JOBS)
+            tuned_params = {}
+            if model is None:
+                tuned_params = load_tuned_params(os.path.join(base_dir, latest_timestamp), self.backend.name)
+                model = self._build_model(tuned_params)
+                if self.sampling_strategy == "balanced_bagging":
+                    model = self._balanced_bagging(model)
+
+            logging.info(f"Training {type(model).__name__} ({mode}, n_jobs={MODEL_TRAINER_N_JOBS})...")
+            start = time.perf_counter()
+            model.fit(X_fit, y_fit)
+            fit_seconds = time.perf_counter() - start
+            # Do not keep warm_start on the saved model; a later refit must start clean
+            model.set_params(warm_start=False)
+            size_params = model.get_params()
+            # Balanced bagging nests the backend estimator, so its size parameter gets a prefix
+            model_size = int(size_params.get(self.backend.size_param,
+                                             size_params.get(f"estimator__{self.backend.size_param}")))
+            logging.info(f"Fitted {self.backend.size_param}={model_size} in {fit_seconds:.2f}s")
+
+            train_accuracy = accuracy_score(y_train, model.predict(X_train))
+            test_accuracy = None
+            test_np_path = os.path.join(transformation_dir, "test.npy")
+            if os.path.exists(test_np_path):
+                X_test, y_test = self._load_features(test_np_path)
+                test_accuracy = float(accuracy_score(y_test, model.predict(X_test)))
 
             # Save model in artifacts/model_trainer
             model_dir = os.path.join(base_dir, latest_timestamp, "model_trainer")
             os.makedirs(model_dir, exist_ok=True)
-            model_path = os.path.join(model_dir, "random_forest_model.pkl")
-            joblib.dump(model, model_path)
+            model_path = os.path.join(model_dir, self.backend.model_file_name)
+            BlobStore(base_dir).save_object(model, model_path)
             logging.info(f"Model saved at: {model_path}")
 
+            report_path = os.path.join(model_dir, "model_trainer_report.yaml")
+            with open(report_path, "w") as f:
+                yaml.dump({
+                    "backend": self.backend.name,
+                    "training_mode": mode,
+                    "previous_model_path": previous_model_path,
+                    "tuned_params": tuned_params,
+                    self.backend.size_param: model_size,
+                    "n_jobs": MODEL_TRAINER_N_JOBS,
+                    "sampling_strategy": self.sampling_strategy,
+                    "sampling_ratio": MODEL_TRAINER_SAMPLING_RATIO if self.sampling_strategy else None,
+                    "train_rows": train_rows,
+                    "fitted_rows": int(len(y_fit)),
+                    "minority_rows": minority_rows,
+                    # Each balanced bagging member sees only this many rows
+                    "rows_per_member": (int(minority_rows * (1 + 1 / MODEL_TRAINER_SAMPLING_RATIO))
+                                        if self.sampling_strategy == "balanced_bagging" else None),
+                    "fit_seconds": round(fit_seconds, 4),
+                    "train_accuracy": float(train_accuracy),
+                    "test_accuracy": test_accuracy,
+                    "model_path": model_path
+                }, f)
+            logging.info(f"Model trainer report saved at: {report_path}")
+
             return model_path
         except Exception as e:
             logging.error(f"Error in model training: {e}")
             raise MyException(e, sys)
-        
+
 
 
     def run(self):
         self.initiate_model_training()
-
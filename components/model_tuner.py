@@ -0,0 +1,186 @@
+import os
+import sys
+import math
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import yaml
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, train_test_split
+from threadpoolctl import threadpool_limits
+
+from logger import logging
+from exception import MyException
+from components.model_backends import get_model_backend
+from utils.artifact_registry import ArtifactRegistry
+from constants import *
+
+
+# Per-process state for the worker pool; the train array is memory-mapped once per worker
+_worker_arr = None
+
+
+def _init_worker(train_np_path: str) -> None:
+    global _worker_arr
+    _worker_arr = np.load(train_np_path, mmap_mode="r")
+    # One core per worker; parallelism comes from the pool, not from OpenMP inside each fit
+    threadpool_limits(1)
+
+
+def _evaluate_candidate(backend_name: str, params: dict, fit_idx: np.ndarray, val_idx: np.ndarray,
+                        scoring: str) -> tuple:
+    """Fits one candidate on the given row subset and scores it on the validation rows."""
+    start = time.perf_counter()
+    X_fit = np.ascontiguousarray(_worker_arr[fit_idx, :-1], dtype=np.float32)
+    y_fit = _worker_arr[fit_idx, -1]
+    X_val = np.ascontiguousarray(_worker_arr[val_idx, :-1], dtype=np.float32)
+    y_val = _worker_arr[val_idx, -1]
+    model = get_model_backend(backend_name).build(params, n_jobs=1)
+    model.fit(X_fit, y_fit)
+    score = get_scorer(scoring)(model, X_val, y_val)
+    return float(score), time.perf_counter() - start
+
+
+class ModelTuner:
+    """
+    Successive-halving hyperparameter search for a model backend.
+
+    Candidates sampled from the backend's parameter grid are fitted on a growing, nested subsample
+    of the latest train split across a process pool. After each round only the best
+    1/MODEL_TUNER_HALVING_FACTOR survive and the subsample grows by the same factor. The
+    search stops when one candidate is left, the data is exhausted or the wall-clock budget
+    runs out; fits still running then are abandoned rather than waited for, and a candidate
+    whose fit fails ranks last. The winner is written to
+    artifacts/<timestamp>/model_tuner/best_params.yaml.
+    """
+    def __init__(self, backend: str = MODEL_TRAINER_BACKEND, run_dir: str = None):
+        self.run_dir = run_dir
+        self.backend = get_model_backend(backend)
+        logging.info(f"ModelTuner initialized (backend={self.backend.name})")
+
+    def _sample_candidates(self) -> list:
+        param_grid = self.backend.param_grid
+        n_combinations = math.prod(len(v) for v in param_grid.values())
+        n_candidates = min(MODEL_TUNER_N_CANDIDATES, n_combinations)
+        return list(ParameterSampler(
+            param_grid, n_iter=n_candidates, random_state=MIN_SAMPLES_SPLIT_RANDOM_STATE
+        ))
+
+    def initiate_model_tuning(self):
+        try:
+            run_dir = self.run_dir or ArtifactRegistry().latest_run_dir()
+            base_dir, latest_timestamp = os.path.split(os.path.normpath(run_dir))
+            train_np_path = os.path.join(base_dir, latest_timestamp, "data_transformation", "train.npy")
+            logging.info(f"Tuning on train numpy array: {train_np_path}")
+
+            y = np.load(train_np_path, mmap_mode="r")[:, -1]
+            row_idx = np.arange(len(y))
+            fit_pool, val_idx = train_test_split(
+                row_idx, test_size=MODEL_TUNER_VALIDATION_SPLIT, stratify=y,
+                random_state=MIN_SAMPLES_SPLIT_RANDOM_STATE
+            )
+            # Shuffle once so every round's subsample is a prefix of the next one
+            fit_pool = np.random.default_rng(MIN_SAMPLES_SPLIT_RANDOM_STATE).permutation(fit_pool)
+
+            candidates = self._sample_candidates()
+            n_workers = MODEL_TUNER_N_WORKERS or os.cpu_count()
+            deadline = time.monotonic() + MODEL_TUNER_TIME_BUDGET_SECONDS
+            resource = min(MODEL_TUNER_MIN_RESOURCE, len(fit_pool))
+            history = []
+            best = None
+            budget_exhausted = False
+            start = time.perf_counter()
+
+            logging.info(f"Successive halving: {len(candidates)} candidates, {n_workers} workers, "
+                         f"budget {MODEL_TUNER_TIME_BUDGET_SECONDS}s")
+            # spawn: the logging listener and other pipeline stages run in threads, where fork is unsafe
+            executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_worker, initargs=(train_np_path,))
+            try:
+                while candidates:
+                    fit_idx = np.sort(fit_pool[:resource])
+                    futures = {
+                        executor.submit(_evaluate_candidate, self.backend.name, params, fit_idx, val_idx,
+                                        MODEL_TUNER_SCORING): i
+                        for i, params in enumerate(candidates)
+                    }
+                    scores = {}
+                    errors = {}
+                    pending = set(futures)
+                    while pending:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            i = futures[future]
+                            try:
+                                scores[i] = future.result()
+                            except Exception as e:
+                                # One bad candidate ranks last instead of aborting the search
+                                logging.warning(f"Candidate {dict(candidates[i])} failed: {e}")
+                                scores[i] = (-math.inf, 0.0)
+                                errors[i] = str(e)
+                    if pending:
+                        budget_exhausted = True
+
+                    ranked = sorted(scores, key=lambda i: scores[i][0], reverse=True)
+                    history.append({
+                        "resource": int(resource),
+                        "n_candidates": len(candidates),
+                        "n_completed": len(scores),
+                        "results": [
+                            {"params": dict(candidates[i]), "score": round(scores[i][0], 6),
+                             "fit_seconds": round(scores[i][1], 3)} if i not in errors else
+                            {"params": dict(candidates[i]), "score": None, "error": errors[i]}
+                            for i in ranked
+                        ],
+                    })
+                    logging.info(f"Round at {resource} rows: {len(scores)}/{len(candidates)} candidates scored")
+
+                    # A round cut short by the budget is only used when no earlier round finished
+                    if ranked and ranked[0] not in errors and (not budget_exhausted or best is None):
+                        best = {"params": dict(candidates[ranked[0]]), "score": scores[ranked[0]][0],
+                                "resource": int(resource)}
+                    if budget_exhausted or len(candidates) == 1 or resource >= len(fit_pool):
+                        break
+                    n_keep = max(1, math.ceil(len(ranked) / MODEL_TUNER_HALVING_FACTOR))
+                    candidates = [candidates[i] for i in ranked[:n_keep] if i not in errors]
+                    resource = min(resource * MODEL_TUNER_HALVING_FACTOR, len(fit_pool))
+            finally:
+                if budget_exhausted:
+                    # Fits still running past the budget are stopped: the interpreter would otherwise
+                    # wait for them at exit. concurrent.futures has no public way to reach them.
+                    for process in list((executor._processes or {}).values()):
+                        process.terminate()
+                executor.shutdown(wait=False, cancel_futures=True)
+
+            if best is None:
+                raise RuntimeError("No candidate was scored: the tuning budget ran out or every fit failed.")
+
+            tuner_dir = os.path.join(base_dir, latest_timestamp, "model_tuner")
+            os.makedirs(tuner_dir, exist_ok=True)
+            best_params_path = os.path.join(tuner_dir, "best_params.yaml")
+            with open(best_params_path, "w") as f:
+                yaml.dump({
+                    "backend": self.backend.name,
+                    "best_params": best["params"],
+                    "best_score": float(best["score"]),
+                    "scoring": MODEL_TUNER_SCORING,
+                    "resource": best["resource"],
+                    "budget_exhausted": budget_exhausted,
+                    "elapsed_seconds": round(time.perf_counter() - start, 3),
+                    "n_workers": n_workers,
+                    "history": history,
+                }, f, sort_keys=False)
+            logging.info(f"Best params {best['params']} ({MODEL_TUNER_SCORING}={best['score']:.4f}) "
+                         f"saved at: {best_params_path}")
+            return best_params_path
+        except Exception as e:
+            logging.error(f"Error in model tuning: {e}")
+            raise MyException(e, sys)
+
+    def run(self):
+        self.initiate_model_tuning()
@@ -10,13 +10,17 @@ load_dotenv()
 
 
 class MongoDBConnection:
-    def __init__(self):
+    def __init__(self, server_selection_timeout_ms: int = None):
         try:
             logging.info("Starting MongoDB connection...")
+            # MONGODB_TLS=false for a local stand-in (e.g. mongod on localhost) without TLS
+            tls = os.getenv("MONGODB_TLS", "true").lower() not in ("0", "false", "no")
             self.client = pymongo.MongoClient(
                 os.getenv("CONNECTION_URL"),
-                tls=True,
-                tlsCAFile=certifi.where()  # path from env
+                tls=tls,
+                tlsCAFile=certifi.where() if tls else None,  # path from env
+                # How long an operation waits for a reachable server before failing (pymongo default: 30s)
+                **({"serverSelectionTimeoutMS": server_selection_timeout_ms} if server_selection_timeout_ms else {})
             )
             self.db = self.client[os.getenv("DB_NAME")]
             logging.info(
@@ -1,9 +1,20 @@
 train_test_split_ratio = 0.2
+# Fixed split and row order, so re-ingesting unchanged data yields byte-identical files
+train_test_split_random_state = 42
+# Rows are sorted by this column before saving (MongoDB gives no order guarantee); None keeps fetch order
+DATA_INGESTION_SORT_COLUMN = "id"
+# Rows go to train or test by a hash of this column, so a row keeps its side of the split in
+# every run as data is added (incremental training never scores rows its trees were fitted on);
+# None, or data without the column, falls back to the seeded random split
+DATA_INGESTION_SPLIT_HASH_COLUMN = "id"
 
 
 
 # MODEL TRAINING
 
+# Registered backends live in components/model_backends.py
+MODEL_TRAINER_BACKEND: str = "random_forest"
+
 MODEL_TRAINER_N_ESTIMATORS=200
 MODEL_TRAINER_MIN_SAMPLES_SPLIT: int = 7
 MODEL_TRAINER_MIN_SAMPLES_LEAF: int = 6
@@ -11,10 +22,214 @@ MIN_SAMPLES_SPLIT_MAX_DEPTH: int = 10
 MIN_SAMPLES_SPLIT_CRITERION: str = 'entropy'
 MIN_SAMPLES_SPLIT_RANDOM_STATE: int = 101
 
+# "parallel" refits from scratch, "incremental" grows the previous run's model (warm start)
+MODEL_TRAINER_TRAINING_MODE: str = "parallel"
+MODEL_TRAINER_N_JOBS: int = -1
+# Fraction of train rows drawn per tree (None = full bootstrap); bounds per-tree memory
+MODEL_TRAINER_MAX_SAMPLES = None
+# Trees (or boosting iterations) added to the previous model in incremental mode
+MODEL_TRAINER_INCREMENTAL_N_ESTIMATORS: int = 50
+
+# Imbalance handling before fitting: None, "undersample" or "balanced_bagging"
+MODEL_TRAINER_SAMPLING_STRATEGY = None
+# Minority/majority ratio kept by the sampler (1.0 = balanced classes)
+MODEL_TRAINER_SAMPLING_RATIO: float = 1.0
+# Estimators in the balanced bagging ensemble for backends that are not forests
+MODEL_TRAINER_BALANCED_BAGGING_N_ESTIMATORS: int = 10
+
+# hist_gradient_boosting backend
+MODEL_TRAINER_HGB_MAX_ITER: int = 200
+MODEL_TRAINER_HGB_LEARNING_RATE: float = 0.1
+MODEL_TRAINER_HGB_MAX_LEAF_NODES: int = 31
+MODEL_TRAINER_HGB_MIN_SAMPLES_LEAF: int = 20
+
+
+# MODEL TUNING (successive halving)
+
+# Off by default: the search runs inside the synchronous /train request
+MODEL_TUNER_ENABLED: bool = False
+MODEL_TUNER_TIME_BUDGET_SECONDS: int = 120
+MODEL_TUNER_N_WORKERS = None  # None = one worker process per core
+MODEL_TUNER_N_CANDIDATES: int = 27
+MODEL_TUNER_HALVING_FACTOR: int = 3
+MODEL_TUNER_MIN_RESOURCE: int = 5000  # train rows used in the first round
+MODEL_TUNER_VALIDATION_SPLIT: float = 0.2
+MODEL_TUNER_SCORING: str = "roc_auc"
+# Search spaces per backend
+MODEL_TUNER_PARAM_GRID: dict = {
+    "n_estimators": [100, 200, 300],
+    "min_samples_split": [2, 4, 7, 10],
+    "min_samples_leaf": [1, 3, 6, 10],
+    "max_depth": [6, 8, 10, 14, None],
+    "criterion": ["gini", "entropy"],
+}
+MODEL_TUNER_HGB_PARAM_GRID: dict = {
+    "max_iter": [100, 200, 400],
+    "learning_rate": [0.03, 0.1, 0.2],
+    "max_leaf_nodes": [15, 31, 63],
+    "max_depth": [6, 10, None],
+    "min_samples_leaf": [20, 50, 100],
+    "l2_regularization": [0.0, 1.0],
+}
+
+
+
+# MODEL EVALUATION
+
+# Rows scored per predict_proba call
+MODEL_EVALUATION_CHUNK_SIZE: int = 50000
+MODEL_EVALUATION_CALIBRATION_BINS: int = 10
+# Evenly spaced thresholds in [0, 1] reported in the threshold sweep
+MODEL_EVALUATION_SWEEP_POINTS: int = 101
+# Bootstrap confidence intervals (0 replicates disables them)
+MODEL_EVALUATION_BOOTSTRAP_REPLICATES: int = 1000
+MODEL_EVALUATION_BOOTSTRAP_TIME_BUDGET_SECONDS: int = 60
+MODEL_EVALUATION_BOOTSTRAP_CONFIDENCE: float = 0.95
+MODEL_EVALUATION_BOOTSTRAP_N_WORKERS = None  # None = one worker process per core
+# Bound on the memory of all bootstrap blocks running at once; sets block size and worker count
+MODEL_EVALUATION_BOOTSTRAP_MEMORY_MB: float = 1024
+
+
+# MODEL CROSS-VALIDATION (optional pipeline stage)
+
+MODEL_CV_ENABLED: bool = False
+# Stratified folds of the train split, fitted concurrently in a process pool
+MODEL_CV_N_FOLDS: int = 5
+MODEL_CV_N_WORKERS = None  # None = min(folds, cores)
+# Bound on the fold fit rows materialized at once; caps how many folds are fitted concurrently
+MODEL_CV_MEMORY_MB: float = 1024
+
+
+# MODEL COMPACTION (random forest only)
+
+MODEL_COMPACTION_ENABLED: bool = True
+# Largest allowed drop of each metric on the test split, compact vs full model
+MODEL_COMPACTION_TOLERANCE: float = 0.005
+MODEL_COMPACTION_METRICS: list = ["accuracy", "roc_auc"]
+# Leaf probabilities are stored as "uint8" (1/255 steps) or "float16"
+MODEL_COMPACTION_LEAF_DTYPE: str = "uint8"
+# Test rows used to rank trees; the rest of the split checks the tolerance
+MODEL_COMPACTION_SELECTION_FRACTION: float = 0.5
+MODEL_COMPACTION_MAX_SELECTION_ROWS: int = 20000
+# Held-out test rows (at most this many) the compact model must match the full forest on
+MODEL_COMPACTION_MAX_CHECK_ROWS: int = 50000
+# Serve the compact model when it passed the tolerance check
+MODEL_SERVING_PREFER_COMPACT: bool = True
+
+
+
+
+# TRAINING PIPELINE (stage DAG)
+
+# Stages that may run at the same time once their inputs are ready
+PIPELINE_MAX_PARALLEL_STAGES: int = 2
+# Fail the validation stage (and everything after it) when the data does not match schema.yaml
+PIPELINE_FAIL_ON_VALIDATION_ERROR: bool = True
+# Completion markers live in artifacts/<run_id>/<PIPELINE_STAGE_MARKER_DIR>/<stage>.yaml
+PIPELINE_STAGE_MARKER_DIR: str = "_stages"
+# Per-stage wall/CPU time, peak memory, I/O and row counts, written to artifacts/<run_id>/<file>
+PIPELINE_PROFILE_FILE: str = "run_profile.yaml"
+# Seconds between resident-memory samples while a stage runs
+PIPELINE_PROFILE_SAMPLE_SECONDS: float = 0.05
+# Stage to run under cProfile and tracemalloc (None: off); dumps go to artifacts/<run_id>/<dir>
+PIPELINE_PROFILE_DEEP_STAGE = None
+PIPELINE_PROFILE_DEEP_DIR: str = "_profile"
+
+
+# ARTIFACT REGISTRY
+
+ARTIFACTS_DIR: str = "artifacts"
+# Index of runs, stage statuses, sizes and the promoted/pinned runs, under ARTIFACTS_DIR
+ARTIFACT_MANIFEST_FILE: str = "manifest.yaml"
+# Content-addressed store for run outputs (data splits, arrays, models), under ARTIFACTS_DIR
+ARTIFACT_BLOB_DIR: str = "blobs"
+# Data splits (CSV) are stored as content-defined chunks of about this many rows (at most 4x),
+# so data that changed in a few rows only stores and writes the chunks holding them
+ARTIFACT_BLOB_CHUNK_ROWS: int = 16384
+# Garbage-collect old runs at the end of every training pipeline run
+ARTIFACT_RETENTION_ENABLED: bool = True
+# Newest runs always kept; promoted and pinned runs are kept regardless
+ARTIFACT_RETENTION_KEEP_LAST: int = 10
+# Also keep every run younger than this many days (None: age is not considered)
+ARTIFACT_RETENTION_MAX_AGE_DAYS = None
+# A stage still "running" for longer than the retention window (this many hours when
+# ARTIFACT_RETENTION_MAX_AGE_DAYS is None) was left by a killed process; GC marks it failed
+ARTIFACT_RETENTION_STALE_RUNNING_HOURS: float = 24
+
+
+# SERVING: champion/challenger shadow scoring
+
+SHADOW_MODE_ENABLED: bool = True
+# Batches waiting for the challenger; when full, new batches are not shadowed
+SHADOW_QUEUE_SIZE: int = 256
+# Most recent latencies kept per model for the percentiles
+SHADOW_LATENCY_WINDOW: int = 2048
+# How often the background worker looks for a newer trained run
+SHADOW_REFRESH_SECONDS: int = 30
+
+
+# SERVING: warm-up and scoring buffers
+
+# Batch sizes scored on startup, with rows from the run's test split, before /ready reports ready
+SERVING_WARMUP_BATCH_SIZES: list = [1, 8, 64]
+SERVING_WARMUP_ROUNDS: int = 3
+# Rows per preallocated model-input buffer; larger requests are scored in chunks of this size
+SERVING_BUFFER_ROWS: int = 256
+# Buffers preallocated per loaded model, i.e. requests scored concurrently without allocating
+SERVING_BUFFER_POOL_SIZE: int = 8
+# Rows per request that get feature contributions with explain=true; the rest are only scored
+EXPLAIN_MAX_ROWS: int = 100
+
+
+# SERVING: score by customer id
+
+# Encoded feature rows of the latest ingestion, kept in memory for POST /predict/by-id
+FEATURE_INDEX_ENABLED: bool = True
+# How often a lookup checks, in the background, whether a newer ingestion run exists
+FEATURE_INDEX_REFRESH_SECONDS: int = 30
+# Most ids accepted per request
+FEATURE_INDEX_MAX_IDS: int = 10000
+
+
+# SERVING: admission control and load shedding
+
+ADMISSION_CONTROL_ENABLED: bool = True
+ADMISSION_MAX_IN_FLIGHT = None  # requests scored at once; None = one per core
+# Requests waiting for a scoring slot; beyond it requests get 503
+ADMISSION_MAX_QUEUE_DEPTH: int = 64
+# Requests with at most this many rows are interactive and wait ahead of bulk batches
+ADMISSION_SMALL_REQUEST_ROWS: int = 16
+# Latency budget per class; callers can shorten it with the X-Request-Deadline-Ms header
+ADMISSION_INTERACTIVE_BUDGET_SECONDS: float = 1.0
+ADMISSION_BULK_BUDGET_SECONDS: float = 10.0
+
+
+# SERVING: pinned model versions
 
+# Bundles of runs requested by version (X-Model-Version header or /models/<run_id>/predict)
+MODEL_VERSIONS_ENABLED: bool = True
+# Least recently used unpinned versions are evicted beyond this resident size
+MODEL_VERSIONS_MEMORY_BUDGET_MB: float = 1024
+# Never evicted, besides the registry's pinned runs, the promoted run and the latest trained run
+MODEL_VERSIONS_PINNED: list = []
+MODEL_VERSION_HEADER: str = "X-Model-Version"
 
 
+# SERVING: prediction write-back (every scored row is persisted to MongoDB)
 
+PREDICTION_SINK_ENABLED: bool = True
+# Collection in the DB_NAME database; the PREDICTION_COLLECTION_NAME env var overrides it
+PREDICTION_SINK_COLLECTION: str = "predictions"
+# Rows buffered in memory; a request that does not fit is written to the spill directory
+PREDICTION_SINK_MAX_BUFFER_ROWS: int = 100000
+# A bulk insert is issued when this many rows are waiting, or every PREDICTION_SINK_FLUSH_SECONDS
+PREDICTION_SINK_FLUSH_ROWS: int = 5000
+PREDICTION_SINK_FLUSH_SECONDS: float = 2.0
+# After a failed write, batches go to the spill directory for this long before MongoDB is retried
+PREDICTION_SINK_RETRY_SECONDS: float = 30
+# JSON-lines files replayed into MongoDB once it is reachable again
+PREDICTION_SINK_SPILL_DIR: str = "prediction_spill"
+PREDICTION_SINK_MONGO_TIMEOUT_MS: int = 5000
 
 
 APP_HOST = "0.0.0.0"
@@ -1,6 +1,13 @@
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import time
+import queue
+import atexit
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from from_root import from_root
 from datetime import datetime
 
@@ -9,36 +16,159 @@ LOG_DIR = 'logs'
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 MAX_LOG_SIZE = 5 * 1024 * 1024  # 5 MB
 BACKUP_COUNT = 3  # Number of backup log files to keep
+# Hand records to a background thread instead of writing them on the calling thread
+LOG_QUEUED = True
+# Inside hot_path(), keep 1 of every N debug/info records ...
+HOT_PATH_SAMPLE_EVERY = 100
+# ... and at most this many records below ERROR per second (None: no cap)
+HOT_PATH_MAX_PER_SECOND = 20
 
-# Construct log file path
+# Construct log file path; the directory and file are created when the first record is written
 log_dir_path = os.path.join(from_root(), LOG_DIR)
-os.makedirs(log_dir_path, exist_ok=True)
 log_file_path = os.path.join(log_dir_path, LOG_FILE)
 
-def configure_logger():
+_hot_path = contextvars.ContextVar("hot_path", default=False)
+
+
+@contextmanager
+def hot_path():
+    """Marks the enclosed code as per-request; its routine log records are sampled."""
+    token = _hot_path.set(True)
+    try:
+        yield
+    finally:
+        _hot_path.reset(token)
+
+
+class HotPathFilter(logging.Filter):
     """
-    Configures logging with a rotating file handler and a console handler.
+    Thins out records logged inside hot_path(). Errors always pass; debug/info records are kept
+    once every sample_every records; debug/info/warning records are capped at max_per_second.
+    It is attached to the root logger, so it sees each record logged through it once, before
+    the record is formatted or queued, and dropped records cost almost nothing. Records that
+    propagate from named loggers skip it.
     """
-    # Create a custom logger
-    logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    
+    def __init__(self, sample_every: int = HOT_PATH_SAMPLE_EVERY, max_per_second: int = HOT_PATH_MAX_PER_SECOND):
+        super().__init__()
+        self.sample_every = sample_every
+        self.max_per_second = max_per_second
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._window_start = 0.0
+        self._window_count = 0
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR or not _hot_path.get():
+            return True
+        if record.levelno < logging.WARNING and next(self._counter) % self.sample_every:
+            self.dropped += 1
+            return False
+        if self.max_per_second is not None:
+            now = time.monotonic()
+            with self._lock:
+                if now - self._window_start >= 1.0:
+                    self._window_start, self._window_count = now, 0
+                self._window_count += 1
+                if self._window_count > self.max_per_second:
+                    self.dropped += 1
+                    return False
+        return True
+
+
+hot_path_filter = HotPathFilter()
+_installed = []
+_listener = None
+
+
+class _LazyRotatingFileHandler(RotatingFileHandler):
+    """Rotating file handler that creates its directory and file on the first emit, not at import."""
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def _build_handlers() -> list:
     # Define formatter
     formatter = logging.Formatter("[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s")
 
     # File handler with rotation
-    file_handler = RotatingFileHandler(log_file_path, maxBytes=MAX_LOG_SIZE, backupCount=BACKUP_COUNT)
+    file_handler = _LazyRotatingFileHandler(log_file_path, maxBytes=MAX_LOG_SIZE, backupCount=BACKUP_COUNT)
     file_handler.setFormatter(formatter)
     file_handler.setLevel(logging.DEBUG)
-    
+
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
     console_handler.setLevel(logging.INFO)
-    
+    return [file_handler, console_handler]
+
+
+_handlers = _build_handlers()
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        # Drains the queue, so records logged just before exit still reach the handlers
+        _listener.stop()
+        _listener = None
+
+
+def configure_logger(queued: bool = LOG_QUEUED, sample_hot_path: bool = True):
+    """
+    Configures logging with a rotating file handler and a console handler.
+
+    With queued=True the root logger only gets a QueueHandler and a QueueListener thread does
+    the file/console I/O. With sample_hot_path, records logged inside hot_path() are sampled.
+    Calling it again replaces the previous configuration. Importing this module configures
+    synchronous handlers only; entry points (app.py, the training pipeline) call
+    configure_logger() to start the listener thread.
+    """
+    global _listener
+    # Create a custom logger
+    logger = logging.getLogger()
+    logger.setLevel(logging.DEBUG)
+
+    for handler in _installed:
+        logger.removeHandler(handler)
+    _installed.clear()
+    _stop_listener()
+    logger.removeFilter(hot_path_filter)
+    if sample_hot_path:
+        logger.addFilter(hot_path_filter)
+
+    if queued:
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+        _listener.start()
+        _installed.append(QueueHandler(log_queue))
+    else:
+        _installed.extend(_handlers)
+
     # Add handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    for handler in _installed:
+        logger.addHandler(handler)
+
+
+def _after_fork_in_child() -> None:
+    # The listener thread does not survive fork: forked workers write synchronously
+    global _listener
+    if _listener is not None:
+        _listener = None
+        logger = logging.getLogger()
+        for handler in _installed:
+            logger.removeHandler(handler)
+        _installed[:] = _handlers
+        for handler in _handlers:
+            logger.addHandler(handler)
+
 
-# Configure the logger
-configure_logger()
\ No newline at end of file
+# Synchronous until an entry point starts the listener thread with configure_logger()
+configure_logger(queued=False)
+atexit.register(_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
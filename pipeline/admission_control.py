@@ -0,0 +1,187 @@
+import os
+import math
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+
+import numpy as np
+
+from logger import logging
+from constants import (
+    ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE_DEPTH, ADMISSION_SMALL_REQUEST_ROWS,
+    ADMISSION_INTERACTIVE_BUDGET_SECONDS, ADMISSION_BULK_BUDGET_SECONDS
+)
+
+INTERACTIVE, BULK = 0, 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+# Weight of the newest observation in the service time estimates
+_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """A request shed by admission control; carries the HTTP status and the Retry-After seconds."""
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds how much scoring runs at once and how long requests may wait for it.
+
+    At most max_in_flight requests are scored concurrently; the rest wait in a priority queue
+    where small (interactive) requests go before bulk batches, first come first served within
+    a class. Every request has a deadline (its class budget, or the caller's own when
+    shorter). A request is rejected up front instead of queued when the queue is full
+    (503) or when the estimated wait plus its own scoring time would overrun its deadline
+    (429); one whose deadline passes while queued is dropped (503) rather than scored late.
+    Rejections carry Retry-After, the estimated time for the backlog to drain.
+
+    Scoring time is estimated as base_seconds + rows * row_seconds, both learned from completed
+    requests. Runs on the event loop: all state changes happen on one thread, without locks.
+    """
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue_depth: int = ADMISSION_MAX_QUEUE_DEPTH,
+                 small_request_rows: int = ADMISSION_SMALL_REQUEST_ROWS,
+                 interactive_budget: float = ADMISSION_INTERACTIVE_BUDGET_SECONDS,
+                 bulk_budget: float = ADMISSION_BULK_BUDGET_SECONDS):
+        self.max_in_flight = max_in_flight or os.cpu_count() or 1
+        self.max_queue_depth = max_queue_depth
+        self.small_request_rows = small_request_rows
+        self.budgets = {INTERACTIVE: interactive_budget, BULK: bulk_budget}
+        self.base_seconds = 0.01
+        self.row_seconds = 1e-4
+        self._in_flight = {}
+        self._tokens = itertools.count()
+        self._queue = []
+        self._queued = {INTERACTIVE: 0, BULK: 0}
+        self._queued_cost = {INTERACTIVE: 0.0, BULK: 0.0}
+        self._wait_times = deque(maxlen=2048)
+        self.counters = {"admitted": 0, "completed": 0, "shed_queue_full": 0, "shed_deadline": 0, "expired_in_queue": 0}
+
+    def estimate(self, rows: int) -> float:
+        return self.base_seconds + rows * self.row_seconds
+
+    def _remaining_in_flight(self, now: float) -> float:
+        return sum(max(cost - (now - started), 0.0) for started, cost in self._in_flight.values())
+
+    def _can_start(self, priority: int) -> bool:
+        queued_ahead = sum(n for p, n in self._queued.items() if p <= priority)
+        return len(self._in_flight) < self.max_in_flight and not queued_ahead
+
+    def _estimated_wait(self, priority: int, now: float) -> float:
+        """Seconds until a new request of this priority would start: the work ahead of it spread over the slots."""
+        ahead = self._remaining_in_flight(now) + sum(c for p, c in self._queued_cost.items() if p <= priority)
+        return ahead / self.max_in_flight
+
+    def _retry_after(self, now: float) -> int:
+        backlog = self._remaining_in_flight(now) + sum(self._queued_cost.values())
+        return max(1, math.ceil(backlog / self.max_in_flight))
+
+    def _shed(self, reason: str, message: str, status_code: int, now: float):
+        self.counters[reason] += 1
+        retry_after = self._retry_after(now)
+        logging.warning("Shedding request (%s): %s; retry after %ss", reason, message, retry_after)
+        return AdmissionRejected(message, status_code, retry_after)
+
+    def _start(self, cost: float, now: float) -> int:
+        token = next(self._tokens)
+        self._in_flight[token] = (now, cost)
+        self.counters["admitted"] += 1
+        return token
+
+    def _dispatch(self, loop) -> None:
+        """Hands free slots to the queued requests with the best priority."""
+        while self._queue and len(self._in_flight) < self.max_in_flight:
+            priority, _, waiter, cost = heapq.heappop(self._queue)
+            if waiter.done():  # expired or cancelled while queued, already uncounted
+                continue
+            self._queued[priority] -= 1
+            self._queued_cost[priority] -= cost
+            waiter.set_result(self._start(cost, loop.time()))
+
+    def _release(self, token: int, loop) -> None:
+        """Returns a slot that was handed to a request which stopped waiting for it."""
+        self._in_flight.pop(token)
+        self.counters["admitted"] -= 1
+        self._dispatch(loop)
+
+    def _finish(self, token: int, rows: int, loop) -> None:
+        started, _ = self._in_flight.pop(token)
+        duration = loop.time() - started
+        self.counters["completed"] += 1
+        if rows <= self.small_request_rows:
+            observed = max(duration - rows * self.row_seconds, 0.0)
+            self.base_seconds += _EWMA_ALPHA * (observed - self.base_seconds)
+        else:
+            observed = max(duration - self.base_seconds, 0.0) / rows
+            self.row_seconds += _EWMA_ALPHA * (observed - self.row_seconds)
+        self._dispatch(loop)
+
+    @asynccontextmanager
+    async def admit(self, rows: int, deadline_seconds: float = None):
+        """
+        Waits for a scoring slot for a request of this many rows, or raises AdmissionRejected.
+        deadline_seconds is the caller's remaining time budget; the class budget applies when
+        it is missing or longer. A deadline that is zero or negative has already passed, so the
+        request is shed (429) even when a slot is free.
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        priority = INTERACTIVE if rows <= self.small_request_rows else BULK
+        budget = self.budgets[priority] if deadline_seconds is None else min(deadline_seconds, self.budgets[priority])
+        cost = self.estimate(rows)
+
+        if budget <= 0:
+            raise self._shed("shed_deadline", "The request deadline has already passed.", 429, now)
+        if self._can_start(priority):
+            token = self._start(cost, now)
+            self._wait_times.append(0.0)
+        else:
+            wait = self._estimated_wait(priority, now)
+            if sum(self._queued.values()) >= self.max_queue_depth:
+                raise self._shed("shed_queue_full", "Server is overloaded; the request queue is full.", 503, now)
+            if wait + cost > budget:
+                raise self._shed("shed_deadline", f"Estimated completion in {wait + cost:.2f}s exceeds the "
+                                                  f"{budget:.2f}s deadline.", 429, now)
+            waiter = loop.create_future()
+            heapq.heappush(self._queue, (priority, next(self._tokens), waiter, cost))
+            self._queued[priority] += 1
+            self._queued_cost[priority] += cost
+            try:
+                token = await asyncio.wait_for(asyncio.shield(waiter), timeout=budget - cost)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done():
+                    # The slot was handed over just as the wait ended: give it back
+                    self._release(waiter.result(), loop)
+                else:
+                    waiter.cancel()
+                    self._queued[priority] -= 1
+                    self._queued_cost[priority] -= cost
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise self._shed("expired_in_queue", "Deadline passed while waiting for a scoring slot.", 503,
+                                 loop.time()) from None
+            self._wait_times.append(loop.time() - now)
+        try:
+            yield
+        finally:
+            self._finish(token, rows, loop)
+
+    def stats(self) -> dict:
+        waits = np.array(self._wait_times) * 1e3
+        return {
+            "in_flight": len(self._in_flight),
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": {_PRIORITY_NAMES[p]: n for p, n in self._queued.items()},
+            "max_queue_depth": self.max_queue_depth,
+            **self.counters,
+            "queue_wait_ms": {
+                "p50": round(float(np.percentile(waits, 50)), 3) if len(waits) else None,
+                "p95": round(float(np.percentile(waits, 95)), 3) if len(waits) else None,
+            },
+            "estimated_base_ms": round(self.base_seconds * 1e3, 3),
+            "estimated_row_us": round(self.row_seconds * 1e6, 3),
+        }
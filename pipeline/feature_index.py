@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+from logger import logging
+from exception import MyException
+from utils.artifact_registry import ArtifactRegistry, STAGE_DIRS
+from utils.blob_store import chunk_manifest, read_csv, read_csv_chunk
+from constants import ARTIFACTS_DIR, DATA_INGESTION_SORT_COLUMN, FEATURE_INDEX_REFRESH_SECONDS
+
+# Rows encoded per preprocessor call while (re)building the index
+ENCODE_CHUNK_ROWS = 200_000
+
+
+class FeatureIndexNotReady(Exception):
+    """No index has been built yet; one is being built in the background."""
+
+
+class _IndexSnapshot:
+    """Immutable index contents; lookups read one snapshot, refreshes swap in a new one."""
+    def __init__(self, ingestion_run_id: str, bundle, ids: np.ndarray, row_hashes: np.ndarray, features: np.ndarray,
+                 chunks: dict):
+        self.ingestion_run_id = ingestion_run_id
+        self.bundle = bundle
+        self.ids = ids
+        self.row_hashes = row_hashes
+        self.features = features
+        # Ids and row hashes of every raw data chunk read, by chunk sha256
+        self.chunks = chunks
+
+
+class FeatureIndex:
+    """
+    Model-ready feature rows of every customer in the latest ingestion, looked up by id.
+
+    The index is a sorted int64 id array, a row-aligned (n, n_features) matrix already encoded
+    by the serving model's preprocessor, and a hash of every raw row. A lookup is one
+    searchsorted over the ids and one fancy-indexing gather, and the gathered rows are scored
+    in one call.
+
+    When a newer ingestion run appears, refresh() reads and hashes only the chunks of its raw
+    data (see BlobStore.save_csv) it has not seen, and re-encodes only the rows that are new or
+    whose hash changed; unchanged rows are copied from the current matrix and ids no longer
+    present are dropped. A different serving bundle (new champion) re-encodes everything,
+    since its preprocessor may differ.
+
+    Requests never build the index: a stale or missing index is rebuilt on a background
+    thread while lookups keep using the current snapshot, scored by the bundle it was encoded
+    for. Before the first snapshot exists, lookups raise FeatureIndexNotReady.
+    """
+    def __init__(self, base_dir: str = ARTIFACTS_DIR, refresh_seconds: int = FEATURE_INDEX_REFRESH_SECONDS):
+        self.registry = ArtifactRegistry(base_dir)
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._refreshing = False
+        self._refreshing_lock = threading.Lock()
+
+    @staticmethod
+    def _ids_and_hashes(df: pd.DataFrame) -> tuple:
+        return df[DATA_INGESTION_SORT_COLUMN].to_numpy(dtype=np.int64), pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    def _raw_rows(self, run_id: str, target_column: str, known_chunks: dict) -> tuple:
+        """
+        Returns (ids, row_hashes, load_rows, chunks) of the ingestion's raw rows: ids unique (a
+        customer ingested twice keeps its latest row) and sorted, load_rows(positions) giving the
+        raw rows at those positions, and the ids and hashes per chunk. Chunks found in
+        known_chunks are not read unless load_rows needs their rows.
+        """
+        raw_path = os.path.join(self.registry.run_dir(run_id), STAGE_DIRS["data_ingestion"], "raw", "raw_data.csv")
+        manifest = chunk_manifest(raw_path)
+        if manifest is None:
+            # A plain CSV (runs ingested before chunking): read whole
+            df = read_csv(raw_path).drop(columns=[target_column], errors="ignore")
+            df = df.drop_duplicates(subset=DATA_INGESTION_SORT_COLUMN, keep="last")
+            df = df.sort_values(DATA_INGESTION_SORT_COLUMN, kind="stable", ignore_index=True)
+            ids, row_hashes = self._ids_and_hashes(df)
+            return ids, row_hashes, lambda positions: df.iloc[positions], {}
+
+        frames, chunks, parts = {}, {}, []
+        for i, chunk in enumerate(manifest["chunks"]):
+            entry = known_chunks.get(chunk["sha256"])
+            if entry is None:
+                frames[i] = read_csv_chunk(raw_path, manifest, chunk).drop(columns=[target_column], errors="ignore")
+                entry = self._ids_and_hashes(frames[i])
+            chunks[chunk["sha256"]] = entry
+            parts.append(entry)
+        all_ids = np.concatenate([ids for ids, _ in parts]) if parts else np.empty(0, dtype=np.int64)
+        all_hashes = np.concatenate([h for _, h in parts]) if parts else np.empty(0, dtype=np.uint64)
+        chunk_of = np.repeat(np.arange(len(parts)), [len(ids) for ids, _ in parts])
+        row_in_chunk = np.concatenate([np.arange(len(ids)) for ids, _ in parts]) if parts else np.empty(0, dtype=np.int64)
+        # Last occurrence of every id, in id order
+        ids, first_reversed = np.unique(all_ids[::-1], return_index=True)
+        keep = len(all_ids) - 1 - first_reversed
+
+        def load_rows(positions: np.ndarray) -> pd.DataFrame:
+            source_chunk, source_row = chunk_of[keep[positions]], row_in_chunk[keep[positions]]
+            order = np.argsort(source_chunk, kind="stable")
+            pieces = []
+            for i in np.unique(source_chunk):
+                if i not in frames:
+                    frames[i] = read_csv_chunk(raw_path, manifest, manifest["chunks"][i]).drop(
+                        columns=[target_column], errors="ignore")
+                pieces.append(frames[i].iloc[source_row[source_chunk == i]])
+            rows = pd.concat(pieces, ignore_index=True)
+            # Back from chunk order to the order of positions
+            return rows.iloc[np.argsort(order)].reset_index(drop=True)
+        return ids, all_hashes[keep], load_rows, chunks
+
+    @staticmethod
+    def _encode(bundle, rows: pd.DataFrame) -> np.ndarray:
+        encoded = np.empty((len(rows), bundle.n_features), dtype=bundle.input_dtype)
+        for start in range(0, len(rows), ENCODE_CHUNK_ROWS):
+            chunk = rows.iloc[start:start + ENCODE_CHUNK_ROWS].reset_index(drop=True)
+            encoded[start:start + len(chunk)] = bundle.transform(chunk)
+        return encoded
+
+    def refresh(self, bundle) -> bool:
+        """Brings the index up to date with the latest ingestion and bundle; True when it changed."""
+        try:
+            with self._lock:
+                run_id = self.registry.latest_run_id("data_ingestion")
+                if run_id is None:
+                    raise FileNotFoundError("No completed data ingestion run to index.")
+                current = self._snapshot
+                if current is not None and current.ingestion_run_id == run_id and current.bundle is bundle:
+                    return False
+
+                start = time.perf_counter()
+                target_column = bundle._dt._schema_config.get("target_column")
+                ids, row_hashes, load_rows, chunks = self._raw_rows(
+                    run_id, target_column, current.chunks if current is not None else {})
+
+                features = np.empty((len(ids), bundle.n_features), dtype=bundle.input_dtype)
+                unchanged = np.zeros(len(ids), dtype=bool)
+                if current is not None and current.bundle is bundle and len(current.ids):
+                    positions = np.minimum(np.searchsorted(current.ids, ids), len(current.ids) - 1)
+                    unchanged = (current.ids[positions] == ids) & (current.row_hashes[positions] == row_hashes)
+                    features[unchanged] = current.features[positions[unchanged]]
+                changed = np.flatnonzero(~unchanged)
+                if len(changed):
+                    features[changed] = self._encode(bundle, load_rows(changed))
+
+                self._snapshot = _IndexSnapshot(run_id, bundle, ids, row_hashes, features, chunks)
+                logging.info(f"Feature index built from ingestion {run_id} for model run {bundle.run_id}: "
+                             f"{len(ids)} ids, {len(changed)} rows encoded, {len(ids) - len(changed)} reused, "
+                             f"{features.nbytes / 2**20:.1f} MB, {time.perf_counter() - start:.2f}s")
+                return True
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _refresh_in_background(self, bundle) -> None:
+        try:
+            self.refresh(bundle)
+        except Exception as e:
+            logging.error(f"Feature index refresh failed; serving the previous index: {e}")
+        finally:
+            self._refreshing = False
+
+    def _snapshot_for(self, bundle) -> _IndexSnapshot:
+        """
+        Current snapshot. Starts a background refresh when it was built for another bundle (or
+        not at all) and every refresh_seconds otherwise; never waits for one.
+        """
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is None or snapshot.bundle is not bundle or now - self._last_check >= self.refresh_seconds:
+            with self._refreshing_lock:
+                start = not self._refreshing
+                if start:
+                    self._last_check = now
+                    self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, args=(bundle,), name="feature-index-refresh",
+                                 daemon=True).start()
+        if snapshot is None:
+            raise FeatureIndexNotReady("The feature index is being built; retry shortly.")
+        return snapshot
+
+    def lookup(self, ids, bundle) -> tuple:
+        """
+        Returns (found mask per requested id, encoded feature rows of the found ids, the bundle
+        the rows were encoded for). That bundle is the given one once the index caught up with it.
+        """
+        snapshot = self._snapshot_for(bundle)
+        query = np.asarray(ids, dtype=np.int64)
+        if not len(snapshot.ids):
+            return np.zeros(len(query), dtype=bool), snapshot.features[:0], snapshot.bundle
+        positions = np.minimum(np.searchsorted(snapshot.ids, query), len(snapshot.ids) - 1)
+        found = snapshot.ids[positions] == query
+        return found, snapshot.features[positions[found]], snapshot.bundle
+
+    def predict(self, ids, bundle) -> tuple:
+        """
+        Scores the ids in one vectorized call. Returns (predictions with None for unknown ids,
+        missing ids, the run id of the model that scored them).
+        """
+        found, features, scored_by = self.lookup(ids, bundle)
+        predictions = [None] * len(found)
+        if len(features):
+            for i, prediction in zip(np.flatnonzero(found), scored_by.predict_array(features).tolist()):
+                predictions[i] = prediction
+        missing = [ids[i] for i in np.flatnonzero(~found)]
+        return predictions, missing, scored_by.run_id
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"ingestion_run_id": None, "model_run_id": None, "ids": 0, "size_mb": 0.0}
+        return {
+            "ingestion_run_id": snapshot.ingestion_run_id,
+            "model_run_id": snapshot.bundle.run_id,
+            "ids": int(len(snapshot.ids)),
+            "size_mb": round((snapshot.features.nbytes + snapshot.ids.nbytes + snapshot.row_hashes.nbytes) / 2**20, 1),
+        }
+
+
+_feature_index = None
+_feature_index_lock = threading.Lock()
+
+
+def get_feature_index() -> FeatureIndex:
+    """Process-wide FeatureIndex, created on first use."""
+    global _feature_index
+    if _feature_index is None:
+        with _feature_index_lock:
+            if _feature_index is None:
+                _feature_index = FeatureIndex()
+    return _feature_index
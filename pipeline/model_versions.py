@@ -0,0 +1,294 @@
+import time
+import pickle
+import weakref
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from logger import logging
+from pipeline.prediction_pipeline import get_inference_bundle, release_inference_bundle, cached_inference_bundles
+from utils.artifact_registry import ArtifactRegistry
+from utils.main_utils import latency_summary
+from constants import (
+    ARTIFACTS_DIR, MODEL_VERSIONS_MEMORY_BUDGET_MB, MODEL_VERSIONS_PINNED, SHADOW_LATENCY_WINDOW,
+    SERVING_BUFFER_ROWS, SERVING_BUFFER_POOL_SIZE
+)
+
+# Name under which this module holds bundles in the shared inference bundle cache
+_HOLDER = "model_versions"
+
+
+class UnknownModelVersion(Exception):
+    """The requested version is not a run that completed training."""
+
+
+class _ByteCounter:
+    """File-like sink that only counts what pickle writes to it."""
+    def __init__(self):
+        self.nbytes = 0
+
+    def write(self, data) -> int:
+        self.nbytes += len(data)
+        return len(data)
+
+
+# Pickled size per model, preprocessor or forest object, measured once: they are never mutated
+# after loading, while a bundle is re-measured whenever its explainer or sharing changes
+_pickled_sizes = weakref.WeakKeyDictionary()
+_pickled_sizes_lock = threading.Lock()
+
+
+def _pickled_nbytes(obj) -> int:
+    with _pickled_sizes_lock:
+        nbytes = _pickled_sizes.get(obj)
+    if nbytes is None:
+        counter = _ByteCounter()
+        pickle.dump(obj, counter, protocol=pickle.HIGHEST_PROTOCOL)
+        nbytes = counter.nbytes
+        with _pickled_sizes_lock:
+            _pickled_sizes[obj] = nbytes
+    return nbytes
+
+
+def bundle_nbytes(bundle) -> int:
+    """
+    Approximate resident size of a bundle: its pickled model and preprocessor plus the scoring
+    buffers and, once an explain request built it, the explainer's node matrix and the full
+    forest it walks when a compact model is served.
+    """
+    objects = [bundle.model, bundle.preprocessor]
+    explainer = bundle.loaded_explainer
+    if explainer is not None and explainer.forest is not bundle.model:
+        objects.append(explainer.forest)
+    arrays = SERVING_BUFFER_POOL_SIZE * SERVING_BUFFER_ROWS * bundle.n_features * np.dtype(bundle.input_dtype).itemsize
+    if explainer is not None:
+        arrays += explainer.deltas.data.nbytes + explainer.deltas.indices.nbytes + explainer.deltas.indptr.nbytes
+    return sum(_pickled_nbytes(obj) for obj in objects if obj is not None) + arrays
+
+
+class _Version:
+    def __init__(self, bundle, nbytes: int):
+        self.bundle = bundle
+        self.nbytes = nbytes
+        # Whether nbytes already includes the explainer
+        self.explained = bundle.loaded_explainer is not None
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.latency = deque(maxlen=SHADOW_LATENCY_WINDOW)
+
+
+class ModelVersionStore:
+    """
+    Inference bundles of explicitly requested training runs, kept resident under a memory budget.
+
+    Callers pick a run id per request; its bundle is loaded on first use and then served from
+    memory. When the resident bundles exceed the budget, the least recently used ones are
+    evicted, except pinned versions: the runs pinned in MODEL_VERSIONS_PINNED or in the
+    artifact registry (which also keeps them from garbage collection), the promoted run and
+    the latest trained run, i.e. the versions the default /predict path serves. An evicted
+    version is reloaded on its next request.
+
+    Loads share the bundle cache of the default path, so a version that is also the champion
+    is held once, and an evicted version stays cached while shadow scoring still holds it.
+    Bundles cached for the default path and shadow scoring count against the budget too, as
+    does a version's explainer once an explain request loads it. Requests, rows, errors and
+    latency are recorded per version.
+    """
+    def __init__(self, base_dir: str = ARTIFACTS_DIR, memory_budget_mb: float = MODEL_VERSIONS_MEMORY_BUDGET_MB,
+                 pinned: list = MODEL_VERSIONS_PINNED):
+        self.registry = ArtifactRegistry(base_dir)
+        self.memory_budget_bytes = int(memory_budget_mb * 2**20)
+        self.configured_pins = set(pinned or [])
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes loads, so hits on resident versions never wait for one
+        self._load_lock = threading.Lock()
+        # Sizes of cached bundles this store does not hold: run_dir -> (bundle ref, explained, nbytes)
+        self._shared = {}
+        self._shared_nbytes = 0
+        self.counters = {"hits": 0, "loads": 0, "evictions": 0}
+
+    def pinned(self) -> set:
+        manifest = self.registry.manifest()
+        pins = set(self.configured_pins) | set(manifest["pinned"])
+        pins.update(r for r in (manifest["promoted"], manifest["latest_completed"].get("model_training")) if r)
+        return pins
+
+    def _measure_shared(self) -> int:
+        """
+        Re-measures the cached bundles of the default path and shadow scoring that this store
+        does not hold; each is only pickled again when it is new or has loaded its explainer.
+        """
+        own = {self.registry.run_dir(run_id) for run_id in self._versions}
+        shared = {}
+        for run_dir, bundle in cached_inference_bundles().items():
+            if run_dir in own:
+                continue
+            explained = bundle.loaded_explainer is not None
+            entry = self._shared.get(run_dir)
+            if entry is None or entry[0]() is not bundle or entry[1] != explained:
+                entry = (weakref.ref(bundle), explained, bundle_nbytes(bundle))
+            shared[run_dir] = entry
+        self._shared = shared
+        self._shared_nbytes = sum(nbytes for _, _, nbytes in shared.values())
+        return self._shared_nbytes
+
+    def _evict(self, pinned: set) -> None:
+        """Drops least recently used unpinned versions until the resident size fits the budget."""
+        resident = sum(v.nbytes for v in self._versions.values()) + self._shared_nbytes
+        for run_id in list(self._versions):
+            if resident <= self.memory_budget_bytes:
+                break
+            if run_id in pinned:
+                continue
+            version = self._versions.pop(run_id)
+            run_dir = self.registry.run_dir(run_id)
+            release_inference_bundle(run_dir, holder=_HOLDER)
+            if run_dir in cached_inference_bundles():
+                # Still held by another holder: the memory stays resident, now as a shared bundle
+                self._shared[run_dir] = (weakref.ref(version.bundle), version.explained, version.nbytes)
+                self._shared_nbytes += version.nbytes
+            else:
+                resident -= version.nbytes
+            self.counters["evictions"] += 1
+            logging.info(f"Evicted model version {run_id} ({version.nbytes / 2**20:.1f} MB)")
+        if resident > self.memory_budget_bytes:
+            logging.warning(f"Resident model versions use {resident / 2**20:.1f} MB, over the "
+                            f"{self.memory_budget_bytes / 2**20:.1f} MB budget; the rest are pinned or "
+                            f"cached for the default path and shadow scoring")
+
+    def _version(self, run_id: str) -> _Version:
+        with self._lock:
+            version = self._versions.get(run_id)
+            if version is not None:
+                self._versions.move_to_end(run_id)
+                self.counters["hits"] += 1
+                return version
+        with self._load_lock:
+            with self._lock:
+                version = self._versions.get(run_id)
+            if version is not None:
+                return version
+            run = self.registry.manifest()["runs"].get(run_id)
+            if run is None or run["stages"].get("model_training") != "completed":
+                raise UnknownModelVersion(f"Unknown model version '{run_id}': no run with a completed training stage.")
+            start = time.perf_counter()
+            bundle = get_inference_bundle(self.registry.run_dir(run_id), holder=_HOLDER)
+            version = _Version(bundle, bundle_nbytes(bundle))
+            logging.info(f"Loaded model version {run_id} ({version.nbytes / 2**20:.1f} MB) "
+                         f"in {time.perf_counter() - start:.2f}s")
+            pinned = self.pinned()
+            with self._lock:
+                self._versions[run_id] = version
+                self.counters["loads"] += 1
+            # Measured outside self._lock, so hits do not wait on pickling other bundles
+            self._measure_shared()
+            with self._lock:
+                # The version just loaded is about to serve a request: never its own eviction victim
+                self._evict(pinned | {run_id})
+            return version
+
+    def _remeasure(self, run_id: str, version: _Version) -> None:
+        """Counts the explainer (and full forest) an explain request just loaded into a version."""
+        with self._load_lock:
+            if version.explained:
+                return
+            version.nbytes = bundle_nbytes(version.bundle)
+            version.explained = True
+            logging.info(f"Model version {run_id} loaded its explainer; now {version.nbytes / 2**20:.1f} MB")
+            pinned = self.pinned()
+            self._measure_shared()
+            with self._lock:
+                if self._versions.get(run_id) is version:
+                    self._evict(pinned | {run_id})
+
+    def _record(self, version: _Version, rows: int, start: float, failed: bool) -> None:
+        with self._lock:
+            version.requests += 1
+            version.last_used = time.time()
+            if failed:
+                version.errors += 1
+            else:
+                version.rows += rows
+                version.latency.append(time.perf_counter() - start)
+
+    def predict(self, run_id: str, input_df: pd.DataFrame) -> list:
+        """Scores raw rows with the given training run."""
+        version = self._version(run_id)
+        start = time.perf_counter()
+        try:
+            predictions = version.bundle.predict(input_df)
+        except Exception:
+            self._record(version, len(input_df), start, failed=True)
+            raise
+        self._record(version, len(input_df), start, failed=False)
+        return predictions
+
+    def predict_explain(self, run_id: str, input_df: pd.DataFrame) -> tuple:
+        """Like predict, with feature contributions; see InferenceBundle.predict_explain."""
+        version = self._version(run_id)
+        start = time.perf_counter()
+        try:
+            result = version.bundle.predict_explain(input_df)
+        except Exception:
+            self._record(version, len(input_df), start, failed=True)
+            raise
+        self._record(version, len(input_df), start, failed=False)
+        if not version.explained:
+            self._remeasure(run_id, version)
+        return result
+
+    def pin(self, run_id: str) -> None:
+        """Pins a run in the registry: never evicted here, never garbage-collected."""
+        try:
+            self.registry.pin(run_id)
+        except ValueError as e:
+            raise UnknownModelVersion(str(e)) from e
+
+    def unpin(self, run_id: str) -> None:
+        self.registry.unpin(run_id)
+
+    def stats(self) -> dict:
+        pinned = self.pinned()
+        with self._lock:
+            versions = {
+                run_id: {
+                    "pinned": run_id in pinned,
+                    "size_mb": round(v.nbytes / 2**20, 1),
+                    "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(v.loaded_at)),
+                    "last_used": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(v.last_used)),
+                    "requests": v.requests,
+                    "rows": v.rows,
+                    "errors": v.errors,
+                    "latency": latency_summary(v.latency),
+                }
+                # Most recently used first
+                for run_id, v in reversed(self._versions.items())
+            }
+            return {
+                "resident_mb": round((sum(v.nbytes for v in self._versions.values()) + self._shared_nbytes) / 2**20, 1),
+                "shared_mb": round(self._shared_nbytes / 2**20, 1),
+                "memory_budget_mb": round(self.memory_budget_bytes / 2**20, 1),
+                "pinned": sorted(pinned),
+                **self.counters,
+                "versions": versions,
+            }
+
+
+_model_versions = None
+_model_versions_lock = threading.Lock()
+
+
+def get_model_versions() -> ModelVersionStore:
+    """Process-wide ModelVersionStore, created on first use."""
+    global _model_versions
+    if _model_versions is None:
+        with _model_versions_lock:
+            if _model_versions is None:
+                _model_versions = ModelVersionStore()
+    return _model_versions
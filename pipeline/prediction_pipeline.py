@@ -1,86 +1,295 @@
 import os
 import sys
+import time
+import queue
+import threading
+import numpy as np
 import pandas as pd
 import joblib
-from logger import logging
+import yaml
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from logger import logging, hot_path
 from exception import MyException
 from components.data_transformation import DataTransformation
+from components.model_backends import load_model
+from components.model_explanation import ForestExplainer
 from utils.main_utils import read_yaml_file
+from utils.artifact_registry import ArtifactRegistry
+from utils.blob_store import output_exists, read_csv
+from constants import (
+    SERVING_BUFFER_ROWS, SERVING_BUFFER_POOL_SIZE, SERVING_WARMUP_BATCH_SIZES, SERVING_WARMUP_ROUNDS,
+    EXPLAIN_MAX_ROWS
+)
+
+
+class InferenceBundle:
+    """
+    Everything needed to score raw rows with one training run: the model, the fitted
+    preprocessor and the column layout it expects. Loaded once and reused across requests.
+
+    Model input is copied into one of SERVING_BUFFER_POOL_SIZE preallocated, contiguous buffers
+    of the dtype the model validates to (float32 for forests), so sklearn does not convert and
+    allocate on every request. warm_up() runs the whole path once per common batch size.
+    predict_explain() adds per-feature contributions, computed from the full random forest
+    (loaded on first use when a compact model is served), beside the served model's probability.
+    """
+    def __init__(self, run_dir: str):
+        try:
+            self.run_dir = run_dir
+            self.run_id = os.path.basename(os.path.normpath(run_dir))
+            transformation_dir = os.path.join(run_dir, "data_transformation")
+
+            # Load model through the backend registry
+            self.model = load_model(run_dir)
+
+            self._dt = DataTransformation(run_dir=run_dir)
+            self._dt._schema_config = read_yaml_file("schema.yaml") or {}
+            self._transforms = [
+                self._dt._map_gender_column, self._dt._drop_id_column,
+                self._dt._create_dummy_columns, self._dt._rename_columns
+            ]
+
+            # Load fitted preprocessor if available, else fit on training data
+            preprocessor_path = os.path.join(transformation_dir, "preprocessor.pkl")
+            report_path = os.path.join(transformation_dir, "data_transformation_report.yaml")
+            report = {}
+            if os.path.exists(report_path):
+                with open(report_path) as f:
+                    report = yaml.safe_load(f) or {}
+            if os.path.exists(preprocessor_path) and report.get("input_columns"):
+                self.preprocessor = joblib.load(preprocessor_path)
+                self.expected_columns = report["input_columns"]
+                # Runs before the levels were recorded keep encoding whatever values appear
+                self._dt.category_levels = report.get("category_levels")
+            else:
+                # Runs trained before the preprocessor was saved: refit it on the run's training data
+                self._dt.prepare_data_transformation()
+                target_column = self._dt._schema_config.get("target_column")
+                input_feature_train_df = self._dt.train_df.drop(columns=[target_column], axis=1)
+                for func in self._transforms:
+                    input_feature_train_df = func(input_feature_train_df)
+                self.preprocessor = self._dt.get_data_transformer_object()
+                self.preprocessor.fit(input_feature_train_df)
+                self.expected_columns = input_feature_train_df.columns.tolist()
+
+            # Forests validate input to float32; histogram boosting to float64
+            self.input_dtype = np.float64 if isinstance(self.model, HistGradientBoostingClassifier) else np.float32
+            self.n_features = self.model.n_features_in_
+            self._buffers = queue.SimpleQueue()
+            for _ in range(SERVING_BUFFER_POOL_SIZE):
+                self._buffers.put(np.empty((SERVING_BUFFER_ROWS, self.n_features), dtype=self.input_dtype))
+            self._explainer = None
+            self._explainer_lock = threading.Lock()
+            logging.info(f"Inference bundle loaded for run {self.run_id}")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def transform(self, input_df: pd.DataFrame):
+        """Applies the training-time transformations to raw rows and aligns the columns."""
+        # Apply custom transformations to input
+        for func in self._transforms:
+            input_df = func(input_df)
+        logging.info("Custom transformations applied to input data")
+
+        # Add missing columns with default value 0
+        missing_cols = set(self.expected_columns) - set(input_df.columns)
+        if missing_cols:
+            logging.warning("Missing columns in input: %s. Filling with default 0 values.", missing_cols)
+            for col in missing_cols:
+                input_df[col] = 0
+
+        # Remove extra columns
+        extra_cols = set(input_df.columns) - set(self.expected_columns)
+        if extra_cols:
+            logging.info("Extra columns in input: %s. Dropping them.", extra_cols)
+            input_df = input_df.drop(columns=list(extra_cols))
+
+        # Reorder columns to match expected order
+        input_df = input_df[self.expected_columns]
+
+        # Transform input data
+        input_arr = self.preprocessor.transform(input_df)
+        logging.info("Input data transformed")
+        return input_arr
+
+    def predict_array(self, input_arr: np.ndarray, method: str = "predict") -> np.ndarray:
+        """Scores transformed rows through a pooled buffer, in chunks of SERVING_BUFFER_ROWS, with model.<method>."""
+        score = getattr(self.model, method)
+        try:
+            buffer = self._buffers.get_nowait()
+        except queue.Empty:
+            # More concurrent requests than pooled buffers: use a temporary one
+            buffer = np.empty((SERVING_BUFFER_ROWS, self.n_features), dtype=self.input_dtype)
+        try:
+            chunks = []
+            for start in range(0, len(input_arr), SERVING_BUFFER_ROWS):
+                rows = input_arr[start:start + SERVING_BUFFER_ROWS]
+                view = buffer[:len(rows)]
+                np.copyto(view, rows, casting="unsafe")
+                chunks.append(score(view))
+        finally:
+            self._buffers.put(buffer)
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def predict(self, input_df: pd.DataFrame) -> list:
+        # Per-request path: routine log records are sampled (see logger.hot_path)
+        with hot_path():
+            predictions = self.predict_array(self.transform(input_df))
+            logging.info("Predictions generated")
+        return predictions.tolist()
+
+    @property
+    def loaded_explainer(self):
+        """The explainer if an explain request already built it, else None; never loads it."""
+        return self._explainer
+
+    @property
+    def explainer(self) -> ForestExplainer:
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    forest = self.model if isinstance(self.model, RandomForestClassifier) else load_model(self.run_dir, prefer_compact=False)
+                    if not isinstance(forest, RandomForestClassifier):
+                        raise ValueError(f"Feature contributions are only available for random forest models, "
+                                         f"not {type(forest).__name__}.")
+                    try:
+                        names = self.preprocessor.get_feature_names_out()
+                        self.feature_names = [str(name).split("__", 1)[-1] for name in names]
+                    except Exception:
+                        self.feature_names = list(self.expected_columns)
+                    self._explainer = ForestExplainer(forest)
+        return self._explainer
+
+    def predict_explain(self, input_df: pd.DataFrame, max_rows: int = EXPLAIN_MAX_ROWS) -> tuple:
+        """
+        Returns (predictions, explanations) for all rows, explaining at most max_rows of them
+        (the first ones) to cap the cost per request. Each explanation holds "probability", the
+        served model's positive-class probability behind the prediction, and the full forest's
+        "forest_score" with its bias and feature contributions (largest first), which sum to it.
+        The two differ only when a compact model is served.
+        """
+        explainer = self.explainer
+        with hot_path():
+            input_arr = self.transform(input_df)
+            proba = self.predict_array(input_arr, "predict_proba")
+            contributions = explainer.explain(input_arr[:max_rows])
+        classes = np.asarray(self.model.classes_)
+        predictions = classes.take(np.argmax(proba, axis=1))
+        positive = int(np.flatnonzero(classes == 1)[0]) if (classes == 1).any() else len(classes) - 1
+        forest_scores = explainer.bias + contributions.sum(axis=1)
+        order = np.argsort(-np.abs(contributions), axis=1)
+        explanations = [
+            {
+                "probability": round(float(probability), 6),
+                "forest_score": round(float(forest_score), 6),
+                "bias": round(explainer.bias, 6),
+                "contributions": {self.feature_names[j]: round(float(row[j]), 6) for j in row_order},
+            }
+            for probability, forest_score, row, row_order in zip(proba[:max_rows, positive], forest_scores,
+                                                                 contributions, order)
+        ]
+        return predictions.tolist(), explanations
+
+    def warm_up(self, batch_sizes: list = SERVING_WARMUP_BATCH_SIZES, rounds: int = SERVING_WARMUP_ROUNDS) -> dict:
+        """
+        Scores batches of each size a few times so lazy imports, sklearn's validation paths and
+        caches are exercised before real traffic. Uses rows from the run's test split when it is
+        available, otherwise scores zero rows on the model alone. Returns seconds per batch size.
+        """
+        try:
+            largest = max(batch_sizes)
+            test_path = os.path.join(self.run_dir, "dataingestion", "split", "test", "test.csv")
+            rows = None
+            if output_exists(test_path):
+                rows = read_csv(test_path, nrows=largest)
+                rows = rows.drop(columns=[self._dt._schema_config.get("target_column")], errors="ignore")
+            timings = {}
+            for size in batch_sizes:
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    if rows is not None and len(rows):
+                        self.predict(rows.iloc[np.arange(size) % len(rows)])
+                    else:
+                        self.predict_array(np.zeros((size, self.n_features), dtype=self.input_dtype))
+                timings[size] = round((time.perf_counter() - start) / rounds, 4)
+            logging.info(f"Warmed up run {self.run_id}: seconds per batch {timings}")
+            return timings
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+
+_bundles = {}
+# Long-lived owners of cached bundles (shadow scoring, the model version store) per run_dir
+_bundle_holders = {}
+_bundles_lock = threading.Lock()
+
+
+def get_inference_bundle(run_dir: str, holder: str = None) -> InferenceBundle:
+    """
+    Returns the cached bundle for run_dir, loading it on first use.
+    A holder keeps the bundle cached until it calls release_inference_bundle with the same name.
+    """
+    bundle = _bundles.get(run_dir)
+    if bundle is None or holder is not None:
+        with _bundles_lock:
+            bundle = _bundles.get(run_dir)
+            if bundle is None:
+                bundle = InferenceBundle(run_dir)
+                _bundles[run_dir] = bundle
+            if holder is not None:
+                _bundle_holders.setdefault(run_dir, set()).add(holder)
+    return bundle
+
+
+def release_inference_bundle(run_dir: str, holder: str = None) -> None:
+    """
+    Drops holder's claim on the cached bundle for run_dir, and the bundle itself once no
+    other holder claims it; it is freed once requests still using it finish.
+    """
+    with _bundles_lock:
+        holders = _bundle_holders.get(run_dir, set())
+        holders.discard(holder)
+        if not holders:
+            _bundle_holders.pop(run_dir, None)
+            _bundles.pop(run_dir, None)
+
+
+def cached_inference_bundles() -> dict:
+    """Snapshot of the shared bundle cache, {run_dir: bundle}."""
+    with _bundles_lock:
+        return dict(_bundles)
+
+
+def latest_trained_run_dir(base_dir: str = "artifacts") -> str:
+    """Latest run that finished training (failed runs leave partial directories)."""
+    return ArtifactRegistry(base_dir).latest_run_dir("model_training")
+
 
 class PredictionPipeline:
-    def __init__(self):
+    def __init__(self, run_dir: str = None):
+        self.run_dir = run_dir
         logging.info("PredictionPipeline initialized")
 
     def predict_from_df(self, input_df: pd.DataFrame):
         """
         Accepts input data as a pandas DataFrame, applies the same transformations as training,
         aligns columns, and returns predictions.
+        Scores with run_dir when given, otherwise with the latest trained run.
         """
         try:
-            # Find latest timestamp
-            base_dir = "artifacts"
-            timestamps = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
-            if not timestamps:
-                raise FileNotFoundError("No timestamped artifacts found.")
-            latest_timestamp = sorted(timestamps)[-1]
-            model_dir = os.path.join(base_dir, latest_timestamp, "model_trainer")
-            transformation_dir = os.path.join(base_dir, latest_timestamp, "data_transformation")
-
-            # Load model
-            model_path = os.path.join(model_dir, "random_forest_model.pkl")
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model not found at {model_path}")
-            model = joblib.load(model_path)
+            bundle = get_inference_bundle(self.run_dir or latest_trained_run_dir())
+            return bundle.predict(input_df)
+        except Exception as e:
+            logging.error(f"Error in prediction pipeline: {e}")
+            raise MyException(e, sys)
 
-            # Load fitted preprocessor if available, else fit on training data
-            preprocessor_path = os.path.join(transformation_dir, "preprocessor.pkl")
-            dt = DataTransformation()
-            dt.prepare_data_transformation()
-            if os.path.exists(preprocessor_path):
-                preprocessor = joblib.load(preprocessor_path)
-                # Get expected columns from training transformation
-                input_feature_train_df = dt.train_df.drop(columns=[read_yaml_file("schema.yaml").get("target_column")], axis=1)
-                for func in [dt._map_gender_column, dt._drop_id_column, dt._create_dummy_columns, dt._rename_columns]:
-                    input_feature_train_df = func(input_feature_train_df)
-                expected_columns = input_feature_train_df.columns.tolist()
-            else:
-                # Fit preprocessor on training data if pickle not available
-                preprocessor = dt.get_data_transformer_object()
-                input_feature_train_df = dt.train_df.drop(columns=[read_yaml_file("schema.yaml").get("target_column")], axis=1)
-                for func in [dt._map_gender_column, dt._drop_id_column, dt._create_dummy_columns, dt._rename_columns]:
-                    input_feature_train_df = func(input_feature_train_df)
-                preprocessor.fit(input_feature_train_df)
-                expected_columns = input_feature_train_df.columns.tolist()
-
-            # Apply custom transformations to input
-            for func in [dt._map_gender_column, dt._drop_id_column, dt._create_dummy_columns, dt._rename_columns]:
-                input_df = func(input_df)
-            logging.info("Custom transformations applied to input data")
-
-            # Add missing columns with default value 0
-            missing_cols = set(expected_columns) - set(input_df.columns)
-            if missing_cols:
-                logging.warning(f"Missing columns in input: {missing_cols}. Filling with default 0 values.")
-                for col in missing_cols:
-                    input_df[col] = 0
-
-            # Remove extra columns
-            extra_cols = set(input_df.columns) - set(expected_columns)
-            if extra_cols:
-                logging.info(f"Extra columns in input: {extra_cols}. Dropping them.")
-                input_df = input_df.drop(columns=list(extra_cols))
-
-            # Reorder columns to match expected order
-            input_df = input_df[expected_columns]
-
-            # Transform input data
-            input_arr = preprocessor.transform(input_df)
-            logging.info("Input data transformed")
-
-            # Predict
-            predictions = model.predict(input_arr)
-            logging.info("Predictions generated")
-            return predictions.tolist()
+    def explain_from_df(self, input_df: pd.DataFrame, max_rows: int = EXPLAIN_MAX_ROWS) -> tuple:
+        """Like predict_from_df, but returns (predictions, explanations); see InferenceBundle.predict_explain."""
+        try:
+            bundle = get_inference_bundle(self.run_dir or latest_trained_run_dir())
+            return bundle.predict_explain(input_df, max_rows)
+        except ValueError:
+            raise
         except Exception as e:
             logging.error(f"Error in prediction pipeline: {e}")
             raise MyException(e, sys)
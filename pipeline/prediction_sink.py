@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import glob
+import time
+import uuid
+import datetime
+import threading
+from collections import deque
+
+import pandas as pd
+
+from logger import logging
+from exception import MyException
+from constants import (
+    PREDICTION_SINK_COLLECTION, PREDICTION_SINK_MAX_BUFFER_ROWS, PREDICTION_SINK_FLUSH_ROWS,
+    PREDICTION_SINK_FLUSH_SECONDS, PREDICTION_SINK_RETRY_SECONDS, PREDICTION_SINK_SPILL_DIR,
+    PREDICTION_SINK_MONGO_TIMEOUT_MS
+)
+
+# MongoDB's duplicate key error: the document was already written by an earlier attempt
+_DUPLICATE_KEY = 11000
+
+
+class PredictionSink:
+    """
+    Persists every scored row with its prediction to MongoDB, off the request path.
+
+    record() only appends the request's frame and predictions to an in-memory buffer. A
+    background thread turns buffered requests into one document per row and writes them with
+    a bulk, unordered insert_many when flush_rows rows are waiting, every flush_seconds, and
+    on stop(). Documents carry a deterministic _id (request id and row), so writing the same
+    batch twice is harmless.
+
+    When MongoDB fails, the batch is appended to a JSON-lines spill file instead and Mongo is
+    not retried for retry_seconds; once a write succeeds again, spill files are replayed and
+    deleted; lines that no longer parse are moved to a .corrupt file beside the spill file
+    instead of blocking the replay. The buffer is bounded: a request arriving when max_buffer_rows rows are waiting
+    is spilled straight to disk, so nothing scored is dropped. Pass collection (any object
+    with insert_many, e.g. a local mongod collection) to write somewhere else than
+    MongoDBConnection's database.
+    """
+    def __init__(self, collection=None, collection_name: str = None,
+                 max_buffer_rows: int = PREDICTION_SINK_MAX_BUFFER_ROWS, flush_rows: int = PREDICTION_SINK_FLUSH_ROWS,
+                 flush_seconds: float = PREDICTION_SINK_FLUSH_SECONDS,
+                 retry_seconds: float = PREDICTION_SINK_RETRY_SECONDS, spill_dir: str = PREDICTION_SINK_SPILL_DIR):
+        self.collection_name = collection_name or os.getenv("PREDICTION_COLLECTION_NAME") or PREDICTION_SINK_COLLECTION
+        self._collection = collection
+        self.max_buffer_rows = max_buffer_rows
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.retry_seconds = retry_seconds
+        self.spill_dir = spill_dir
+        self._buffer = deque()
+        self._buffered_rows = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # Serializes writers of the spill files: the flush thread and overflowing requests
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._retry_at = 0.0
+        self.counters = {"recorded_rows": 0, "written_rows": 0, "spilled_rows": 0, "replayed_rows": 0,
+                         "corrupt_rows": 0,
+                         "flushes": 0, "failed_flushes": 0}
+        self.last_error = None
+        self._thread = threading.Thread(target=self._worker, name="prediction-sink", daemon=True)
+        self._thread.start()
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from configration.mongo_db_connection import MongoDBConnection
+            connection = MongoDBConnection(server_selection_timeout_ms=PREDICTION_SINK_MONGO_TIMEOUT_MS)
+            self._collection = connection.db[self.collection_name]
+        return self._collection
+
+    def record(self, input_df: pd.DataFrame, predictions: list, model_run_id: str, endpoint: str = "predict") -> None:
+        """Queues one scored request; returns without any I/O unless the buffer is full."""
+        batch = {
+            "request_id": uuid.uuid4().hex,
+            "scored_at": datetime.datetime.now(datetime.timezone.utc),
+            "endpoint": endpoint,
+            "model_run_id": model_run_id,
+            "input_df": input_df,
+            "predictions": predictions,
+        }
+        rows = len(predictions)
+        with self._lock:
+            self.counters["recorded_rows"] += rows
+            overflow = self._buffered_rows + rows > self.max_buffer_rows
+            if not overflow:
+                self._buffer.append(batch)
+                self._buffered_rows += rows
+                if self._buffered_rows >= self.flush_rows:
+                    self._wake.notify()
+        if overflow:
+            logging.warning("Prediction buffer full (%d rows); spilling a request to disk", self.max_buffer_rows)
+            self._spill(self._documents([batch]))
+
+    @staticmethod
+    def _documents(batches: list) -> list:
+        documents = []
+        for batch in batches:
+            header = {k: batch[k] for k in ("request_id", "scored_at", "endpoint", "model_run_id")}
+            for row, (features, prediction) in enumerate(zip(batch["input_df"].to_dict(orient="records"),
+                                                             batch["predictions"])):
+                documents.append({"_id": f"{batch['request_id']}:{row}", **header, "row": row,
+                                  "input": features, "prediction": prediction})
+        return documents
+
+    def _insert(self, documents: list) -> None:
+        # Imported here: pymongo stays off the serving import path until predictions are written
+        from pymongo.errors import BulkWriteError
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Rows already written by an earlier, partly failed attempt are fine
+            errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != _DUPLICATE_KEY]
+            if errors or e.details.get("writeConcernErrors"):
+                raise
+
+    def _spill(self, documents: list) -> None:
+        with self._spill_lock:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"predictions_{datetime.date.today():%Y%m%d}.jsonl")
+            with open(path, "a") as f:
+                for document in documents:
+                    f.write(json.dumps(document, default=str) + "\n")
+        with self._lock:
+            self.counters["spilled_rows"] += len(documents)
+        logging.info(f"Spilled {len(documents)} prediction rows to {path}")
+
+    def _read_spill(self, path: str) -> list:
+        """
+        Parses a spill file. Lines that do not parse are appended to <path>.corrupt and the
+        file is rewritten without them, so a replay that fails later does not move them twice.
+        """
+        documents, lines, corrupt = [], [], []
+        # surrogateescape: undecodable bytes reach the .corrupt file unchanged
+        with open(path, errors="surrogateescape") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                # The last line may lack its newline (a write cut short)
+                line = line.rstrip("\n") + "\n"
+                try:
+                    document = json.loads(line)
+                    document["scored_at"] = datetime.datetime.fromisoformat(document["scored_at"])
+                except (ValueError, TypeError, KeyError):
+                    corrupt.append(line)
+                    continue
+                documents.append(document)
+                lines.append(line)
+        if corrupt:
+            with open(f"{path}.corrupt", "a", errors="surrogateescape") as f:
+                f.writelines(corrupt)
+            with open(f"{path}.tmp", "w", errors="surrogateescape") as f:
+                f.writelines(lines)
+            os.replace(f"{path}.tmp", path)
+            with self._lock:
+                self.counters["corrupt_rows"] += len(corrupt)
+            logging.warning(f"Moved {len(corrupt)} unreadable spilled prediction rows from {path} to {path}.corrupt")
+        return documents
+
+    def _replay_spill(self) -> None:
+        """
+        Writes spilled rows to MongoDB, oldest file first, deleting each file once written.
+        Only MongoDB errors are raised; a spill file that cannot be read is skipped.
+        """
+        with self._spill_lock:
+            for path in sorted(glob.glob(os.path.join(self.spill_dir, "predictions_*.jsonl"))):
+                try:
+                    documents = self._read_spill(path)
+                except OSError as e:
+                    logging.error(f"Cannot read spilled predictions from {path}; skipping it: {e}")
+                    continue
+                for start in range(0, len(documents), self.flush_rows):
+                    self._insert(documents[start:start + self.flush_rows])
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    # Replayed again on the next flush; its rows are deduplicated by _id
+                    logging.error(f"Cannot delete replayed spill file {path}: {e}")
+                with self._lock:
+                    self.counters["replayed_rows"] += len(documents)
+                logging.info(f"Replayed {len(documents)} spilled prediction rows from {path}")
+
+    def _mongo_failed(self, error: Exception) -> None:
+        self._retry_at = time.monotonic() + self.retry_seconds
+        with self._lock:
+            self.counters["failed_flushes"] += 1
+            self.last_error = str(error)
+        logging.error(f"Writing predictions to MongoDB failed; spilling to disk for {self.retry_seconds}s: {error}")
+
+    def flush(self) -> None:
+        """Writes everything buffered now: to MongoDB, or to the spill file when it is unavailable."""
+        with self._lock:
+            batches, self._buffer = list(self._buffer), deque()
+            self._buffered_rows = 0
+        documents = self._documents(batches)
+        if time.monotonic() < self._retry_at:
+            if documents:
+                self._spill(documents)
+            return
+        if documents:
+            try:
+                self._insert(documents)
+            except Exception as e:
+                self._mongo_failed(e)
+                self._spill(documents)
+                return
+            with self._lock:
+                self.counters["written_rows"] += len(documents)
+                self.counters["flushes"] += 1
+        try:
+            self._replay_spill()
+        except Exception as e:
+            # A partly replayed file is kept and replayed again; its rows are deduplicated by _id
+            self._mongo_failed(e)
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                if self._buffered_rows < self.flush_rows:
+                    self._wake.wait(timeout=self.flush_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Prediction sink flush failed: {e}")
+
+    def stop(self) -> None:
+        """Stops the flush thread and writes (or spills) what is still buffered."""
+        self._stop.set()
+        with self._lock:
+            self._wake.notify()
+        self._thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "collection": self.collection_name,
+                "buffered_rows": self._buffered_rows,
+                "max_buffer_rows": self.max_buffer_rows,
+                **self.counters,
+                "spill_files": len(glob.glob(os.path.join(self.spill_dir, "predictions_*.jsonl"))),
+                "mongo_available": time.monotonic() >= self._retry_at,
+                "last_error": self.last_error,
+            }
+
+
+_prediction_sink = None
+_prediction_sink_lock = threading.Lock()
+
+
+def get_prediction_sink() -> PredictionSink:
+    """Process-wide PredictionSink, created (and its flush thread started) on first use."""
+    global _prediction_sink
+    if _prediction_sink is None:
+        with _prediction_sink_lock:
+            if _prediction_sink is None:
+                _prediction_sink = PredictionSink()
+    return _prediction_sink
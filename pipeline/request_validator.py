@@ -0,0 +1,156 @@
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from logger import logging
+from exception import MyException
+from utils.main_utils import read_yaml_file
+
+# Most per-row errors returned in one response; the total count is returned beside them
+MAX_REPORTED_ERRORS = 1000
+
+# int64 holds [-2**63, 2**63); larger values (1e20) would wrap around when cast
+_INT64_MIN, _INT64_END = -float(2 ** 63), float(2 ** 63)
+
+
+def _missing(values: pd.Series) -> np.ndarray:
+    """None/NaN, and empty strings (unfilled form fields)."""
+    return values.isna().to_numpy() | values.eq("").to_numpy()
+
+
+def _booleans(values: pd.Series) -> np.ndarray:
+    """true/false values, which to_numeric would otherwise read as 1 and 0."""
+    if pd.api.types.is_bool_dtype(values.dtype):
+        return np.ones(len(values), dtype=bool)
+    if values.dtype == object:
+        return values.map(type).isin((bool, np.bool_)).to_numpy()
+    return np.zeros(len(values), dtype=bool)
+
+
+def _check_int(values: pd.Series) -> tuple:
+    numbers = pd.to_numeric(values, errors="coerce")
+    as_float = numbers.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid="ignore"):
+        bad = (~np.isfinite(as_float) | (as_float != np.floor(as_float))
+               | (as_float < _INT64_MIN) | (as_float >= _INT64_END))
+    bad |= _booleans(values)
+    return bad, "must be an integer", numbers.where(~bad, 0).astype(np.int64)
+
+
+def _check_float(values: pd.Series) -> tuple:
+    numbers = pd.to_numeric(values, errors="coerce").astype(np.float64)
+    bad = ~np.isfinite(numbers.to_numpy()) | _booleans(values)
+    return bad, "must be a finite number", numbers
+
+
+def _category_check(domain: list):
+    allowed = pd.Index([str(value) for value in domain])
+    message = f"must be one of {list(allowed)}"
+
+    def check(values: pd.Series) -> tuple:
+        # Hash lookups against the domain; numbers and booleans never equal its strings
+        bad = ~values.isin(allowed).to_numpy()
+        return bad, message, values.astype(object)
+    return check
+
+
+class RequestValidator:
+    """
+    Validates /predict payloads against schema.yaml before any scoring work.
+
+    The schema's columns, types and category_domains are compiled once into one check per
+    column. A batch is checked column by column with vectorized pandas/numpy operations: a
+    value is missing (null or empty), not of its type (numeric strings are accepted, as the
+    HTML form sends them; booleans and integers outside int64 are not) or outside its
+    category domain. Python only loops over the rows
+    that failed, to describe them.
+
+    The result is the frame of valid rows with the schema's dtypes, ready for the encoder,
+    plus per-row errors for the rejected ones. The target and drop_columns (the id) are
+    not required; fields the schema does not know are ignored.
+    """
+    def __init__(self, schema_path: str = "schema.yaml"):
+        try:
+            schema = read_yaml_file(schema_path) or {}
+            optional = schema.get("drop_columns") or []
+            optional = {optional} if isinstance(optional, str) else set(optional)
+            optional.add(schema.get("target_column"))
+            domains = schema.get("category_domains") or {}
+            self.checks = []
+            for column in schema.get("columns", []):
+                for name, dtype in column.items():
+                    if name in optional:
+                        continue
+                    if dtype == "int":
+                        check = _check_int
+                    elif dtype == "float":
+                        check = _check_float
+                    elif dtype == "category" and name in domains:
+                        check = _category_check(domains[name])
+                    elif dtype == "category":
+                        logging.warning("No category_domains entry for %s; only checking that it is present", name)
+                        check = lambda values: (np.zeros(len(values), dtype=bool), "", values.astype(object))
+                    else:
+                        raise ValueError(f"Unsupported type '{dtype}' for column {name} in {schema_path}")
+                    self.checks.append((name, check))
+            self.columns = [name for name, _ in self.checks]
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def validate(self, df: pd.DataFrame) -> tuple:
+        """
+        Returns (valid_df, valid_rows, errors, error_count): the valid rows with the schema's
+        dtypes, their positions in the request, [{"row", "field", "error"}] for the rejected
+        values (at most MAX_REPORTED_ERRORS of them) and the number of rejected values.
+        """
+        n_rows = len(df)
+        rejected = np.zeros(n_rows, dtype=bool)
+        failures = []
+        converted = {}
+        for name, check in self.checks:
+            if name not in df.columns:
+                failures.append((name, np.ones(n_rows, dtype=bool), "is required"))
+                rejected[:] = True
+                continue
+            values = df[name]
+            missing = _missing(values)
+            bad, message, converted[name] = check(values)
+            bad &= ~missing
+            if missing.any():
+                failures.append((name, missing, "is required"))
+            if bad.any():
+                failures.append((name, bad, message))
+            rejected |= missing | bad
+
+        errors = []
+        error_count = sum(int(mask.sum()) for _, mask, _ in failures)
+        for name, mask, message in failures:
+            for row in np.flatnonzero(mask)[:MAX_REPORTED_ERRORS - len(errors)]:
+                errors.append({"row": int(row), "field": name, "error": f"{name} {message}"})
+        errors.sort(key=lambda error: error["row"])
+
+        valid_rows = np.flatnonzero(~rejected)
+        if len(valid_rows) == n_rows:
+            valid_df = pd.DataFrame(converted, columns=self.columns)
+        else:
+            valid_df = pd.DataFrame({name: converted[name].iloc[valid_rows] for name in converted},
+                                    columns=self.columns).reset_index(drop=True)
+        if rejected.any():
+            logging.info("Rejected %d of %d request rows", int(rejected.sum()), n_rows)
+        return valid_df, valid_rows.tolist(), errors, error_count
+
+
+_validator = None
+_validator_lock = threading.Lock()
+
+
+def get_request_validator() -> RequestValidator:
+    """Process-wide RequestValidator compiled from schema.yaml on first use."""
+    global _validator
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                _validator = RequestValidator()
+    return _validator
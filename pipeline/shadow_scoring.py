@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import queue
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from logger import logging
+from exception import MyException
+from pipeline.prediction_pipeline import get_inference_bundle, release_inference_bundle
+from utils.artifact_registry import ArtifactRegistry
+from utils.main_utils import latency_summary
+from constants import ARTIFACTS_DIR, SHADOW_QUEUE_SIZE, SHADOW_LATENCY_WINDOW, SHADOW_REFRESH_SECONDS
+
+# Name under which this module holds bundles in the shared inference bundle cache
+_HOLDER = "shadow_scoring"
+
+
+class ShadowScorer:
+    """
+    Champion/challenger scoring for the serving path.
+
+    The champion, the registry's promoted run, answers every request. When a newer trained run
+    exists it becomes the challenger: each champion batch is handed to a bounded queue and
+    scored by the challenger on a background thread, and agreement and latency are aggregated
+    for both. Enqueueing never blocks; when the queue is full the batch is simply not shadowed.
+    promote() makes the challenger the champion.
+
+    When no run is promoted yet, the latest trained run is promoted once in the registry (unless
+    another replica got there first), so every replica reads the same champion and a newer run
+    only ever serves as challenger until promoted. Bundles of runs that stop being the champion
+    or challenger are released from the shared bundle cache unless another holder (the model
+    version store) still uses them.
+    """
+
+    def __init__(self, base_dir: str = ARTIFACTS_DIR):
+        self.registry = ArtifactRegistry(base_dir)
+        self._queue = queue.Queue(maxsize=SHADOW_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.champion = None
+        self.challenger = None
+        self._generation = 0
+        self._reset_stats()
+        self.refresh()
+        self._thread = threading.Thread(target=self._worker, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def _reset_stats(self) -> None:
+        self._generation += 1
+        self._stats = {"batches": 0, "rows": 0, "agreed_rows": 0, "dropped_batches": 0, "errors": 0}
+        self._champion_latency = deque(maxlen=SHADOW_LATENCY_WINDOW)
+        self._challenger_latency = deque(maxlen=SHADOW_LATENCY_WINDOW)
+
+    def refresh(self) -> None:
+        """Resolves the champion and picks up a newer trained run as challenger."""
+        try:
+            latest_id = self.registry.latest_run_id("model_training")
+            if latest_id is None:
+                raise FileNotFoundError("No trained run to serve.")
+            champion_id = self.registry.promoted_run_id()
+            if champion_id is None or not self._trained(champion_id):
+                champion_id = self._claim_champion(latest_id, champion_id)
+            champion = get_inference_bundle(self.registry.run_dir(champion_id), holder=_HOLDER)
+            challenger = None
+            if latest_id > champion_id:
+                challenger = get_inference_bundle(self.registry.run_dir(latest_id), holder=_HOLDER)
+            with self._lock:
+                replaced = {getattr(self.champion, "run_id", None), getattr(self.challenger, "run_id", None)}
+                changed = (getattr(self.challenger, "run_id", None) != getattr(challenger, "run_id", None)
+                           or getattr(self.champion, "run_id", None) != champion.run_id)
+                self.champion, self.challenger = champion, challenger
+                if changed:
+                    self._reset_stats()
+                    logging.info(f"Shadow scoring: champion={champion.run_id}, "
+                                 f"challenger={getattr(challenger, 'run_id', None)}")
+            self._release(replaced - {champion.run_id, getattr(challenger, "run_id", None)})
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _claim_champion(self, run_id: str, stale) -> str:
+        """Promotes run_id in place of stale (no promoted run, or an untrained one) unless another replica did first."""
+        try:
+            return self.registry.promote_if(run_id, expected=stale)
+        except OSError as e:
+            # Read-only artifacts: keep serving the current champion rather than switching silently
+            current = getattr(self.champion, "run_id", None)
+            champion_id = current if current and self._trained(current) else run_id
+            logging.warning(f"Cannot record champion {champion_id} in the registry; other replicas "
+                            f"may serve another run: {e}")
+            return champion_id
+
+    def _trained(self, run_id: str) -> bool:
+        return os.path.isdir(os.path.join(self.registry.run_dir(run_id), "model_trainer"))
+
+    def _release(self, run_ids: set) -> None:
+        """Gives up this scorer's hold on bundles it no longer serves."""
+        for run_id in run_ids - {None}:
+            release_inference_bundle(self.registry.run_dir(run_id), holder=_HOLDER)
+
+    def predict(self, input_df: pd.DataFrame) -> list:
+        """Scores with the champion and queues the batch for the challenger without waiting."""
+        champion, challenger, generation = self.champion, self.challenger, self._generation
+        start = time.perf_counter()
+        predictions = champion.predict(input_df)
+        self._shadow(generation, challenger, input_df, predictions, time.perf_counter() - start)
+        return predictions
+
+    def predict_explain(self, input_df: pd.DataFrame) -> tuple:
+        """Champion predictions with feature contributions; the challenger still shadows the batch."""
+        champion, challenger, generation = self.champion, self.challenger, self._generation
+        start = time.perf_counter()
+        predictions, explanations = champion.predict_explain(input_df)
+        self._shadow(generation, challenger, input_df, predictions, time.perf_counter() - start)
+        return predictions, explanations
+
+    def _shadow(self, generation: int, challenger, input_df: pd.DataFrame, predictions: list, latency: float) -> None:
+        if challenger is None:
+            return
+        try:
+            self._queue.put_nowait((generation, challenger, input_df, predictions, latency))
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped_batches"] += 1
+
+    def _worker(self) -> None:
+        next_refresh = time.monotonic() + SHADOW_REFRESH_SECONDS
+        while not self._stop.is_set():
+            if time.monotonic() >= next_refresh:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.error(f"Shadow scoring refresh failed: {e}")
+                next_refresh = time.monotonic() + SHADOW_REFRESH_SECONDS
+            try:
+                generation, challenger, input_df, champion_predictions, champion_latency = self._queue.get(
+                    timeout=max(0.0, next_refresh - time.monotonic())
+                )
+            except queue.Empty:
+                continue
+            try:
+                start = time.perf_counter()
+                challenger_predictions = challenger.predict(input_df)
+                challenger_latency = time.perf_counter() - start
+                agreed = int(np.sum(np.asarray(challenger_predictions) == np.asarray(champion_predictions)))
+            except Exception as e:
+                logging.error(f"Challenger {challenger.run_id} failed to score a shadow batch: {e}")
+                with self._lock:
+                    if generation == self._generation:
+                        self._stats["errors"] += 1
+                continue
+            with self._lock:
+                # Batches queued before a promotion or a new challenger belong to old stats
+                if generation != self._generation:
+                    continue
+                self._stats["batches"] += 1
+                self._stats["rows"] += len(champion_predictions)
+                self._stats["agreed_rows"] += agreed
+                self._champion_latency.append(champion_latency)
+                self._challenger_latency.append(challenger_latency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            rows = stats["rows"]
+            return {
+                "champion": getattr(self.champion, "run_id", None),
+                "challenger": getattr(self.challenger, "run_id", None),
+                **stats,
+                "agreement_rate": round(stats["agreed_rows"] / rows, 6) if rows else None,
+                "queue_depth": self._queue.qsize(),
+                "champion_latency": latency_summary(self._champion_latency),
+                "challenger_latency": latency_summary(self._challenger_latency),
+            }
+
+    def promote(self) -> str:
+        """Makes the current challenger the champion and returns its run id."""
+        with self._lock:
+            if self.challenger is None:
+                raise ValueError("There is no challenger to promote.")
+            self.registry.promote(self.challenger.run_id)
+            replaced = self.champion.run_id
+            self.champion, self.challenger = self.challenger, None
+            self._reset_stats()
+            logging.info(f"Promoted run {self.champion.run_id} to champion")
+            champion_id = self.champion.run_id
+        self._release({replaced})
+        return champion_id
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=SHADOW_REFRESH_SECONDS)
+
+
+_shadow_scorer = None
+_shadow_scorer_lock = threading.Lock()
+
+
+def get_shadow_scorer() -> ShadowScorer:
+    """Process-wide ShadowScorer, created on first use."""
+    global _shadow_scorer
+    if _shadow_scorer is None:
+        with _shadow_scorer_lock:
+            if _shadow_scorer is None:
+                _shadow_scorer = ShadowScorer()
+    return _shadow_scorer
@@ -1,19 +1,63 @@
-from logger import logging
+import os
+import sys
+import time
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import yaml
+
+from logger import logging, configure_logger
 from exception import MyException
 from components.data_ingestion import DataIngestion
 from components.data_validation import DataValidation
 from components.data_transformation import DataTransformation
+from components.model_tuner import ModelTuner
 from components.model_trainer import ModelTrainer
 from components.model_evaluation import ModelEvaluation
+from components.model_cross_validation import ModelCrossValidation
+from components.model_compaction import ModelCompaction
+from utils.artifact_registry import ArtifactRegistry, STAGE_DIRS
+from utils.run_profiler import RunProfiler
+from constants import (
+    MODEL_TUNER_ENABLED, MODEL_COMPACTION_ENABLED, MODEL_CV_ENABLED, PIPELINE_MAX_PARALLEL_STAGES,
+    PIPELINE_FAIL_ON_VALIDATION_ERROR, PIPELINE_STAGE_MARKER_DIR, ARTIFACTS_DIR, ARTIFACT_RETENTION_ENABLED,
+    PIPELINE_PROFILE_DEEP_STAGE
+)
 
 
 class TrainingPipeline:
-    def __init__(self):
-        self.data_ingestion = DataIngestion()
-        self.data_validation = DataValidation()
-        self.data_transformation = DataTransformation()
-        self.model_trainer = ModelTrainer()
-        self.model_evaluation = ModelEvaluation()
+    """
+    Runs the training stages as a DAG inside one run directory, artifacts/<run_id>.
+
+    Every stage writes a completion marker under <run_dir>/_stages. A stage starts as soon as
+    all of its inputs completed, so independent stages run concurrently, and a failed stage
+    stops everything downstream of it. With resume=True an existing run is picked up again
+    and only stages without a completed marker (or downstream of one) are re-executed.
+
+    Every executed stage is measured into <run_dir>/run_profile.yaml (see RunProfiler);
+    profile_stage additionally runs one stage under cProfile and tracemalloc.
+    """
+    def __init__(self, run_id: str = None, resume: bool = False, profile_stage: str = PIPELINE_PROFILE_DEEP_STAGE,
+                 source_path: str = None):
+        if resume and not run_id:
+            raise ValueError("Resuming a training run requires its run_id.")
+        self.run_id = run_id or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.resume = resume
+        self.registry = ArtifactRegistry(ARTIFACTS_DIR)
+        self.run_dir = self.registry.run_dir(self.run_id)
+        if resume and not os.path.isdir(self.run_dir):
+            raise FileNotFoundError(f"Run directory not found: {self.run_dir}")
+        self.profiler = RunProfiler(self.run_dir, deep_stage=profile_stage)
+
+        self.data_ingestion = DataIngestion(run_id=self.run_id, source_path=source_path)
+        self.data_validation = DataValidation(run_dir=self.run_dir)
+        self.data_transformation = DataTransformation(run_dir=self.run_dir)
+        self.model_tuner = ModelTuner(run_dir=self.run_dir)
+        self.model_trainer = ModelTrainer(run_dir=self.run_dir)
+        self.model_evaluation = ModelEvaluation(run_dir=self.run_dir)
+        self.model_cross_validation = ModelCrossValidation(run_dir=self.run_dir)
+        self.model_compaction = ModelCompaction(run_dir=self.run_dir)
 
 
 
@@ -24,6 +68,7 @@ class TrainingPipeline:
             self.data_ingestion.run()
         except MyException as e:
             logging.error(f"Error occurred while starting data ingestion: {e}")
+            raise
 
 
 
@@ -32,9 +77,14 @@ class TrainingPipeline:
     def start_data_validation(self):
         try:
             logging.info("Starting data validation process")
-            self.data_validation.run()
+            ok, report_path, _ = self.data_validation.run()
+            if not ok and PIPELINE_FAIL_ON_VALIDATION_ERROR:
+                raise ValueError(f"Data does not match schema.yaml, see {report_path}")
         except MyException as e:
             logging.error(f"Error occurred while starting data validation: {e}")
+            raise
+        except ValueError as e:
+            raise MyException(e, sys) from e
 
 
     def start_data_transformation(self):
@@ -43,7 +93,17 @@ class TrainingPipeline:
             self.data_transformation.run()
         except MyException as e:
             logging.error(f"Error occurred while starting data transformation: {e}")
+            raise
+
+
 
+    def start_model_tuning(self):
+        try:
+            logging.info("Starting model tuning process")
+            self.model_tuner.run()
+        except MyException as e:
+            logging.error(f"Error occurred while starting model tuning: {e}")
+            raise
 
 
     def start_model_training(self):
@@ -52,6 +112,7 @@ class TrainingPipeline:
             self.model_trainer.run()
         except MyException as e:
             logging.error(f"Error occurred while starting model training: {e}")
+            raise
 
 
     def start_model_evaluation(self):
@@ -60,16 +121,160 @@ class TrainingPipeline:
             self.model_evaluation.run()
         except MyException as e:
             logging.error(f"Error occurred while starting model evaluation: {e}")
+            raise
 
 
+    def start_model_cross_validation(self):
+        try:
+            logging.info("Starting model cross-validation process")
+            self.model_cross_validation.run()
+        except MyException as e:
+            logging.error(f"Error occurred while starting model cross-validation: {e}")
+            raise
+
+
+    def start_model_compaction(self):
+        try:
+            logging.info("Starting model compaction process")
+            self.model_compaction.run()
+        except MyException as e:
+            logging.error(f"Error occurred while starting model compaction: {e}")
+            raise
+
+
+    def stage_graph(self) -> dict:
+        """Returns {stage: (callable, [upstream stages])} in topological order."""
+        graph = {
+            "data_ingestion": (self.start_data_ingestion, []),
+            "data_validation": (self.start_data_validation, ["data_ingestion"]),
+            "data_transformation": (self.start_data_transformation, ["data_ingestion"]),
+            # Tuning forks worker processes, so it waits for validation instead of running beside it
+            "model_tuning": (self.start_model_tuning, ["data_validation", "data_transformation"]),
+            "model_training": (self.start_model_training, ["data_validation", "data_transformation", "model_tuning"]),
+            # Runs beside training; evaluation waits for it to include the fold spread in its report
+            "model_cross_validation": (self.start_model_cross_validation,
+                                       ["data_validation", "data_transformation", "model_tuning"]),
+            "model_evaluation": (self.start_model_evaluation, ["model_training", "model_cross_validation"]),
+            "model_compaction": (self.start_model_compaction, ["model_training"]),
+        }
+        disabled = set()
+        if not MODEL_TUNER_ENABLED:
+            disabled.add("model_tuning")
+        if not MODEL_COMPACTION_ENABLED:
+            disabled.add("model_compaction")
+        if not MODEL_CV_ENABLED:
+            disabled.add("model_cross_validation")
+        return {
+            stage: (fn, [d for d in deps if d not in disabled])
+            for stage, (fn, deps) in graph.items() if stage not in disabled
+        }
+
+    def _marker_path(self, stage: str) -> str:
+        return os.path.join(self.run_dir, PIPELINE_STAGE_MARKER_DIR, f"{stage}.yaml")
+
+    def _write_marker(self, stage: str, marker: dict) -> None:
+        """Writes the stage marker and mirrors its status into the artifact registry."""
+        path = self._marker_path(stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            yaml.safe_dump(marker, f, sort_keys=False)
+        os.replace(tmp_path, path)
+        self.registry.set_stage_status(self.run_id, stage, marker["status"])
+
+    def read_marker(self, stage: str) -> dict:
+        path = self._marker_path(stage)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return yaml.safe_load(f) or {}
+
+    def _completed_stages(self, graph: dict) -> set:
+        """Stages whose marker says completed and whose upstream stages are all completed too."""
+        completed = set()
+        for stage, (_, deps) in graph.items():
+            if self.read_marker(stage).get("status") == "completed" and all(d in completed for d in deps):
+                completed.add(stage)
+        return completed
+
+    def _run_stage(self, stage: str, fn) -> None:
+        started_at = datetime.datetime.now().isoformat(timespec="seconds")
+        self._write_marker(stage, {"status": "running", "started_at": started_at})
+        start = time.perf_counter()
+        try:
+            with self.profiler.profile(stage):
+                fn()
+        except Exception as e:
+            self._write_marker(stage, {
+                "status": "failed",
+                "started_at": started_at,
+                "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "duration_seconds": round(time.perf_counter() - start, 3),
+                "error": str(e),
+            })
+            raise
+        self._write_marker(stage, {
+            "status": "completed",
+            "started_at": started_at,
+            "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "duration_seconds": round(time.perf_counter() - start, 3),
+        })
+
     def run(self) -> None:
-        """Run the full training pipeline in order."""
-        logging.info("Training pipeline started")
-        self.start_data_ingestion()
-        self.start_data_validation()
-        self.start_data_transformation()
-        self.start_model_training()
-        self.start_model_evaluation()
+        """Run the stage DAG, executing every stage whose inputs are ready."""
+        logging.info(f"Training pipeline started (run_id={self.run_id}, resume={self.resume})")
+        self.registry.register_run(self.run_id)
+        graph = self.stage_graph()
+        completed = self._completed_stages(graph) if self.resume else set()
+        if completed:
+            logging.info(f"Skipping completed stages: {sorted(completed)}")
+            for stage in completed:
+                self.registry.set_stage_status(self.run_id, stage, "completed")
+        pending = [stage for stage in graph if stage not in completed]
+        failed, skipped, running = {}, [], {}
+
+        with ThreadPoolExecutor(max_workers=PIPELINE_MAX_PARALLEL_STAGES) as executor:
+            while pending or running:
+                for stage in list(pending):
+                    deps = graph[stage][1]
+                    if any(d in failed or d in skipped for d in deps):
+                        pending.remove(stage)
+                        skipped.append(stage)
+                        logging.warning(f"Skipping stage {stage}: an upstream stage failed")
+                    elif all(d in completed for d in deps) and len(running) < PIPELINE_MAX_PARALLEL_STAGES:
+                        pending.remove(stage)
+                        running[executor.submit(self._run_stage, stage, graph[stage][0])] = stage
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        completed.add(stage)
+                    else:
+                        failed[stage] = error
+
+        if failed:
+            logging.error(f"Training pipeline run {self.run_id} failed at {sorted(failed)}; "
+                          f"skipped {skipped}. Resume with: --resume {self.run_id}")
+            raise next(iter(failed.values()))
         logging.info("Training pipeline finished successfully")
+        if ARTIFACT_RETENTION_ENABLED:
+            self.registry.garbage_collect()
+
 
-            
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the training pipeline.")
+    parser.add_argument("--resume", metavar="RUN_ID", default=None,
+                        help="re-execute only the failed or missing stages of an existing run")
+    parser.add_argument("--profile-stage", choices=list(STAGE_DIRS), default=PIPELINE_PROFILE_DEEP_STAGE,
+                        help="dump cProfile and tracemalloc output for this stage into <run_dir>/_profile")
+    parser.add_argument("--source-file", default=None,
+                        help="ingest this CSV file instead of the MongoDB collection")
+    args = parser.parse_args()
+    configure_logger()
+    TrainingPipeline(
+        run_id=args.resume, resume=args.resume is not None, profile_stage=args.profile_stage,
+        source_path=args.source_file,
+    ).run()
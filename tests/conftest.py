@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Empty working directory holding the repo's schema.yaml; components resolve artifacts/ from here."""
+    shutil.copy(os.path.join(REPO_ROOT, "schema.yaml"), tmp_path / "schema.yaml")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def make_arrays(n_rows: int = 400, n_features: int = 6, seed: int = 0) -> tuple:
+    """Separable binary (train, test) arrays in the pipeline layout: features then the target column."""
+    rng = np.random.default_rng(seed)
+    arrays = []
+    for n in (n_rows, n_rows // 4):
+        X = rng.normal(size=(n, n_features))
+        y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(scale=0.5, size=n) > 0).astype(np.float64)
+        arrays.append(np.c_[X, y])
+    return tuple(arrays)
+
+
+def write_transformed_run(run_dir, train_arr: np.ndarray, test_arr: np.ndarray, preprocessor=None) -> None:
+    """Writes the data_transformation outputs of a run (arrays and, optionally, the fitted preprocessor)."""
+    import joblib
+    transformation_dir = os.path.join(run_dir, "data_transformation")
+    os.makedirs(transformation_dir, exist_ok=True)
+    np.save(os.path.join(transformation_dir, "train.npy"), train_arr)
+    np.save(os.path.join(transformation_dir, "test.npy"), test_arr)
+    if preprocessor is not None:
+        joblib.dump(preprocessor, os.path.join(transformation_dir, "preprocessor.pkl"))
+
+
+def write_split(run_dir, n_rows: int = 500, seed: int = 0) -> None:
+    """Writes the ingestion train/test CSVs of a run with synthetic rows that follow schema.yaml."""
+    from utils.synthetic_data import SyntheticDataGenerator
+    df = SyntheticDataGenerator(seed=seed).generate(n_rows)
+    for split, rows in (("train", df.iloc[:int(n_rows * 0.8)]), ("test", df.iloc[int(n_rows * 0.8):])):
+        split_dir = os.path.join(run_dir, "dataingestion", "split", split)
+        os.makedirs(split_dir, exist_ok=True)
+        rows.to_csv(os.path.join(split_dir, f"{split}.csv"), index=False)
+
+
+def train_run(base_dir, run_id: str, n_rows: int = 500, seed: int = 0) -> str:
+    """Runs transformation and training on synthetic split data; returns the registered run directory."""
+    from components.data_transformation import DataTransformation
+    from components.model_trainer import ModelTrainer
+    from utils.artifact_registry import ArtifactRegistry
+    registry = ArtifactRegistry(str(base_dir))
+    registry.register_run(run_id)
+    run_dir = registry.run_dir(run_id)
+    write_split(run_dir, n_rows=n_rows, seed=seed)
+    DataTransformation(run_dir=run_dir).run()
+    registry.set_stage_status(run_id, "data_transformation", "completed")
+    ModelTrainer(training_mode="parallel", run_dir=run_dir).initiate_model_training()
+    registry.set_stage_status(run_id, "model_training", "completed")
+    return run_dir
+
+
+@pytest.fixture
+def small_forests(monkeypatch):
+    """Trains 10-tree single-job forests so end-to-end tests stay fast."""
+    import components.model_backends as model_backends
+    import components.model_trainer as model_trainer
+    monkeypatch.setattr(model_backends, "MODEL_TRAINER_N_ESTIMATORS", 10)
+    monkeypatch.setattr(model_trainer, "MODEL_TRAINER_N_JOBS", 1)
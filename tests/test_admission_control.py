@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from pipeline.admission_control import AdmissionController, AdmissionRejected
+
+
+def _controller(**kwargs) -> AdmissionController:
+    options = dict(max_in_flight=1, max_queue_depth=4, small_request_rows=10, interactive_budget=1.0, bulk_budget=5.0)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+async def _hold(controller: AdmissionController, rows: int, release: asyncio.Event, order: list = None, name=None):
+    async with controller.admit(rows):
+        if order is not None:
+            order.append(name)
+        await release.wait()
+
+
+def test_free_slot_admits_at_once():
+    async def main():
+        controller = _controller()
+        async with controller.admit(1):
+            assert controller.stats()["in_flight"] == 1
+        return controller.stats()
+    stats = asyncio.run(main())
+    assert stats["admitted"] == stats["completed"] == 1 and stats["in_flight"] == 0
+
+
+@pytest.mark.parametrize("deadline", [0.0, -0.5])
+def test_passed_deadline_is_shed_even_with_a_free_slot(deadline):
+    async def main():
+        controller = _controller()
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(1, deadline):
+                pass
+        return controller, rejected.value
+    controller, error = asyncio.run(main())
+    assert error.status_code == 429
+    assert controller.counters["shed_deadline"] == 1 and controller.counters["admitted"] == 0
+
+
+def test_full_queue_sheds_with_503():
+    async def main():
+        controller = _controller(max_queue_depth=1)
+        release = asyncio.Event()
+        holders = [asyncio.create_task(_hold(controller, 1, release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(1):
+                pass
+        release.set()
+        await asyncio.gather(*holders)
+        return controller, rejected.value
+    controller, error = asyncio.run(main())
+    assert error.status_code == 503 and error.retry_after >= 1
+    assert controller.counters["shed_queue_full"] == 1 and controller.counters["completed"] == 2
+
+
+def test_request_that_cannot_meet_its_deadline_is_shed_up_front():
+    async def main():
+        controller = _controller()
+        controller.base_seconds = 2.0
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, 1, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(1):
+                pass
+        release.set()
+        await holder
+        return rejected.value
+    assert asyncio.run(main()).status_code == 429
+
+
+def test_deadline_passing_in_the_queue_drops_the_request():
+    async def main():
+        controller = _controller(interactive_budget=0.1)
+        controller.base_seconds = 0.001
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, 1, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(1):
+                pass
+        release.set()
+        await holder
+        return controller, rejected.value
+    controller, error = asyncio.run(main())
+    assert error.status_code == 503
+    assert controller.counters["expired_in_queue"] == 1
+    assert controller.stats()["queue_depth"] == {"interactive": 0, "bulk": 0}
+
+
+def test_interactive_requests_go_before_queued_bulk_batches():
+    async def main():
+        controller = _controller()
+        controller.base_seconds, controller.row_seconds = 0.001, 1e-6
+        release, order = asyncio.Event(), []
+        first = asyncio.create_task(_hold(controller, 1, release))
+        await asyncio.sleep(0.01)
+        bulk = asyncio.create_task(_hold(controller, 1000, release, order, "bulk"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(_hold(controller, 1, release, order, "interactive"))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(first, bulk, interactive)
+        return order
+    assert asyncio.run(main()) == ["interactive", "bulk"]
@@ -0,0 +1,132 @@
+import time
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import pipeline.feature_index as feature_index
+import pipeline.prediction_pipeline as prediction_pipeline
+from tests.conftest import train_run
+from utils.artifact_registry import ArtifactRegistry
+
+
+def _serve(monkeypatch):
+    monkeypatch.setattr(app_module, "PREDICTION_SINK_ENABLED", False)
+    monkeypatch.setattr(app_module, "SHADOW_MODE_ENABLED", False)
+    monkeypatch.setattr(app_module, "readiness", {"ready": False, "error": None, "warmup_seconds": None})
+    monkeypatch.setattr(prediction_pipeline, "_bundles", {})
+    monkeypatch.setattr(prediction_pipeline, "_bundle_holders", {})
+    monkeypatch.setattr(feature_index, "_feature_index", None)
+    return TestClient(app_module.app)
+
+
+def _wait_ready(client: TestClient) -> dict:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        body = client.get("/ready").json()
+        if body["ready"] or body["error"]:
+            return body
+        time.sleep(0.05)
+    raise TimeoutError("warm-up did not finish")
+
+
+@pytest.fixture
+def client(workdir, small_forests, monkeypatch):
+    train_run(workdir / "artifacts", "20260101_000000")
+    with _serve(monkeypatch) as client:
+        _wait_ready(client)
+        yield client
+
+
+@pytest.fixture
+def rows(workdir) -> list:
+    test_df = pd.read_csv(workdir / "artifacts" / "20260101_000000" / "dataingestion" / "split" / "test" / "test.csv")
+    return test_df.drop(columns=["Response"]).head(5).to_dict(orient="records")
+
+
+def test_ready_after_warm_up(client):
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["warmup_seconds"] is not None
+
+
+def test_not_ready_without_a_trained_model(workdir, monkeypatch):
+    with _serve(monkeypatch) as client:
+        body = _wait_ready(client)
+        response = client.get("/ready")
+    assert response.status_code == 503
+    assert not body["ready"] and body["error"]
+
+
+def test_predict_scores_a_batch(client, rows):
+    response = client.post("/predict", json=rows)
+    assert response.status_code == 200
+    assert len(response.json()["predictions"]) == 5
+
+
+def test_predict_with_explain_labels_each_row(client, rows):
+    body = client.post("/predict?explain=true", json=rows).json()
+    assert [e["row"] for e in body["explanations"]] == list(range(5))
+    assert {"probability", "forest_score", "bias", "contributions"} <= set(body["explanations"][0])
+    assert not body["explain_truncated"]
+
+
+@pytest.mark.parametrize("payload", [[], [True], {"ids": ["7"]}, {"name": 7}, [1.5]])
+def test_predict_by_id_rejects_malformed_ids(client, payload):
+    assert client.post("/predict/by-id", json=payload).status_code == 400
+
+
+@pytest.mark.parametrize("deadline_ms", ["0", "-250"])
+def test_a_passed_request_deadline_is_shed(client, rows, deadline_ms):
+    response = client.post("/predict", json=rows, headers={"X-Request-Deadline-Ms": deadline_ms})
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert client.get("/metrics").json()["shed_deadline"] >= 1
+
+
+def test_invalid_rows_get_none_and_are_counted(client, rows):
+    rows[1]["Age"] = True
+    body = client.post("/predict", json=rows).json()
+    assert body["predictions"][1] is None and body["predictions"][0] is not None
+    assert body["errors"] == [{"row": 1, "field": "Age", "error": "Age must be an integer"}]
+    assert body["error_count"] == 1
+
+
+def test_predict_by_id_is_unavailable_until_the_index_is_built(client, workdir, monkeypatch):
+    run_dir = workdir / "artifacts" / "20260101_000000"
+    raw_dir = run_dir / "dataingestion" / "raw"
+    raw_dir.mkdir(parents=True)
+    pd.read_csv(run_dir / "dataingestion" / "split" / "test" / "test.csv").to_csv(raw_dir / "raw_data.csv", index=False)
+    ArtifactRegistry(str(workdir / "artifacts")).set_stage_status("20260101_000000", "data_ingestion", "completed")
+    ids = pd.read_csv(raw_dir / "raw_data.csv")["id"].head(2).tolist()
+    monkeypatch.setattr(feature_index, "_feature_index", None)
+    response = client.post("/predict/by-id", json=ids)
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    deadline = time.monotonic() + 30
+    while response.status_code == 503 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = client.post("/predict/by-id", json=ids)
+    assert response.status_code == 200
+    assert len(response.json()["predictions"]) == 2
+
+
+def test_prediction_sink_records_the_request_rows_with_their_id(client, rows, monkeypatch):
+    recorded = []
+
+    class RecordingSink:
+        def record(self, input_df, predictions, model_run_id, endpoint="predict"):
+            recorded.append((input_df, predictions, endpoint))
+
+        def stop(self):
+            pass
+    monkeypatch.setattr(app_module, "PREDICTION_SINK_ENABLED", True)
+    monkeypatch.setattr(app_module, "get_prediction_sink", lambda: RecordingSink())
+    rows[0]["channel"] = "web"
+    rows[2]["Age"] = True
+    body = client.post("/predict", json=rows).json()
+    (input_df, predictions, endpoint), = recorded
+    assert endpoint == "predict"
+    assert input_df["id"].tolist() == [rows[i]["id"] for i in (0, 1, 3, 4)]
+    assert input_df.loc[0, "channel"] == "web"
+    assert predictions == [p for p in body["predictions"] if p is not None]
@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+from utils.artifact_registry import ArtifactRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = ArtifactRegistry(str(tmp_path))
+    for day in range(1, 7):
+        run_id = f"2026010{day}_000000"
+        registry.register_run(run_id)
+        os.makedirs(registry.run_dir(run_id), exist_ok=True)
+        registry.set_stage_status(run_id, "data_ingestion", "completed")
+    return registry
+
+
+def _mark_running(registry: ArtifactRegistry, run_id: str, hours_ago: float) -> None:
+    """Marks model_training running, with a stage marker written hours_ago."""
+    registry.set_stage_status(run_id, "model_training", "running")
+    marker_dir = os.path.join(registry.run_dir(run_id), "_stages")
+    os.makedirs(marker_dir, exist_ok=True)
+    marker_path = os.path.join(marker_dir, "model_training.yaml")
+    with open(marker_path, "w") as f:
+        f.write("status: running\n")
+    then = time.time() - hours_ago * 3600
+    os.utime(marker_path, (then, then))
+
+
+def test_keeps_the_newest_runs_and_the_latest_completed_ones(registry):
+    registry.set_stage_status("20260101_000000", "model_training", "completed")
+    removed = registry.garbage_collect(keep_last=2, pinned=[])
+    assert removed == ["20260102_000000", "20260103_000000", "20260104_000000"]
+    assert sorted(registry.manifest()["runs"]) == ["20260101_000000", "20260105_000000", "20260106_000000"]
+    assert not os.path.exists(registry.run_dir("20260102_000000"))
+
+
+def test_keeps_promoted_and_pinned_runs(registry):
+    registry.promote("20260101_000000")
+    registry.pin("20260102_000000")
+    removed = registry.garbage_collect(keep_last=2, pinned=["20260103_000000"])
+    assert removed == ["20260104_000000"]
+
+
+def test_dry_run_deletes_nothing(registry):
+    removed = registry.garbage_collect(keep_last=1, dry_run=True, pinned=[])
+    assert len(removed) == 5
+    assert len(registry.manifest()["runs"]) == 6
+
+
+def test_keeps_a_run_whose_stage_is_running(registry):
+    _mark_running(registry, "20260101_000000", hours_ago=1)
+    assert "20260101_000000" not in registry.garbage_collect(keep_last=2, pinned=[])
+    assert registry.manifest()["runs"]["20260101_000000"]["stages"]["model_training"] == "running"
+
+
+def test_a_stale_running_stage_is_treated_as_failed(registry):
+    _mark_running(registry, "20260101_000000", hours_ago=48)
+    _mark_running(registry, "20260106_000000", hours_ago=48)
+    assert "20260101_000000" in registry.garbage_collect(keep_last=2, pinned=[])
+    # Still kept as one of the newest runs, but no longer running
+    assert registry.manifest()["runs"]["20260106_000000"]["stages"]["model_training"] == "failed"
+
+
+def test_stale_window_follows_the_retention_age(registry):
+    _mark_running(registry, "20260101_000000", hours_ago=48)
+    # Every run is younger than the age window, so nothing is removed and nothing is stale
+    assert registry.garbage_collect(keep_last=1, max_age_days=7, pinned=[]) == []
+    assert registry.manifest()["runs"]["20260101_000000"]["stages"]["model_training"] == "running"
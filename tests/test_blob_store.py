@@ -0,0 +1,157 @@
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.artifact_registry import _dir_size
+from utils.blob_store import BlobStore, output_exists, read_csv
+from utils.run_profiler import count_rows
+
+
+def _blobs(store: BlobStore) -> list:
+    return sorted(name for _, _, files in os.walk(store.root) for name in files)
+
+
+def _frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"id": np.arange(1, n_rows + 1), "Age": rng.integers(20, 80, n_rows),
+                         "Annual_Premium": rng.uniform(2000, 60000, n_rows).round(2),
+                         "Gender": rng.choice(["Male", "Female"], n_rows)})
+
+
+def test_identical_outputs_share_one_blob(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first = store.put_bytes(b"same bytes", str(tmp_path / "run1" / "out.bin"))
+    second = store.put_bytes(b"same bytes", str(tmp_path / "run2" / "out.bin"))
+    assert first == second
+    assert _blobs(store) == [first]
+    assert os.stat(tmp_path / "run1" / "out.bin").st_ino == os.stat(tmp_path / "run2" / "out.bin").st_ino
+
+
+def test_chunked_csv_reads_back_as_the_frame(tmp_path):
+    store = BlobStore(str(tmp_path))
+    df = _frame(1000)
+    manifest = store.save_csv(df, str(tmp_path / "run1" / "train.csv"), chunk_rows=50)
+    assert len(manifest["chunks"]) > 5 and manifest["rows"] == 1000
+    assert output_exists(str(tmp_path / "run1" / "train.csv"))
+    pd.testing.assert_frame_equal(read_csv(str(tmp_path / "run1" / "train.csv")), df)
+    pd.testing.assert_frame_equal(read_csv(str(tmp_path / "run1" / "train.csv"), nrows=3), df.head(3))
+    assert count_rows(str(tmp_path / "run1" / "train.csv")) == 1000
+
+
+def test_an_empty_frame_keeps_its_header(tmp_path):
+    store = BlobStore(str(tmp_path))
+    store.save_csv(_frame(0), str(tmp_path / "run1" / "test.csv"))
+    assert list(read_csv(str(tmp_path / "run1" / "test.csv")).columns) == ["id", "Age", "Annual_Premium", "Gender"]
+
+
+def test_unchanged_data_writes_no_new_chunks(tmp_path):
+    store = BlobStore(str(tmp_path))
+    store.save_csv(_frame(1000), str(tmp_path / "run1" / "train.csv"), chunk_rows=50)
+    blobs = _blobs(store)
+    store.save_csv(_frame(1000), str(tmp_path / "run2" / "train.csv"), chunk_rows=50)
+    assert _blobs(store) == blobs
+
+
+@pytest.mark.parametrize("change", ["append", "edit", "insert", "delete"])
+def test_a_few_changed_rows_only_store_the_chunks_holding_them(tmp_path, change):
+    store = BlobStore(str(tmp_path))
+    df = _frame(2000)
+    first = store.save_csv(df, str(tmp_path / "run1" / "train.csv"), chunk_rows=50)
+    if change == "append":
+        changed = pd.concat([df, _frame(2010, seed=1).tail(10)], ignore_index=True)
+    elif change == "edit":
+        changed = df.copy()
+        changed.loc[1000, "Age"] = 99
+    elif change == "insert":
+        changed = pd.concat([df.iloc[:1000], _frame(1, seed=2), df.iloc[1000:]], ignore_index=True)
+    else:
+        changed = df.drop(index=1000).reset_index(drop=True)
+    before = set(_blobs(store))
+    second = store.save_csv(changed, str(tmp_path / "run2" / "train.csv"), chunk_rows=50)
+    new = set(_blobs(store)) - before
+    assert 1 <= len(new) <= 2
+    assert len(new) < len(second["chunks"]) // 10
+    assert {c["sha256"] for c in second["chunks"]} - new <= {c["sha256"] for c in first["chunks"]}
+    pd.testing.assert_frame_equal(read_csv(str(tmp_path / "run2" / "train.csv")), changed)
+
+
+def test_chunks_are_hard_links_and_survive_gc_while_a_run_uses_them(tmp_path):
+    store = BlobStore(str(tmp_path))
+    manifest = store.save_csv(_frame(500), str(tmp_path / "run1" / "raw.csv"), chunk_rows=50)
+    chunk = manifest["chunks"][0]["sha256"]
+    assert os.stat(tmp_path / "run1" / "raw.csv.chunks" / chunk).st_ino == os.stat(store.blob_path(chunk)).st_ino
+    assert store.garbage_collect() == (0, 0)
+    shutil.rmtree(tmp_path / "run1")
+    assert store.garbage_collect()[0] == len({c["sha256"] for c in manifest["chunks"]})
+
+
+def test_rewriting_a_chunked_output_replaces_it_whole(tmp_path):
+    store = BlobStore(str(tmp_path))
+    path = str(tmp_path / "run1" / "train.csv")
+    store.put_bytes(b"id\n1\n", path)
+    store.save_csv(_frame(300), path, chunk_rows=50)
+    store.save_csv(_frame(20, seed=5), path, chunk_rows=50)
+    assert not os.path.exists(path)
+    assert os.listdir(tmp_path / "run1") == ["train.csv.chunks"]
+    pd.testing.assert_frame_equal(read_csv(path), _frame(20, seed=5))
+
+
+def test_changed_data_gets_a_new_blob(tmp_path):
+    store = BlobStore(str(tmp_path))
+    array = np.arange(12.0).reshape(3, 4)
+    store.save_numpy(array, str(tmp_path / "run1" / "train.npy"))
+    array[0, 0] = -1
+    store.save_numpy(array, str(tmp_path / "run2" / "train.npy"))
+    assert len(_blobs(store)) == 2
+    np.testing.assert_array_equal(np.load(tmp_path / "run2" / "train.npy"), array)
+
+
+def test_digest_is_the_sha256_of_the_stored_file(tmp_path):
+    import hashlib
+    store = BlobStore(str(tmp_path))
+    digest = store.save_object({"a": [1, 2, 3]}, str(tmp_path / "run1" / "model.pkl"))
+    with open(tmp_path / "run1" / "model.pkl", "rb") as f:
+        assert hashlib.sha256(f.read()).hexdigest() == digest
+    assert joblib.load(tmp_path / "run1" / "model.pkl") == {"a": [1, 2, 3]}
+
+
+def test_rewriting_an_output_leaves_the_shared_blob_intact(tmp_path):
+    store = BlobStore(str(tmp_path))
+    store.put_bytes(b"shared", str(tmp_path / "run1" / "out.bin"))
+    store.put_bytes(b"shared", str(tmp_path / "run2" / "out.bin"))
+    store.put_bytes(b"rewritten", str(tmp_path / "run2" / "out.bin"))
+    assert (tmp_path / "run1" / "out.bin").read_bytes() == b"shared"
+    assert (tmp_path / "run2" / "out.bin").read_bytes() == b"rewritten"
+
+
+def test_garbage_collect_removes_only_unlinked_blobs(tmp_path):
+    store = BlobStore(str(tmp_path))
+    kept = store.put_bytes(b"kept", str(tmp_path / "run1" / "a.bin"))
+    store.put_bytes(b"dropped", str(tmp_path / "run2" / "b.bin"))
+    os.remove(tmp_path / "run2" / "b.bin")
+    assert store.garbage_collect() == (1, len(b"dropped"))
+    assert _blobs(store) == [kept]
+
+
+def test_failed_serialization_leaves_no_temp_files(tmp_path):
+    store = BlobStore(str(tmp_path))
+
+    def fail(f):
+        f.write(b"partial")
+        raise RuntimeError("serializer broke")
+    with pytest.raises(Exception, match="serializer broke"):
+        store.put(fail, str(tmp_path / "run1" / "out.bin"))
+    assert _blobs(store) == []
+    assert not (tmp_path / "run1" / "out.bin").exists()
+
+
+def test_dir_size_counts_hard_linked_files_once(tmp_path):
+    run_dir = tmp_path / "run1"
+    run_dir.mkdir()
+    (run_dir / "a.bin").write_bytes(b"x" * 100)
+    os.link(run_dir / "a.bin", run_dir / "b.bin")
+    assert _dir_size(str(run_dir)) == 100
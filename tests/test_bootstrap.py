@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from utils.bootstrap import METRICS, bootstrap_confidence_intervals, bootstrap_metrics
+from components.model_evaluation import ranking_metrics
+
+
+@pytest.fixture
+def predictions():
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, size=600).astype(np.float64)
+    score = np.clip(0.4 * y + rng.uniform(size=600) * 0.6, 0, 1)
+    return y, score, (score >= 0.5).astype(np.float64)
+
+
+def test_unit_weights_reproduce_the_point_metrics(predictions):
+    y, score, pred = predictions
+    order = np.argsort(-score, kind="mergesort")
+    cut = np.r_[np.flatnonzero(np.diff(score[order])), len(score) - 1]
+    metrics = bootstrap_metrics(np.ones((1, len(y))), y[order], pred[order], cut)
+    ranking = ranking_metrics(y, score)
+    assert metrics["accuracy"][0] == pytest.approx((pred == y).mean())
+    assert metrics["recall_positive"][0] == pytest.approx(pred[y == 1].mean())
+    assert metrics["roc_auc"][0] == pytest.approx(ranking["roc_auc"])
+    assert metrics["pr_auc"][0] == pytest.approx(ranking["pr_auc"])
+
+
+def test_intervals_bracket_the_point_estimate(predictions):
+    y, score, pred = predictions
+    result = bootstrap_confidence_intervals(y, score, pred, n_replicates=200, time_budget=60, n_workers=2,
+                                            max_cells_per_task=600 * 50)
+    assert result["replicates_completed"] == 200
+    assert not result["budget_exhausted"]
+    assert set(result["intervals"]) == set(METRICS)
+    accuracy = result["intervals"]["accuracy"]
+    assert accuracy["lower"] <= (pred == y).mean() <= accuracy["upper"]
+
+
+def test_same_seed_gives_the_same_intervals(predictions):
+    y, score, pred = predictions
+    runs = [bootstrap_confidence_intervals(y, score, pred, n_replicates=50, time_budget=60, n_workers=1, seed=3)
+            for _ in range(2)]
+    assert runs[0]["intervals"] == runs[1]["intervals"]
+
+
+def test_an_exhausted_budget_reports_what_finished(predictions):
+    y, score, pred = predictions
+    result = bootstrap_confidence_intervals(y, score, pred, n_replicates=100, time_budget=0, n_workers=1)
+    assert result["budget_exhausted"]
+    assert result["replicates_completed"] == 0
+    assert result["intervals"] == {}
+
+
+def test_memory_limit_shrinks_blocks_then_workers(predictions):
+    y, score, pred = predictions
+    # 600 rows at 96 bytes per resampled row: 9 replicates fit in half a megabyte
+    result = bootstrap_confidence_intervals(y, score, pred, n_replicates=40, time_budget=60, n_workers=4,
+                                            memory_limit_mb=0.5)
+    assert result["workers"] == 4 and result["replicates_per_task"] == 2
+    assert result["replicates_completed"] == 40
+    result = bootstrap_confidence_intervals(y, score, pred, n_replicates=10, time_budget=60, n_workers=4,
+                                            memory_limit_mb=0.1)
+    assert result["workers"] == 1 and result["replicates_per_task"] == 1
+
+
+def test_blocks_running_past_the_budget_are_terminated():
+    import multiprocessing
+    import time
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, size=200_000).astype(np.float64)
+    score = rng.uniform(size=200_000)
+    start = time.perf_counter()
+    result = bootstrap_confidence_intervals(y, score, (score > 0.5).astype(np.float64), n_replicates=2000,
+                                            time_budget=1, n_workers=1, max_cells_per_task=10**9)
+    assert result["budget_exhausted"]
+    assert time.perf_counter() - start < 10
+    deadline = time.monotonic() + 5
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert multiprocessing.active_children() == []
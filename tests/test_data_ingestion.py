@@ -0,0 +1,59 @@
+import pandas as pd
+
+import components.data_ingestion as data_ingestion
+from components.data_ingestion import DataIngestion
+from utils.blob_store import read_csv
+from utils.synthetic_data import SyntheticDataGenerator
+
+
+def _ingest(workdir, run_id: str, df: pd.DataFrame) -> tuple:
+    source = workdir / f"{run_id}.csv"
+    df.to_csv(source, index=False)
+    DataIngestion(run_id=run_id, source_path=str(source)).run()
+    split_dir = workdir / "artifacts" / run_id / "dataingestion" / "split"
+    return read_csv(str(split_dir / "train" / "train.csv")), read_csv(str(split_dir / "test" / "test.csv"))
+
+
+def test_split_holds_out_the_configured_share_of_rows(workdir):
+    df = SyntheticDataGenerator(seed=0).generate(5000)
+    train, test = _ingest(workdir, "20260101_000000", df)
+    assert set(train["id"]).isdisjoint(test["id"])
+    assert len(train) + len(test) == 5000
+    assert abs(len(test) / 5000 - 0.2) < 0.03
+
+
+def test_rows_keep_their_side_of_the_split_as_data_is_added(workdir):
+    generator = SyntheticDataGenerator(seed=0)
+    first = generator.generate(2000)
+    train1, test1 = _ingest(workdir, "20260101_000000", first)
+    # New rows arrive, and the source returns them in another order
+    grown = pd.concat([first, generator.generate(500, start_id=2001)]).sample(frac=1, random_state=3)
+    train2, test2 = _ingest(workdir, "20260102_000000", grown)
+    assert set(train1["id"]) <= set(train2["id"])
+    assert set(test1["id"]) <= set(test2["id"])
+
+
+def test_data_without_the_hash_column_falls_back_to_a_seeded_split(workdir, monkeypatch):
+    monkeypatch.setattr(data_ingestion, "DATA_INGESTION_SPLIT_HASH_COLUMN", "customer_ref")
+    df = SyntheticDataGenerator(seed=0).generate(1000)
+    train1, test1 = _ingest(workdir, "20260101_000000", df)
+    train2, test2 = _ingest(workdir, "20260102_000000", df)
+    assert len(test1) == 200
+    pd.testing.assert_frame_equal(test1, test2)
+
+
+def test_reingesting_slightly_changed_data_stores_few_new_chunks(workdir, monkeypatch):
+    import utils.blob_store as blob_store
+    monkeypatch.setattr(blob_store, "ARTIFACT_BLOB_CHUNK_ROWS", 200)
+    generator = SyntheticDataGenerator(seed=0)
+    first = generator.generate(10000)
+    _ingest(workdir, "20260101_000000", first)
+    blob_dir = workdir / "artifacts" / "blobs"
+    before = {p.name for p in blob_dir.rglob("*") if p.is_file()}
+    _ingest(workdir, "20260102_000000", pd.concat([first, generator.generate(50, start_id=10001)]))
+    new = {p.name for p in blob_dir.rglob("*") if p.is_file()} - before
+    manifests = [blob_store.chunk_manifest(str(workdir / "artifacts" / "20260102_000000" / "dataingestion" / path))
+                 for path in ("raw/raw_data.csv", "split/train/train.csv", "split/test/test.csv")]
+    # Only the tail chunk of each output holds the new ids
+    assert len(new) <= 6
+    assert sum(len(m["chunks"]) for m in manifests) > 60
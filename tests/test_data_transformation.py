@@ -0,0 +1,39 @@
+import os
+
+import joblib
+
+from components.data_transformation import DataTransformation
+from components.model_trainer import ModelTrainer
+from utils.artifact_registry import ArtifactRegistry
+from tests.conftest import write_split
+
+
+def _transform(run_id: str, training_mode: str, seed: int) -> str:
+    registry = ArtifactRegistry("artifacts")
+    registry.register_run(run_id)
+    run_dir = registry.run_dir(run_id)
+    write_split(run_dir, seed=seed)
+    DataTransformation(run_dir=run_dir, training_mode=training_mode).run()
+    return run_dir
+
+
+def _mark_trained(run_dir: str) -> None:
+    model_dir = os.path.join(run_dir, "model_trainer")
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(None, os.path.join(model_dir, "random_forest_model.pkl"))
+    ArtifactRegistry("artifacts").set_stage_status(os.path.basename(run_dir), "model_training", "completed")
+
+
+def test_incremental_mode_reuses_the_previous_runs_preprocessor(workdir):
+    first = _transform("20260101_000000", "incremental", seed=0)
+    _mark_trained(first)
+    second = _transform("20260102_000000", "incremental", seed=1)
+    assert ModelTrainer()._same_preprocessor(first, second)
+
+
+def test_parallel_mode_refits_the_preprocessor(workdir):
+    first = _transform("20260101_000000", "parallel", seed=0)
+    _mark_trained(first)
+    second = _transform("20260102_000000", "parallel", seed=1)
+    assert not ModelTrainer()._same_preprocessor(first, second)
+
@@ -0,0 +1,137 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline.feature_index as feature_index
+from pipeline.feature_index import FeatureIndex, FeatureIndexNotReady
+from pipeline.prediction_pipeline import InferenceBundle
+from utils.artifact_registry import ArtifactRegistry
+from utils.blob_store import BlobStore
+from utils.synthetic_data import SyntheticDataGenerator
+from tests.conftest import train_run
+
+
+def _ingest(registry: ArtifactRegistry, run_id: str, df: pd.DataFrame, chunk_rows: int = None) -> None:
+    """Writes the raw data of an ingestion run: chunked like DataIngestion, or a plain CSV without chunk_rows."""
+    registry.register_run(run_id)
+    raw_dir = os.path.join(registry.run_dir(run_id), "dataingestion", "raw")
+    os.makedirs(raw_dir, exist_ok=True)
+    if chunk_rows:
+        BlobStore(registry.base_dir).save_csv(df, os.path.join(raw_dir, "raw_data.csv"), chunk_rows=chunk_rows)
+    else:
+        df.to_csv(os.path.join(raw_dir, "raw_data.csv"), index=False)
+    registry.set_stage_status(run_id, "data_ingestion", "completed")
+
+
+def _wait_for(condition) -> None:
+    deadline = time.monotonic() + 30
+    while not condition():
+        assert time.monotonic() < deadline, "background refresh did not finish"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def setup(workdir, small_forests):
+    base_dir = workdir / "artifacts"
+    bundle = InferenceBundle(train_run(base_dir, "20260101_000000"))
+    registry = ArtifactRegistry(str(base_dir))
+    raw = SyntheticDataGenerator(seed=5).generate(300)
+    _ingest(registry, "20260101_000000", raw)
+    index = FeatureIndex(str(base_dir))
+    index.refresh(bundle)
+    return index, bundle, registry, raw
+
+
+def test_single_rows_encode_like_the_batch(setup):
+    _, bundle, _, raw = setup
+    rows = raw.drop(columns=["Response"]).head(20)
+    batch = bundle.transform(rows.copy())
+    for i in range(len(rows)):
+        np.testing.assert_array_equal(bundle.transform(rows.iloc[[i]].reset_index(drop=True)), batch[[i]])
+
+
+def test_scores_by_id_match_scoring_the_raw_rows(setup):
+    index, bundle, _, raw = setup
+    ids = [7, 1, 300, 42]
+    predictions, missing, run_id = index.predict(ids, bundle)
+    rows = raw.set_index("id").loc[ids].reset_index().drop(columns=["Response"])
+    assert predictions == bundle.predict(rows)
+    assert missing == [] and run_id == "20260101_000000"
+
+
+def test_unknown_ids_are_reported(setup):
+    index, bundle, _, _ = setup
+    predictions, missing, _ = index.predict([5, 10_000, -1], bundle)
+    assert predictions[0] is not None and predictions[1:] == [None, None]
+    assert missing == [10_000, -1]
+
+
+def test_refresh_reencodes_only_new_and_changed_rows(setup, monkeypatch):
+    index, bundle, registry, raw = setup
+    encoded = []
+    original_encode = FeatureIndex._encode
+    monkeypatch.setattr(FeatureIndex, "_encode",
+                        staticmethod(lambda b, rows: encoded.append(len(rows)) or original_encode(b, rows)))
+
+    changed = raw.copy()
+    changed.loc[changed["id"] == 3, "Age"] += 1
+    changed = pd.concat([changed[changed["id"] != 4], SyntheticDataGenerator(seed=6).generate(2, start_id=301)])
+    _ingest(registry, "20260102_000000", changed)
+    assert index.refresh(bundle)
+    assert encoded == [3]
+    assert index.stats()["ids"] == 301
+    assert index.predict([4], bundle)[1] == [4]
+    assert not index.refresh(bundle)
+
+
+def test_requests_never_build_the_index(setup):
+    _, bundle, registry, _ = setup
+    index = FeatureIndex(registry.base_dir)
+    with pytest.raises(FeatureIndexNotReady):
+        index.predict([1], bundle)
+    _wait_for(lambda: index.stats()["ids"] == 300)
+    assert index.predict([1], bundle)[0][0] is not None
+
+
+def test_a_new_bundle_is_indexed_in_the_background_while_the_old_one_serves(setup, monkeypatch):
+    index, bundle, registry, _ = setup
+    new_bundle = InferenceBundle(registry.run_dir("20260101_000000"))
+    new_bundle.run_id = "20260102_000000"
+    encoding = []
+    original_encode = FeatureIndex._encode
+
+    def slow_encode(b, rows):
+        encoding.append(b)
+        time.sleep(0.5)
+        return original_encode(b, rows)
+    monkeypatch.setattr(FeatureIndex, "_encode", staticmethod(slow_encode))
+    _, _, run_id = index.predict([1, 2], new_bundle)
+    assert run_id == "20260101_000000"
+    _wait_for(lambda: index.stats()["model_run_id"] == "20260102_000000")
+    assert encoding == [new_bundle]
+    assert index.predict([1, 2], new_bundle)[2] == "20260102_000000"
+
+
+def test_refresh_reads_only_new_raw_data_chunks(setup, monkeypatch):
+    _, bundle, registry, _ = setup
+    generator = SyntheticDataGenerator(seed=7)
+    raw = generator.generate(2000)
+    _ingest(registry, "20260102_000000", raw, chunk_rows=50)
+    index = FeatureIndex(registry.base_dir)
+    index.refresh(bundle)
+
+    read = []
+    original_read = feature_index.read_csv_chunk
+    monkeypatch.setattr(feature_index, "read_csv_chunk",
+                        lambda path, manifest, chunk, **kw: read.append(chunk) or original_read(path, manifest, chunk, **kw))
+    grown = pd.concat([raw, generator.generate(5, start_id=2001)], ignore_index=True)
+    _ingest(registry, "20260103_000000", grown, chunk_rows=50)
+    assert index.refresh(bundle)
+    assert 1 <= len(read) <= 2
+    assert index.stats()["ids"] == 2005
+    predictions, missing, _ = index.predict([2003, 17], bundle)
+    rows = grown.set_index("id").loc[[2003, 17]].reset_index().drop(columns=["Response"])
+    assert predictions == bundle.predict(rows) and missing == []
@@ -0,0 +1,66 @@
+import subprocess
+import sys
+
+import pytest
+
+import logger
+from logger import configure_logger, hot_path, hot_path_filter, logging
+from tests.conftest import REPO_ROOT
+
+
+@pytest.fixture(autouse=True)
+def restore_logging(monkeypatch):
+    monkeypatch.setattr(hot_path_filter, "sample_every", 10)
+    monkeypatch.setattr(hot_path_filter, "max_per_second", None)
+    yield
+    configure_logger(queued=False)
+
+
+def _dropped_while_logging(n: int) -> int:
+    before = hot_path_filter.dropped
+    with hot_path():
+        for i in range(n):
+            logging.debug(f"scored request {i}")
+    return hot_path_filter.dropped - before
+
+
+@pytest.mark.parametrize("queued", [False, True])
+def test_each_record_advances_the_sampler_once(queued):
+    configure_logger(queued=queued)
+    # With two handlers each consulting the filter, twice as many records would be dropped
+    assert _dropped_while_logging(100) == 90
+
+
+def test_records_outside_the_hot_path_are_kept():
+    configure_logger(queued=False)
+    before = hot_path_filter.dropped
+    for i in range(50):
+        logging.debug(f"training step {i}")
+    assert hot_path_filter.dropped == before
+
+
+def test_errors_are_never_sampled():
+    configure_logger(queued=False)
+    before = hot_path_filter.dropped
+    with hot_path():
+        for _ in range(20):
+            logging.error("scoring failed")
+    assert hot_path_filter.dropped == before
+
+
+def test_sampling_can_be_turned_off():
+    configure_logger(queued=False, sample_hot_path=False)
+    assert _dropped_while_logging(50) == 0
+
+
+def test_queued_logging_runs_a_listener_until_reconfigured():
+    configure_logger(queued=True)
+    assert logger._listener is not None
+    configure_logger(queued=False)
+    assert logger._listener is None
+
+
+def test_import_starts_no_listener_thread():
+    code = "import threading, logger; print(logger._listener is None, threading.active_count())"
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["True", "1"]
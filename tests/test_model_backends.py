@@ -0,0 +1,60 @@
+import os
+
+import joblib
+import pytest
+import yaml
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+
+import components.model_trainer as model_trainer
+from components.model_backends import MODEL_BACKENDS, get_model_backend, get_model_path, load_model, load_tuned_params
+from components.model_trainer import ModelTrainer
+from tests.conftest import make_arrays, write_transformed_run
+
+
+def test_registered_backends_build_their_estimators():
+    assert isinstance(get_model_backend("random_forest").build(), RandomForestClassifier)
+    assert isinstance(get_model_backend("hist_gradient_boosting").build(), HistGradientBoostingClassifier)
+    assert {b.size_param for b in MODEL_BACKENDS.values()} == {"n_estimators", "max_iter"}
+
+
+def test_params_override_the_configured_defaults():
+    model = get_model_backend("hist_gradient_boosting").build({"max_iter": 7, "learning_rate": 0.5})
+    assert model.max_iter == 7 and model.learning_rate == 0.5
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown model backend"):
+        get_model_backend("xgboost")
+
+
+def test_tuned_params_of_another_backend_are_ignored(tmp_path):
+    tuner_dir = tmp_path / "model_tuner"
+    tuner_dir.mkdir()
+    (tuner_dir / "best_params.yaml").write_text(yaml.dump({"backend": "random_forest", "best_params": {"max_depth": 4}}))
+    assert load_tuned_params(str(tmp_path), "random_forest") == {"max_depth": 4}
+    assert load_tuned_params(str(tmp_path), "hist_gradient_boosting") == {}
+    assert load_tuned_params(str(tmp_path / "missing"), "random_forest") == {}
+
+
+def test_model_path_comes_from_the_trainer_report_with_a_legacy_fallback(tmp_path):
+    assert get_model_path(str(tmp_path)) == (str(tmp_path / "model_trainer" / "random_forest_model.pkl"), "random_forest")
+    (tmp_path / "model_trainer").mkdir()
+    (tmp_path / "model_trainer" / "model_trainer_report.yaml").write_text(yaml.dump({"backend": "hist_gradient_boosting"}))
+    path, backend = get_model_path(str(tmp_path))
+    assert backend == "hist_gradient_boosting" and path.endswith("hist_gradient_boosting_model.pkl")
+
+
+def test_hist_gradient_boosting_trains_and_loads_through_the_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_trainer, "MODEL_TRAINER_N_JOBS", 1)
+    run_dir = str(tmp_path / "20260101_000000")
+    write_transformed_run(run_dir, *make_arrays())
+    model_path = ModelTrainer(backend="hist_gradient_boosting", run_dir=run_dir).initiate_model_training()
+    assert os.path.basename(model_path) == "hist_gradient_boosting_model.pkl"
+    model = load_model(run_dir, prefer_compact=False)
+    assert isinstance(model, HistGradientBoostingClassifier)
+    assert model.n_iter_ == joblib.load(model_path).n_iter_
+
+
+def test_missing_model_file_is_an_error(tmp_path):
+    with pytest.raises(Exception, match="Model not found"):
+        load_model(str(tmp_path), prefer_compact=False)
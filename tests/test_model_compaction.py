@@ -0,0 +1,81 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+import yaml
+from sklearn.ensemble import RandomForestClassifier
+
+import components.model_compaction as model_compaction
+from components.model_compaction import ModelCompaction, build_compact_forest
+from tests.conftest import make_arrays, write_transformed_run
+
+
+def _forest_run(run_dir, n_rows: int = 2000, n_estimators: int = 40) -> tuple:
+    train_arr, test_arr = make_arrays(n_rows=n_rows)
+    write_transformed_run(run_dir, train_arr, test_arr)
+    forest = RandomForestClassifier(n_estimators=n_estimators, max_depth=6, random_state=0)
+    forest.fit(train_arr[:, :-1], train_arr[:, -1])
+    os.makedirs(os.path.join(run_dir, "model_trainer"), exist_ok=True)
+    joblib.dump(forest, os.path.join(run_dir, "model_trainer", "random_forest_model.pkl"))
+    return forest, test_arr
+
+
+def _compact(run_dir) -> dict:
+    with open(ModelCompaction(run_dir=str(run_dir)).initiate_model_compaction()) as f:
+        return yaml.safe_load(f)
+
+
+def test_compact_forest_with_every_tree_matches_the_forest(tmp_path):
+    forest, test_arr = _forest_run(tmp_path)
+    X = test_arr[:, :-1].astype(np.float32)
+    compact = build_compact_forest(forest, np.arange(len(forest.estimators_)), leaf_dtype="float16")
+    np.testing.assert_allclose(compact.predict_proba(X), forest.predict_proba(X), atol=1e-3)
+    assert (compact.predict(X) == forest.predict(X)).mean() > 0.99
+
+
+def test_accepted_compaction_stays_within_tolerance_on_the_check_rows(tmp_path):
+    _forest_run(tmp_path)
+    report = _compact(tmp_path)
+    assert report["accepted"]
+    assert report["trees_after"] <= report["trees_before"]
+    assert report["check_rows"] + report["selection_rows"] == 500
+    for metric, before in report["metrics_before"].items():
+        assert report["metrics_after"][metric] >= before - report["tolerance"]
+    assert os.path.exists(report["compact_model_path"])
+
+
+def test_check_rows_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_compaction, "MODEL_COMPACTION_MAX_CHECK_ROWS", 100)
+    _forest_run(tmp_path)
+    report = _compact(tmp_path)
+    assert report["check_rows"] == 100
+
+
+def test_compaction_that_cannot_meet_the_tolerance_keeps_the_full_model(tmp_path, monkeypatch):
+    # A negative tolerance demands the compact model beat the full forest by a clear margin
+    monkeypatch.setattr(model_compaction, "MODEL_COMPACTION_TOLERANCE", -0.5)
+    _forest_run(tmp_path)
+    report = _compact(tmp_path)
+    assert not report["accepted"]
+    assert report["trees_after"] == report["trees_before"]
+    assert report["compact_model_path"] is None
+    assert not os.path.exists(os.path.join(tmp_path, "model_compaction", "compact_model.pkl"))
+
+
+def test_non_forest_models_are_skipped(tmp_path):
+    from sklearn.linear_model import LogisticRegression
+    train_arr, test_arr = make_arrays()
+    write_transformed_run(tmp_path, train_arr, test_arr)
+    os.makedirs(os.path.join(tmp_path, "model_trainer"))
+    model = LogisticRegression().fit(train_arr[:, :-1], train_arr[:, -1])
+    joblib.dump(model, os.path.join(tmp_path, "model_trainer", "random_forest_model.pkl"))
+    assert ModelCompaction(run_dir=str(tmp_path)).initiate_model_compaction() is None
+
+
+@pytest.mark.parametrize("leaf_dtype", ["uint8", "float16"])
+def test_leaf_quantization_keeps_probabilities_close(tmp_path, leaf_dtype):
+    forest, test_arr = _forest_run(tmp_path, n_estimators=10)
+    X = test_arr[:, :-1].astype(np.float32)
+    compact = build_compact_forest(forest, np.arange(10), leaf_dtype=leaf_dtype)
+    assert np.abs(compact.predict_proba(X) - forest.predict_proba(X)).max() < 0.01
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+import yaml
+
+import components.model_cross_validation as model_cross_validation
+from components.model_cross_validation import FOLD_METRICS, ModelCrossValidation
+from tests.conftest import make_arrays, write_transformed_run
+
+
+def _cv_run(run_dir, n_folds: int = 3, memory_limit_mb: float = 1024) -> dict:
+    write_transformed_run(run_dir, *make_arrays(n_rows=300))
+    # Workers are spawned, so small forests go through the tuned parameters rather than a patch
+    os.makedirs(os.path.join(run_dir, "model_tuner"))
+    with open(os.path.join(run_dir, "model_tuner", "best_params.yaml"), "w") as f:
+        yaml.dump({"backend": "random_forest", "best_params": {"n_estimators": 5, "n_jobs": 1}}, f)
+    report_path = ModelCrossValidation(
+        n_folds=n_folds, run_dir=str(run_dir), memory_limit_mb=memory_limit_mb).initiate_cross_validation()
+    assert report_path == os.path.join(run_dir, "model_cross_validation", "cross_validation_report.yaml")
+    with open(report_path) as f:
+        return yaml.safe_load(f)
+
+
+def test_every_fold_is_scored_on_disjoint_validation_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_cross_validation, "MODEL_CV_N_WORKERS", 2)
+    report = _cv_run(tmp_path)
+    assert report["n_folds"] == 3
+    assert [fold["fold"] for fold in report["folds"]] == [0, 1, 2]
+    assert sum(fold["validation_rows"] for fold in report["folds"]) == report["train_rows"] == 300
+    for fold in report["folds"]:
+        assert fold["fit_rows"] + fold["validation_rows"] == 300
+        assert fold["roc_auc"] > 0.7
+
+
+def test_aggregate_summarizes_the_folds(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_cross_validation, "MODEL_CV_N_WORKERS", 2)
+    report = _cv_run(tmp_path)
+    for metric in FOLD_METRICS:
+        values = [fold[metric] for fold in report["folds"]]
+        summary = report["aggregate"][metric]
+        assert summary["min"] == pytest.approx(min(values), abs=1e-6)
+        assert summary["max"] == pytest.approx(max(values), abs=1e-6)
+        assert summary["min"] <= summary["mean"] <= summary["max"]
+    timings = report["timings"]
+    assert timings["workers"] == 2
+    assert timings["wall_seconds"] > 0
+    assert timings["fold_seconds_total"] == pytest.approx(
+        sum(f["fit_seconds"] + f["score_seconds"] for f in report["folds"]), abs=0.01)
+
+
+def test_concurrent_folds_are_capped_by_the_memory_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_cross_validation, "MODEL_CV_N_WORKERS", 3)
+    uncapped = _cv_run(tmp_path / "uncapped")
+    assert uncapped["timings"]["workers"] == 3
+    fold_mb = uncapped["memory"]["fold_fit_rows_mb"]
+    assert uncapped["memory"]["peak_fit_rows_mb"] == pytest.approx(3 * fold_mb, abs=1e-3)
+
+    capped = _cv_run(tmp_path / "capped", memory_limit_mb=fold_mb * 2.5)
+    assert capped["timings"]["workers"] == 2
+    assert capped["memory"]["peak_fit_rows_mb"] <= capped["memory"]["limit_mb"]
+    assert capped["memory"]["peak_worker_rss_mb"] > 0
+    assert [fold["fold"] for fold in capped["folds"]] == [0, 1, 2]
+
+
+def test_fewer_than_two_folds_are_rejected():
+    with pytest.raises(ValueError):
+        ModelCrossValidation(n_folds=1)
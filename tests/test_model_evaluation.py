@@ -0,0 +1,84 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+import yaml
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import average_precision_score, roc_auc_score
+
+import components.model_evaluation as model_evaluation
+from components.model_evaluation import (
+    ModelEvaluation, calibration_bins, predict_proba_chunked, ranking_metrics, threshold_sweep
+)
+from tests.conftest import make_arrays, write_transformed_run
+
+
+@pytest.fixture
+def scored():
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, size=1000).astype(np.float64)
+    # Rounded so that many rows tie on their score
+    score = np.round(np.clip(0.3 * y + rng.uniform(size=1000) * 0.7, 0, 1), 2)
+    return y, score
+
+
+def test_ranking_metrics_match_sklearn(scored):
+    y, score = scored
+    metrics = ranking_metrics(y, score)
+    assert metrics["roc_auc"] == pytest.approx(roc_auc_score(y, score))
+    assert metrics["pr_auc"] == pytest.approx(average_precision_score(y, score))
+
+
+def test_ranking_metrics_without_negatives_have_no_roc_auc():
+    metrics = ranking_metrics(np.ones(5), np.linspace(0.1, 0.9, 5))
+    assert metrics["roc_auc"] is None
+    assert metrics["pr_auc"] == pytest.approx(1.0)
+
+
+def test_threshold_sweep_matches_a_loop_over_thresholds(scored):
+    y, score = scored
+    sweep = threshold_sweep(y, score, n_points=11)
+    for i, threshold in enumerate(np.linspace(0.0, 1.0, 11)):
+        predicted = score >= threshold
+        tp = (predicted & (y == 1)).sum()
+        assert sweep["predicted_positive"][i] == predicted.sum()
+        assert sweep["recall"][i] == pytest.approx(tp / y.sum(), abs=1e-6)
+        if predicted.any():
+            assert sweep["precision"][i] == pytest.approx(tp / predicted.sum(), abs=1e-6)
+
+
+def test_calibration_bins_count_every_row_once(scored):
+    y, score = scored
+    calibration = calibration_bins(y, score, n_bins=5)
+    assert sum(calibration["count"]) == len(y)
+    assert len(calibration["bin_edges"]) == 6
+    perfect = calibration_bins(np.array([0.0, 1.0]), np.array([0.0, 1.0]), n_bins=2)
+    assert perfect["expected_calibration_error"] == 0.0
+
+
+def test_chunked_probabilities_equal_one_pass():
+    train_arr, test_arr = make_arrays()
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(train_arr[:, :-1], train_arr[:, -1])
+    np.testing.assert_array_equal(predict_proba_chunked(model, test_arr[:, :-1], chunk_size=7),
+                                  model.predict_proba(test_arr[:, :-1]))
+
+
+def test_evaluation_report_is_derived_from_one_probability_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_evaluation, "MODEL_EVALUATION_BOOTSTRAP_REPLICATES", 0)
+    run_dir = tmp_path / "20260101_000000"
+    train_arr, test_arr = make_arrays()
+    write_transformed_run(run_dir, train_arr, test_arr)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(train_arr[:, :-1], train_arr[:, -1])
+    os.makedirs(run_dir / "model_trainer")
+    joblib.dump(model, run_dir / "model_trainer" / "random_forest_model.pkl")
+
+    with open(ModelEvaluation(run_dir=str(run_dir)).evaluate_model()) as f:
+        report = yaml.safe_load(f)
+    score = model.predict_proba(test_arr[:, :-1])[:, 1]
+    assert report["test_rows"] == len(test_arr)
+    assert report["roc_auc"] == pytest.approx(roc_auc_score(test_arr[:, -1], score))
+    assert report["confidence_intervals"] is None
+    assert {"predict_proba_seconds", "ranking_metrics_seconds"} <= set(report["timings"])
+    cached = np.load(report["test_predictions_path"])
+    np.testing.assert_allclose(cached[:, 1], score)
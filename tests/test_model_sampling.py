@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+import components.model_backends as model_backends
+import components.model_trainer as model_trainer
+from components.model_trainer import ModelTrainer
+from tests.conftest import write_transformed_run
+
+
+@pytest.fixture
+def imbalanced_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_backends, "MODEL_TRAINER_N_ESTIMATORS", 10)
+    monkeypatch.setattr(model_trainer, "MODEL_TRAINER_N_JOBS", 1)
+    rng = np.random.default_rng(0)
+    arrays = []
+    for n in (1000, 250):
+        X = rng.normal(size=(n, 4))
+        y = (X[:, 0] > 1.3).astype(np.float64)  # about 10% positives
+        arrays.append(np.c_[X, y])
+    run_dir = str(tmp_path / "20260101_000000")
+    write_transformed_run(run_dir, *arrays)
+    return run_dir, int(arrays[0][:, -1].sum())
+
+
+def _report(run_dir) -> dict:
+    with open(os.path.join(run_dir, "model_trainer", "model_trainer_report.yaml")) as f:
+        return yaml.safe_load(f)
+
+
+def test_undersampling_fits_on_balanced_classes(imbalanced_run):
+    run_dir, minority = imbalanced_run
+    ModelTrainer(sampling_strategy="undersample", run_dir=run_dir).initiate_model_training()
+    report = _report(run_dir)
+    assert report["minority_rows"] == minority
+    assert report["fitted_rows"] == 2 * minority
+    assert report["train_rows"] == 1000
+
+
+def test_balanced_bagging_turns_the_forest_into_a_balanced_random_forest(imbalanced_run):
+    from imblearn.ensemble import BalancedRandomForestClassifier
+    import joblib
+    run_dir, minority = imbalanced_run
+    model_path = ModelTrainer(sampling_strategy="balanced_bagging", run_dir=run_dir).initiate_model_training()
+    assert isinstance(joblib.load(model_path), BalancedRandomForestClassifier)
+    report = _report(run_dir)
+    assert report["fitted_rows"] == 1000
+    assert report["rows_per_member"] == 2 * minority
+
+
+def test_balanced_bagging_never_warm_starts(imbalanced_run):
+    run_dir, _ = imbalanced_run
+    ModelTrainer(training_mode="incremental", sampling_strategy="balanced_bagging",
+                 run_dir=run_dir).initiate_model_training()
+    assert _report(run_dir)["training_mode"] == "parallel"
+
+
+def test_unknown_sampling_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ModelTrainer(sampling_strategy="smote")
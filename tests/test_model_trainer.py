@@ -0,0 +1,94 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+import yaml
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import components.model_backends as model_backends
+import components.model_trainer as model_trainer
+from components.model_trainer import ModelTrainer
+from utils.artifact_registry import ArtifactRegistry
+from tests.conftest import make_arrays, write_transformed_run
+
+
+def _preprocessor(fit_on: np.ndarray) -> Pipeline:
+    return Pipeline([("preprocessor", ColumnTransformer(
+        [("standard_scaler", StandardScaler(), [0, 1])], remainder="passthrough"
+    ))]).fit(fit_on[:, :-1])
+
+
+def _train(base_dir, run_id: str, mode: str, preprocessor, seed: int = 0) -> dict:
+    registry = ArtifactRegistry(str(base_dir))
+    registry.register_run(run_id)
+    run_dir = registry.run_dir(run_id)
+    train_arr, test_arr = make_arrays(seed=seed)
+    write_transformed_run(run_dir, train_arr, test_arr, preprocessor)
+    ModelTrainer(training_mode=mode, run_dir=run_dir).initiate_model_training()
+    registry.set_stage_status(run_id, "model_training", "completed")
+    with open(os.path.join(run_dir, "model_trainer", "model_trainer_report.yaml")) as f:
+        return yaml.safe_load(f)
+
+
+@pytest.fixture(autouse=True)
+def small_forests(monkeypatch):
+    monkeypatch.setattr(model_backends, "MODEL_TRAINER_N_ESTIMATORS", 10)
+    monkeypatch.setattr(model_trainer, "MODEL_TRAINER_INCREMENTAL_N_ESTIMATORS", 5)
+    monkeypatch.setattr(model_trainer, "MODEL_TRAINER_N_JOBS", 1)
+
+
+def test_parallel_mode_fits_a_fresh_model(tmp_path):
+    preprocessor = _preprocessor(make_arrays()[0])
+    report = _train(tmp_path, "20260101_000000", "parallel", preprocessor)
+    assert report["training_mode"] == "parallel"
+    assert report["n_estimators"] == 10
+    assert report["previous_model_path"] is None
+    assert report["test_accuracy"] > 0.7
+
+
+def test_incremental_mode_without_previous_model_falls_back_to_a_full_fit(tmp_path):
+    report = _train(tmp_path, "20260101_000000", "incremental", _preprocessor(make_arrays()[0]))
+    assert report["training_mode"] == "parallel"
+    assert report["n_estimators"] == 10
+
+
+def test_incremental_mode_grows_the_previous_model_behind_the_same_preprocessor(tmp_path):
+    preprocessor = _preprocessor(make_arrays()[0])
+    _train(tmp_path, "20260101_000000", "parallel", preprocessor)
+    report = _train(tmp_path, "20260102_000000", "incremental", preprocessor, seed=1)
+    assert report["training_mode"] == "incremental"
+    assert report["n_estimators"] == 15
+    assert "20260101_000000" in report["previous_model_path"]
+    model = joblib.load(report["model_path"])
+    assert len(model.estimators_) == 15
+    assert model.get_params()["warm_start"] is False
+
+
+def test_incremental_mode_refuses_trees_fitted_on_differently_scaled_features(tmp_path):
+    _train(tmp_path, "20260101_000000", "parallel", _preprocessor(make_arrays()[0]))
+    refitted = _preprocessor(make_arrays(seed=1)[0])
+    report = _train(tmp_path, "20260102_000000", "incremental", refitted, seed=1)
+    assert report["training_mode"] == "parallel"
+    assert report["previous_model_path"] is None
+    assert report["n_estimators"] == 10
+
+
+def test_incremental_mode_ignores_a_model_with_another_feature_layout(tmp_path):
+    preprocessor = _preprocessor(make_arrays()[0])
+    _train(tmp_path, "20260101_000000", "parallel", preprocessor)
+    registry = ArtifactRegistry(str(tmp_path))
+    registry.register_run("20260102_000000")
+    run_dir = registry.run_dir("20260102_000000")
+    train_arr, test_arr = make_arrays(n_features=7)
+    write_transformed_run(run_dir, train_arr, test_arr, preprocessor)
+    ModelTrainer(training_mode="incremental", run_dir=run_dir).initiate_model_training()
+    with open(os.path.join(run_dir, "model_trainer", "model_trainer_report.yaml")) as f:
+        assert yaml.safe_load(f)["training_mode"] == "parallel"
+
+
+def test_unknown_training_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ModelTrainer(training_mode="online")
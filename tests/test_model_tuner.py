@@ -0,0 +1,77 @@
+import math
+import os
+import time
+
+import numpy as np
+import pytest
+import yaml
+
+import components.model_tuner as model_tuner
+from components.model_tuner import ModelTuner
+from tests.conftest import make_arrays, write_transformed_run
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_tuner, "MODEL_TUNER_N_WORKERS", 2)
+    monkeypatch.setattr(model_tuner, "MODEL_TUNER_MIN_RESOURCE", 100)
+    run_dir = str(tmp_path / "20260101_000000")
+    write_transformed_run(run_dir, *make_arrays(n_rows=1000))
+    return run_dir
+
+
+def _best(run_dir) -> dict:
+    with open(os.path.join(run_dir, "model_tuner", "best_params.yaml")) as f:
+        return yaml.safe_load(f)
+
+
+def test_successive_halving_keeps_the_best_third_and_grows_the_sample(run_dir, monkeypatch):
+    tuner = ModelTuner(run_dir=run_dir)
+    monkeypatch.setattr(tuner.backend, "param_grid", {"n_estimators": [5], "max_depth": [1, 2, 3, 4, 5, 6, 7, 8, 9]})
+    monkeypatch.setattr(model_tuner, "MODEL_TUNER_N_CANDIDATES", 9)
+    tuner.initiate_model_tuning()
+    best = _best(run_dir)
+    assert [r["n_candidates"] for r in best["history"]] == [9, 3, 1]
+    assert [r["resource"] for r in best["history"]] == [100, 300, 800]
+    assert best["budget_exhausted"] is False
+    assert best["best_params"] == best["history"][-1]["results"][0]["params"]
+
+
+def test_a_failing_candidate_ranks_last_instead_of_aborting_the_search(run_dir, monkeypatch):
+    tuner = ModelTuner(run_dir=run_dir)
+    # A negative leaf size makes sklearn reject the fit
+    monkeypatch.setattr(tuner.backend, "param_grid", {"n_estimators": [5], "min_samples_leaf": [1, -5]})
+    tuner.initiate_model_tuning()
+    first_round = _best(run_dir)["history"][0]["results"]
+    assert first_round[-1]["params"]["min_samples_leaf"] == -5
+    assert first_round[-1]["score"] is None and first_round[-1]["error"]
+    assert _best(run_dir)["best_params"]["min_samples_leaf"] == 1
+
+
+def test_time_budget_does_not_wait_for_running_fits(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_tuner, "MODEL_TUNER_N_WORKERS", 2)
+    monkeypatch.setattr(model_tuner, "MODEL_TUNER_MIN_RESOURCE", 1000)
+    monkeypatch.setattr(model_tuner, "MODEL_TUNER_TIME_BUDGET_SECONDS", 3)
+    run_dir = str(tmp_path / "20260101_000000")
+    write_transformed_run(run_dir, *make_arrays(n_rows=60000, n_features=20))
+    tuner = ModelTuner(run_dir=run_dir)
+    # Two quick candidates finish in the first round; the deep forests of the second round cannot
+    monkeypatch.setattr(tuner.backend, "param_grid", {"n_estimators": [3, 2000], "max_depth": [2, None]})
+    monkeypatch.setattr(model_tuner, "MODEL_TUNER_N_CANDIDATES", 4)
+    start = time.monotonic()
+    try:
+        tuner.initiate_model_tuning()
+    except Exception as e:
+        # Nothing finished inside the budget on a slow machine: still bounded in time
+        assert "No candidate was scored" in str(e)
+    elapsed = time.monotonic() - start
+    assert elapsed < 3 + 5
+    if os.path.exists(os.path.join(run_dir, "model_tuner", "best_params.yaml")):
+        assert _best(run_dir)["budget_exhausted"] is True
+
+
+def test_every_candidate_failing_is_an_error(run_dir, monkeypatch):
+    tuner = ModelTuner(run_dir=run_dir)
+    monkeypatch.setattr(tuner.backend, "param_grid", {"min_samples_leaf": [-1, -2]})
+    with pytest.raises(Exception, match="No candidate was scored"):
+        tuner.initiate_model_tuning()
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline.model_versions as model_versions
+import pipeline.prediction_pipeline as prediction_pipeline
+from components.model_compaction import build_compact_forest
+from pipeline.model_versions import ModelVersionStore, UnknownModelVersion, bundle_nbytes
+from pipeline.prediction_pipeline import InferenceBundle, cached_inference_bundles, get_inference_bundle
+from tests.conftest import train_run
+
+RUNS = ["20260101_000000", "20260102_000000", "20260103_000000", "20260104_000000"]
+
+
+@pytest.fixture
+def base_dir(workdir, small_forests, monkeypatch):
+    monkeypatch.setattr(prediction_pipeline, "_bundles", {})
+    monkeypatch.setattr(prediction_pipeline, "_bundle_holders", {})
+    base_dir = workdir / "artifacts"
+    for seed, run_id in enumerate(RUNS):
+        train_run(base_dir, run_id, n_rows=300, seed=seed)
+    return str(base_dir)
+
+
+@pytest.fixture
+def rows(base_dir) -> pd.DataFrame:
+    test_df = pd.read_csv(f"{base_dir}/{RUNS[0]}/dataingestion/split/test/test.csv")
+    return test_df.drop(columns=["Response"]).head(3)
+
+
+def _store(base_dir: str, budget_bundles: float) -> ModelVersionStore:
+    """A store whose budget fits budget_bundles bundles of the size of the first run's."""
+    size = bundle_nbytes(InferenceBundle(f"{base_dir}/{RUNS[0]}"))
+    return ModelVersionStore(base_dir, memory_budget_mb=budget_bundles * size / 2**20)
+
+
+def test_least_recently_used_version_is_evicted_first(base_dir, rows):
+    store = _store(base_dir, 2.5)
+    store.predict(RUNS[0], rows)
+    store.predict(RUNS[1], rows)
+    store.predict(RUNS[0], rows)
+    store.predict(RUNS[2], rows)
+    assert list(store._versions) == [RUNS[0], RUNS[2]]
+    assert store.counters == {"hits": 1, "loads": 3, "evictions": 1}
+    assert f"{base_dir}/{RUNS[1]}" not in cached_inference_bundles()
+
+
+def test_pinned_versions_are_never_evicted(base_dir, rows):
+    store = ModelVersionStore(base_dir, memory_budget_mb=0)
+    store.pin(RUNS[0])
+    for run_id in (RUNS[0], RUNS[1], RUNS[3], RUNS[2]):
+        store.predict(run_id, rows)
+    # The latest trained run is pinned too; the run just loaded is serving its request
+    assert set(store._versions) == {RUNS[0], RUNS[3], RUNS[2]}
+    assert store.stats()["versions"][RUNS[0]]["pinned"]
+
+
+def test_explaining_counts_the_explainer_and_can_evict(base_dir, rows):
+    store = _store(base_dir, 1000)
+    store.predict(RUNS[0], rows)
+    store.predict(RUNS[1], rows)
+    before = store._versions[RUNS[1]].nbytes
+    store.memory_budget_bytes = store._versions[RUNS[0]].nbytes + before
+    store.predict_explain(RUNS[1], rows)
+    assert store._versions[RUNS[1]].explained
+    assert store._versions[RUNS[1]].nbytes > before
+    assert list(store._versions) == [RUNS[1]]
+
+
+def test_explainer_of_a_compact_model_counts_the_full_forest(base_dir):
+    bundle = InferenceBundle(f"{base_dir}/{RUNS[0]}")
+    full = bundle_nbytes(bundle)
+    bundle.model = build_compact_forest(bundle.model, np.arange(3), leaf_dtype="uint8")
+    compact = bundle_nbytes(bundle)
+    assert compact < full
+    assert bundle.explainer.forest is not bundle.model
+    assert bundle_nbytes(bundle) > full
+
+
+def test_bundles_held_by_shadow_scoring_count_against_the_budget(base_dir, rows):
+    store = _store(base_dir, 2.5)
+    shadowed = get_inference_bundle(f"{base_dir}/{RUNS[2]}", holder="shadow_scoring")
+    store.predict(RUNS[0], rows)
+    assert store._shared_nbytes == bundle_nbytes(shadowed)
+    store.predict(RUNS[1], rows)
+    assert list(store._versions) == [RUNS[1]]
+    stats = store.stats()
+    assert stats["shared_mb"] > 0 and stats["evictions"] == 1
+
+
+def test_evicting_a_version_shadow_scoring_holds_frees_nothing(base_dir, rows):
+    store = _store(base_dir, 2.5)
+    get_inference_bundle(f"{base_dir}/{RUNS[0]}", holder="shadow_scoring")
+    for run_id in RUNS[:3]:
+        store.predict(run_id, rows)
+    # Dropping the first version kept it cached for shadow scoring, so the second had to go too
+    assert list(store._versions) == [RUNS[2]]
+    assert f"{base_dir}/{RUNS[0]}" in cached_inference_bundles()
+    assert store.counters["evictions"] == 2
+
+
+def test_unknown_versions_are_rejected(base_dir, rows):
+    with pytest.raises(UnknownModelVersion):
+        ModelVersionStore(base_dir).predict("20250101_000000", rows)
+
+
+def test_bundle_objects_are_pickled_once_across_measurements(base_dir, monkeypatch):
+    bundle = InferenceBundle(f"{base_dir}/{RUNS[0]}")
+    dumped = []
+    original_dump = model_versions.pickle.dump
+    monkeypatch.setattr(model_versions.pickle, "dump", lambda obj, *args, **kwargs: dumped.append(obj) or original_dump(obj, *args, **kwargs))
+    first = bundle_nbytes(bundle)
+    assert bundle_nbytes(bundle) == first
+    assert len(dumped) == 2
+    bundle.explainer
+    assert bundle_nbytes(bundle) > first
+    assert len(dumped) == 2
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline.prediction_pipeline as prediction_pipeline
+from pipeline.prediction_pipeline import InferenceBundle
+from tests.conftest import train_run
+
+
+@pytest.fixture
+def bundle(workdir, small_forests):
+    return InferenceBundle(train_run(workdir / "artifacts", "20260101_000000"))
+
+
+def _requests(bundle: InferenceBundle, n: int) -> pd.DataFrame:
+    test_df = pd.read_csv(f"{bundle.run_dir}/dataingestion/split/test/test.csv")
+    return test_df.drop(columns=["Response"]).head(n)
+
+
+def test_pooled_scoring_matches_the_model(bundle):
+    rows = _requests(bundle, 50)
+    expected = bundle.model.predict(bundle.transform(rows).astype(np.float32))
+    assert bundle.predict(rows) == expected.tolist()
+
+
+def test_batches_larger_than_a_buffer_are_scored_in_chunks(bundle, monkeypatch):
+    monkeypatch.setattr(prediction_pipeline, "SERVING_BUFFER_ROWS", 7)
+    input_arr = bundle.transform(_requests(bundle, 50))
+    np.testing.assert_array_equal(bundle.predict_array(input_arr),
+                                  bundle.model.predict(input_arr.astype(np.float32)))
+
+
+def test_buffers_return_to_the_pool(bundle):
+    before = bundle._buffers.qsize()
+    bundle.predict(_requests(bundle, 5))
+    assert bundle._buffers.qsize() == before
+
+
+def test_warm_up_scores_every_batch_size(bundle):
+    timings = bundle.warm_up(batch_sizes=[1, 8], rounds=2)
+    assert sorted(timings) == [1, 8]
+    assert all(seconds >= 0 for seconds in timings.values())
+
+
+def test_explanations_of_a_served_forest_add_up_to_its_probability(bundle):
+    rows = _requests(bundle, 20)
+    predictions, explanations = bundle.predict_explain(rows, max_rows=5)
+    assert predictions == bundle.predict(rows)
+    assert len(explanations) == 5
+    proba = bundle.model.predict_proba(bundle.transform(rows).astype(np.float32))[:5, 1]
+    for explanation, expected in zip(explanations, proba):
+        assert explanation["probability"] == pytest.approx(expected, abs=1e-6)
+        assert explanation["forest_score"] == pytest.approx(expected, abs=1e-5)
+        assert explanation["bias"] + sum(explanation["contributions"].values()) == \
+            pytest.approx(explanation["forest_score"], abs=1e-4)
+
+
+def test_compact_model_predictions_come_with_their_own_probability(workdir, small_forests, monkeypatch):
+    import components.model_compaction as model_compaction
+    from components.model_compaction import ModelCompaction
+    monkeypatch.setattr(model_compaction, "MODEL_COMPACTION_TOLERANCE", 1.0)
+    run_dir = train_run(workdir / "artifacts", "20260101_000000")
+    ModelCompaction(run_dir=run_dir).initiate_model_compaction()
+    bundle = InferenceBundle(run_dir)
+    assert type(bundle.model).__name__ == "CompactForest"
+
+    rows = _requests(bundle, 20)
+    predictions, explanations = bundle.predict_explain(rows)
+    input_arr = bundle.transform(rows).astype(np.float32)
+    assert predictions == bundle.model.predict(input_arr).tolist()
+    compact_proba = bundle.model.predict_proba(input_arr)[:, 1]
+    forest_proba = bundle.explainer.forest.predict_proba(input_arr)[:, 1]
+    for i, explanation in enumerate(explanations):
+        assert explanation["probability"] == pytest.approx(compact_proba[i], abs=1e-6)
+        assert explanation["forest_score"] == pytest.approx(forest_proba[i], abs=1e-5)
@@ -0,0 +1,110 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline.prediction_sink import PredictionSink
+
+
+class FakeCollection:
+    """Collects inserted documents; raises while failing is set."""
+    def __init__(self):
+        self.documents = {}
+        self.failing = False
+
+    def insert_many(self, documents: list, ordered: bool = True) -> None:
+        if self.failing:
+            raise ConnectionError("mongod is down")
+        for document in documents:
+            self.documents[document["_id"]] = document
+
+
+@pytest.fixture
+def collection() -> FakeCollection:
+    return FakeCollection()
+
+
+@pytest.fixture
+def sink(tmp_path, collection):
+    # Flushed by hand: the background thread only wakes on stop()
+    sink = PredictionSink(collection=collection, max_buffer_rows=10, flush_rows=1000, flush_seconds=3600,
+                          retry_seconds=0, spill_dir=str(tmp_path / "spill"))
+    yield sink
+    sink.stop()
+
+
+def _frame(n_rows: int) -> pd.DataFrame:
+    return pd.DataFrame({"Age": range(n_rows), "Gender": ["Male"] * n_rows})
+
+
+def _spill_files(sink: PredictionSink) -> list:
+    return sorted(os.listdir(sink.spill_dir)) if os.path.isdir(sink.spill_dir) else []
+
+
+def test_flush_writes_one_document_per_row(sink, collection):
+    sink.record(_frame(3), [0, 1, 0], model_run_id="20260101_000000")
+    sink.flush()
+    documents = sorted(collection.documents.values(), key=lambda d: d["row"])
+    assert [d["prediction"] for d in documents] == [0, 1, 0]
+    assert documents[1]["input"] == {"Age": 1, "Gender": "Male"}
+    assert documents[1]["_id"].endswith(":1") and documents[1]["model_run_id"] == "20260101_000000"
+    assert sink.stats()["written_rows"] == 3 and sink.stats()["buffered_rows"] == 0
+
+
+def test_rows_are_spilled_while_mongo_fails_and_replayed_once_it_recovers(sink, collection):
+    collection.failing = True
+    sink.record(_frame(2), [1, 1], model_run_id="20260101_000000")
+    sink.flush()
+    stats = sink.stats()
+    assert stats["spilled_rows"] == 2 and stats["failed_flushes"] == 1 and stats["spill_files"] == 1
+    assert "mongod is down" in stats["last_error"]
+
+    collection.failing = False
+    sink.flush()
+    assert len(collection.documents) == 2
+    assert all(isinstance(d["scored_at"], datetime.datetime) for d in collection.documents.values())
+    assert sink.stats()["replayed_rows"] == 2
+    assert _spill_files(sink) == []
+
+
+def test_a_full_buffer_spills_the_request_instead_of_dropping_it(sink, collection):
+    sink.record(_frame(8), [0] * 8, model_run_id="20260101_000000")
+    sink.record(_frame(5), [1] * 5, model_run_id="20260101_000000")
+    assert sink.stats()["buffered_rows"] == 8 and sink.stats()["spilled_rows"] == 5
+    sink.flush()
+    assert len(collection.documents) == 13
+
+
+def test_corrupt_spilled_lines_are_quarantined_without_failing_mongo(sink, collection):
+    collection.failing = True
+    sink.record(_frame(2), [1, 0], model_run_id="20260101_000000")
+    sink.flush()
+    (spill_file,) = _spill_files(sink)
+    path = os.path.join(sink.spill_dir, spill_file)
+    with open(path, "ab") as f:
+        f.write(b'{"_id": "cut sho\n\xff\xfe\n{"_id": "x", "row": 0}')
+
+    collection.failing = False
+    failed_before = sink.stats()["failed_flushes"]
+    sink.flush()
+    stats = sink.stats()
+    assert len(collection.documents) == 2
+    assert stats["corrupt_rows"] == 3 and stats["replayed_rows"] == 2
+    assert stats["failed_flushes"] == failed_before and stats["mongo_available"]
+    assert _spill_files(sink) == [f"{spill_file}.corrupt"]
+    with open(f"{path}.corrupt", "rb") as f:
+        assert f.read() == b'{"_id": "cut sho\n\xff\xfe\n{"_id": "x", "row": 0}\n'
+
+
+def test_duplicate_rows_from_an_earlier_attempt_are_not_an_error(sink):
+    errors = pytest.importorskip("pymongo.errors")
+
+    class PartlyWritten(FakeCollection):
+        def insert_many(self, documents: list, ordered: bool = True) -> None:
+            raise errors.BulkWriteError({"writeErrors": [{"code": 11000, "index": 0}], "writeConcernErrors": []})
+
+    sink._collection = PartlyWritten()
+    sink.record(_frame(1), [0], model_run_id="20260101_000000")
+    sink.flush()
+    assert sink.stats()["written_rows"] == 1 and sink.stats()["failed_flushes"] == 0
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline.request_validator as request_validator
+from pipeline.request_validator import RequestValidator
+from tests.conftest import REPO_ROOT
+
+
+@pytest.fixture
+def validator() -> RequestValidator:
+    return RequestValidator(os.path.join(REPO_ROOT, "schema.yaml"))
+
+
+def _row(**overrides) -> dict:
+    row = {"Gender": "Male", "Age": 44, "Driving_License": 1, "Region_Code": 28.0, "Previously_Insured": 0,
+           "Vehicle_Age": "> 2 Years", "Vehicle_Damage": "Yes", "Annual_Premium": 40454.0,
+           "Policy_Sales_Channel": 26.0, "Vintage": 217}
+    row.update(overrides)
+    return row
+
+
+def test_valid_rows_get_the_schema_dtypes(validator):
+    valid_df, valid_rows, errors, error_count = validator.validate(pd.DataFrame([_row(), _row(Age="37")]))
+    assert valid_rows == [0, 1] and errors == [] and error_count == 0
+    assert valid_df["Age"].tolist() == [44, 37]
+    assert valid_df["Age"].dtype == np.int64 and valid_df["Annual_Premium"].dtype == np.float64
+
+
+@pytest.mark.parametrize("age", [True, False, 1e20, -1e20, 2 ** 63, 44.5, float("inf"), "forty", "True"])
+def test_non_integers_are_rejected(validator, age):
+    valid_df, valid_rows, errors, error_count = validator.validate(pd.DataFrame([_row(), _row(Age=age)]))
+    assert valid_rows == [0]
+    assert errors == [{"row": 1, "field": "Age", "error": "Age must be an integer"}]
+    assert error_count == 1
+    assert valid_df["Age"].tolist() == [44]
+
+
+def test_booleans_are_not_numbers(validator):
+    _, valid_rows, errors, _ = validator.validate(pd.DataFrame([_row(Annual_Premium=True)]))
+    assert valid_rows == []
+    assert errors[0]["field"] == "Annual_Premium"
+
+
+def test_missing_and_out_of_domain_values_are_reported_per_row(validator):
+    df = pd.DataFrame([_row(Gender="Other"), _row(Vintage=None), _row(Vehicle_Damage="")])
+    _, valid_rows, errors, _ = validator.validate(df)
+    assert valid_rows == []
+    assert [(e["row"], e["field"]) for e in errors] == [(0, "Gender"), (1, "Vintage"), (2, "Vehicle_Damage")]
+    assert errors[1]["error"] == "Vintage is required"
+
+
+def test_a_missing_column_rejects_every_row(validator):
+    row = _row()
+    del row["Age"]
+    _, valid_rows, errors, _ = validator.validate(pd.DataFrame([row, row]))
+    assert valid_rows == [] and len(errors) == 2
+
+
+def test_reported_errors_are_capped_but_counted(validator, monkeypatch):
+    monkeypatch.setattr(request_validator, "MAX_REPORTED_ERRORS", 3)
+    _, valid_rows, errors, error_count = validator.validate(pd.DataFrame([_row(Age=-0.5, Vintage="x")] * 4))
+    assert valid_rows == []
+    assert len(errors) == 3
+    assert error_count == 8
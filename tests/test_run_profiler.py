@@ -0,0 +1,71 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+import yaml
+
+from utils.run_profiler import RunProfiler, count_rows
+
+
+def _profile(run_dir) -> dict:
+    with open(os.path.join(run_dir, "run_profile.yaml")) as f:
+        return yaml.safe_load(f)
+
+
+def test_stage_entry_records_time_memory_io_and_rows(tmp_path):
+    os.makedirs(tmp_path / "data_transformation")
+    np.save(tmp_path / "data_transformation" / "train.npy", np.zeros((30, 4)))
+    profiler = RunProfiler(str(tmp_path), sample_seconds=0.01)
+    with profiler.profile("model_training"):
+        sum(i * i for i in range(200_000))
+    entry = _profile(tmp_path)["stages"]["model_training"]
+    assert entry["status"] == "completed"
+    assert entry["rows"] == 30
+    assert entry["wall_seconds"] > 0 and entry["cpu_seconds"] > 0
+    assert entry["peak_rss_mb"] > 0
+    assert entry["overlapped_with"] == []
+    assert "cpu_count" in _profile(tmp_path)["host"]
+
+
+def test_failed_stage_is_recorded_and_reraised(tmp_path):
+    profiler = RunProfiler(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        with profiler.profile("data_ingestion"):
+            raise RuntimeError("mongo down")
+    entry = _profile(tmp_path)["stages"]["data_ingestion"]
+    assert entry["status"] == "failed"
+    assert entry["rows"] is None
+
+
+def test_concurrent_stages_list_each_other(tmp_path):
+    profiler = RunProfiler(str(tmp_path))
+    both_running = threading.Barrier(2)
+
+    def stage(name):
+        with profiler.profile(name, rows=1):
+            both_running.wait()
+    threads = [threading.Thread(target=stage, args=(name,)) for name in ("data_validation", "data_transformation")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stages = _profile(tmp_path)["stages"]
+    assert stages["data_validation"]["overlapped_with"] == ["data_transformation"]
+    assert stages["data_transformation"]["overlapped_with"] == ["data_validation"]
+
+
+def test_deep_stage_dumps_cprofile_and_tracemalloc(tmp_path):
+    profiler = RunProfiler(str(tmp_path), deep_stage="model_evaluation")
+    with profiler.profile("model_evaluation"):
+        [bytes(1000) for _ in range(100)]
+    files = sorted(os.listdir(tmp_path / "_profile"))
+    assert files == ["model_evaluation.prof", "model_evaluation_cprofile.txt", "model_evaluation_tracemalloc.txt"]
+
+
+def test_count_rows_reads_csv_and_npy(tmp_path):
+    (tmp_path / "rows.csv").write_text("a,b\n1,2\n3,4\n")
+    np.save(tmp_path / "rows.npy", np.zeros((7, 2)))
+    assert count_rows(str(tmp_path / "rows.csv")) == 2
+    assert count_rows(str(tmp_path / "rows.npy")) == 7
+    assert count_rows(str(tmp_path / "missing.csv")) is None
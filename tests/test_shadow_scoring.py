@@ -0,0 +1,148 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import pipeline.prediction_pipeline as prediction_pipeline
+import pipeline.shadow_scoring as shadow_scoring
+from pipeline.model_versions import ModelVersionStore
+from pipeline.shadow_scoring import ShadowScorer
+from utils.artifact_registry import ArtifactRegistry
+
+
+class FakeBundle:
+    """Stands in for InferenceBundle: predicts the parity of its run day, no artifacts needed."""
+    n_features = 1
+    input_dtype = "float32"
+    loaded_explainer = None
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.run_id = os.path.basename(run_dir)
+        self.model, self.preprocessor = None, None
+
+    def predict(self, input_df: pd.DataFrame) -> list:
+        return [int(self.run_id[7]) % 2] * len(input_df)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(prediction_pipeline, "InferenceBundle", FakeBundle)
+    monkeypatch.setattr(prediction_pipeline, "_bundles", {})
+    monkeypatch.setattr(prediction_pipeline, "_bundle_holders", {})
+    # stop() waits for the worker's next wake-up, at most one refresh interval away
+    monkeypatch.setattr(shadow_scoring, "SHADOW_REFRESH_SECONDS", 0.2)
+    return ArtifactRegistry(str(tmp_path))
+
+
+def _trained_run(registry: ArtifactRegistry, run_id: str) -> None:
+    registry.register_run(run_id)
+    os.makedirs(os.path.join(registry.run_dir(run_id), "model_trainer"), exist_ok=True)
+    registry.set_stage_status(run_id, "model_training", "completed")
+
+
+@pytest.fixture
+def scorer_factory(registry):
+    scorers = []
+
+    def make() -> ShadowScorer:
+        scorers.append(ShadowScorer(registry.base_dir))
+        return scorers[-1]
+    yield make
+    for scorer in scorers:
+        scorer.stop()
+
+
+def _cached() -> set:
+    return {os.path.basename(run_dir) for run_dir in prediction_pipeline._bundles}
+
+
+def test_first_served_run_is_promoted_in_the_registry(registry, scorer_factory):
+    _trained_run(registry, "20260101_000000")
+    scorer = scorer_factory()
+    assert registry.promoted_run_id() == "20260101_000000"
+    _trained_run(registry, "20260102_000000")
+    scorer.refresh()
+    assert scorer.champion.run_id == "20260101_000000"
+    assert scorer.challenger.run_id == "20260102_000000"
+
+
+def test_a_new_replica_serves_the_recorded_champion_not_the_newest_run(registry, scorer_factory):
+    _trained_run(registry, "20260101_000000")
+    first = scorer_factory()
+    _trained_run(registry, "20260102_000000")
+    # A replica started (or restarted) after a newer run was trained
+    second = scorer_factory()
+    assert first.champion.run_id == second.champion.run_id == "20260101_000000"
+    assert second.challenger.run_id == "20260102_000000"
+
+
+def test_a_promotion_by_another_replica_wins_the_race(registry):
+    _trained_run(registry, "20260101_000000")
+    _trained_run(registry, "20260102_000000")
+    assert registry.promote_if("20260101_000000") == "20260101_000000"
+    assert registry.promote_if("20260102_000000") == "20260101_000000"
+    assert registry.promote_if("20260102_000000", expected="20260101_000000") == "20260102_000000"
+
+
+def test_read_only_registry_keeps_the_current_champion(registry, scorer_factory, monkeypatch):
+    _trained_run(registry, "20260101_000000")
+    scorer = scorer_factory()
+    monkeypatch.setattr(scorer.registry, "promoted_run_id", lambda: None)
+
+    def read_only(run_id, expected=None):
+        raise PermissionError("read-only file system")
+    monkeypatch.setattr(scorer.registry, "promote_if", read_only)
+    _trained_run(registry, "20260102_000000")
+    scorer.refresh()
+    assert scorer.champion.run_id == "20260101_000000"
+    assert scorer.challenger.run_id == "20260102_000000"
+
+
+def test_challenger_shadows_champion_batches(registry, scorer_factory):
+    _trained_run(registry, "20260101_000000")
+    _trained_run(registry, "20260102_000000")
+    registry.promote("20260101_000000")
+    scorer = scorer_factory()
+    assert scorer.predict(pd.DataFrame({"x": range(4)})) == [1, 1, 1, 1]
+    deadline = time.monotonic() + 5
+    while scorer.stats()["batches"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = scorer.stats()
+    assert stats["rows"] == 4 and stats["agreed_rows"] == 0
+
+
+def test_replaced_challenger_bundle_is_released(registry, scorer_factory):
+    _trained_run(registry, "20260101_000000")
+    _trained_run(registry, "20260102_000000")
+    registry.promote("20260101_000000")
+    scorer = scorer_factory()
+    _trained_run(registry, "20260103_000000")
+    scorer.refresh()
+    assert scorer.challenger.run_id == "20260103_000000"
+    assert _cached() == {"20260101_000000", "20260103_000000"}
+
+
+def test_promote_releases_the_old_champion(registry, scorer_factory):
+    _trained_run(registry, "20260101_000000")
+    _trained_run(registry, "20260102_000000")
+    registry.promote("20260101_000000")
+    scorer = scorer_factory()
+    assert scorer.promote() == "20260102_000000"
+    assert registry.promoted_run_id() == "20260102_000000"
+    assert _cached() == {"20260102_000000"}
+
+
+def test_bundle_held_by_the_version_store_survives_release(registry, scorer_factory):
+    _trained_run(registry, "20260101_000000")
+    _trained_run(registry, "20260102_000000")
+    registry.promote("20260101_000000")
+    scorer = scorer_factory()
+    versions = ModelVersionStore(registry.base_dir, memory_budget_mb=1024, pinned=[])
+    versions.predict("20260102_000000", pd.DataFrame({"x": [1]}))
+    _trained_run(registry, "20260103_000000")
+    scorer.refresh()
+    assert "20260102_000000" in _cached()
+    assert prediction_pipeline.get_inference_bundle(registry.run_dir("20260102_000000")) \
+        is versions._versions["20260102_000000"].bundle
@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+
+from benchmarks.startup import TRAINING_MODULES
+from logger import _LazyRotatingFileHandler, logging
+from tests.conftest import REPO_ROOT
+
+# The scoring modules app.py serves from
+_SERVING_MODULES = ("pipeline.prediction_pipeline", "pipeline.shadow_scoring", "pipeline.model_versions",
+                    "pipeline.feature_index", "pipeline.request_validator", "pipeline.admission_control")
+
+_PROBE = """
+import importlib, json, sys
+for module in %r:
+    importlib.import_module(module)
+print(json.dumps([m for m in %r if m in sys.modules]))
+"""
+
+
+def test_scoring_modules_do_not_import_training_modules():
+    completed = subprocess.run([sys.executable, "-c", _PROBE % (_SERVING_MODULES, TRAINING_MODULES)],
+                               cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
+
+
+def test_importing_the_app_does_not_import_training_modules():
+    completed = subprocess.run([sys.executable, "-c", _PROBE % (("app",), TRAINING_MODULES)],
+                               cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
+
+
+def test_log_file_is_created_on_the_first_record_only(tmp_path):
+    path = tmp_path / "logs" / "run.log"
+    handler = _LazyRotatingFileHandler(str(path), maxBytes=1024, backupCount=1)
+    assert not path.parent.exists()
+    handler.emit(logging.LogRecord("test", logging.INFO, __file__, 1, "first record", None, None))
+    handler.close()
+    assert "first record" in path.read_text()
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+import yaml
+
+from components.data_validation import DataValidation
+from utils.synthetic_data import SyntheticDataGenerator
+from tests.conftest import write_split
+
+
+def test_rows_follow_the_schema(workdir):
+    with open("schema.yaml") as f:
+        schema = yaml.safe_load(f)
+    df = SyntheticDataGenerator().generate(1000)
+    assert list(df.columns) == [name for column in schema["columns"] for name in column]
+    assert df["id"].tolist() == list(range(1, 1001))
+    assert set(df["Gender"]) <= {"Male", "Female"}
+    assert df[schema["target_column"]].isin([0, 1]).all()
+
+
+@pytest.mark.parametrize("ratio", [0.05, 0.3])
+def test_positive_share_matches_the_requested_ratio(workdir, ratio):
+    df = SyntheticDataGenerator(positive_ratio=ratio).generate(50_000)
+    assert df["Response"].mean() == pytest.approx(ratio, abs=0.01)
+
+
+def test_same_seed_same_rows(workdir):
+    first, again = SyntheticDataGenerator(seed=3).generate(200), SyntheticDataGenerator(seed=3).generate(200)
+    pd.testing.assert_frame_equal(first, again)
+    assert not SyntheticDataGenerator(seed=4).generate(200).equals(SyntheticDataGenerator(seed=3).generate(200))
+
+
+def test_chunked_csv_holds_every_row_once(workdir):
+    path = SyntheticDataGenerator().write_csv("out/rows.csv", n_rows=2500, chunk_rows=1000)
+    df = pd.read_csv(path)
+    assert len(df) == 2500
+    assert df["id"].is_unique and df["id"].min() == 1 and df["id"].max() == 2500
+
+
+def test_invalid_ratio_is_rejected(workdir):
+    with pytest.raises(Exception, match="positive_ratio"):
+        SyntheticDataGenerator(positive_ratio=1.0)
+
+
+def test_generated_split_passes_data_validation(workdir):
+    run_dir = str(workdir / "artifacts" / "20260101_000000")
+    write_split(run_dir)
+    ok, _, _ = DataValidation(run_dir=run_dir).run()
+    assert ok
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+import pipeline.training_pipeline as training_pipeline
+from pipeline.training_pipeline import TrainingPipeline
+from utils.artifact_registry import ArtifactRegistry
+
+
+@pytest.fixture(autouse=True)
+def default_dag(workdir, monkeypatch):
+    monkeypatch.setattr(training_pipeline, "MODEL_TUNER_ENABLED", False)
+    monkeypatch.setattr(training_pipeline, "MODEL_CV_ENABLED", True)
+    monkeypatch.setattr(training_pipeline, "MODEL_COMPACTION_ENABLED", True)
+    monkeypatch.setattr(training_pipeline, "ARTIFACT_RETENTION_ENABLED", False)
+
+
+def _fake_stages(pipeline: TrainingPipeline, calls: list, fail: set = frozenset()) -> None:
+    """Replaces every stage of the pipeline with one that records its call and fails if listed."""
+    lock = threading.Lock()
+    for stage in pipeline.stage_graph():
+        def fn(stage=stage):
+            with lock:
+                calls.append(stage)
+            if stage in fail:
+                raise RuntimeError(f"{stage} broke")
+        setattr(pipeline, f"start_{stage}", fn)
+
+
+def test_stages_run_after_their_inputs():
+    calls = []
+    pipeline = TrainingPipeline(run_id="20260101_000000")
+    _fake_stages(pipeline, calls)
+    pipeline.run()
+    graph = pipeline.stage_graph()
+    assert sorted(calls) == sorted(graph)
+    for stage, (_, deps) in graph.items():
+        assert all(calls.index(d) < calls.index(stage) for d in deps)
+        assert pipeline.read_marker(stage)["status"] == "completed"
+    assert ArtifactRegistry().manifest()["latest_completed"]["model_training"] == "20260101_000000"
+
+
+def test_disabled_stages_leave_the_graph(monkeypatch):
+    monkeypatch.setattr(training_pipeline, "MODEL_COMPACTION_ENABLED", False)
+    graph = TrainingPipeline(run_id="20260101_000000").stage_graph()
+    assert "model_tuning" not in graph and "model_compaction" not in graph
+    assert graph["model_training"][1] == ["data_validation", "data_transformation"]
+
+
+def test_a_failed_stage_stops_everything_downstream():
+    calls = []
+    pipeline = TrainingPipeline(run_id="20260101_000000")
+    _fake_stages(pipeline, calls, fail={"data_transformation"})
+    with pytest.raises(RuntimeError, match="data_transformation broke"):
+        pipeline.run()
+    assert "model_training" not in calls and "model_evaluation" not in calls
+    marker = pipeline.read_marker("data_transformation")
+    assert marker["status"] == "failed" and "broke" in marker["error"]
+    assert pipeline.read_marker("model_training") == {}
+
+
+def test_resume_reexecutes_only_failed_and_missing_stages():
+    calls = []
+    pipeline = TrainingPipeline(run_id="20260101_000000")
+    _fake_stages(pipeline, calls, fail={"model_training"})
+    with pytest.raises(RuntimeError):
+        pipeline.run()
+
+    calls = []
+    resumed = TrainingPipeline(run_id="20260101_000000", resume=True)
+    _fake_stages(resumed, calls)
+    resumed.run()
+    assert sorted(calls) == ["model_compaction", "model_evaluation", "model_training"]
+
+
+def test_resume_requires_an_existing_run():
+    with pytest.raises(ValueError):
+        TrainingPipeline(resume=True)
+    with pytest.raises(FileNotFoundError):
+        TrainingPipeline(run_id="20260101_000000", resume=True)
@@ -0,0 +1,336 @@
+import os
+import sys
+import shutil
+import argparse
+import datetime
+import threading
+from contextlib import contextmanager
+
+import yaml
+
+from logger import logging
+from exception import MyException
+from utils.blob_store import BlobStore
+from constants import (
+    ARTIFACTS_DIR, ARTIFACT_MANIFEST_FILE, ARTIFACT_BLOB_DIR, ARTIFACT_RETENTION_KEEP_LAST,
+    ARTIFACT_RETENTION_MAX_AGE_DAYS, ARTIFACT_RETENTION_STALE_RUNNING_HOURS, PIPELINE_STAGE_MARKER_DIR,
+    MODEL_VERSIONS_PINNED
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process writers are serialized
+    fcntl = None
+
+
+# Directory each pipeline stage writes into, used to index runs that predate the manifest
+STAGE_DIRS = {
+    "data_ingestion": "dataingestion",
+    "data_validation": "data_validation",
+    "data_transformation": "data_transformation",
+    "model_tuning": "model_tuner",
+    "model_training": "model_trainer",
+    "model_cross_validation": "model_cross_validation",
+    "model_evaluation": "model_evaluation",
+    "model_compaction": "model_compaction",
+}
+
+_write_lock = threading.RLock()
+# Parsed manifests keyed by path, reused while the file's mtime is unchanged
+_cache = {}
+
+
+def _dir_size(path: str) -> int:
+    """Bytes under path, counting hard-linked files (blob links) once."""
+    total = 0
+    seen = set()
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
+
+
+def _empty_manifest() -> dict:
+    return {"latest": None, "promoted": None, "pinned": [], "latest_completed": {}, "runs": {}}
+
+
+class ArtifactRegistry:
+    """
+    Index of the training runs under artifacts/, kept in artifacts/manifest.yaml.
+
+    The manifest records every run id with its stage statuses and size, the latest run, the
+    latest run that completed each stage, the promoted run and pinned runs, so finding a run
+    is a dictionary lookup instead of a directory listing. Every update rewrites the manifest
+    to a temp file and renames it over the old one; writers are serialized with a lock file.
+    garbage_collect() applies the retention policy and never removes promoted or pinned runs.
+    """
+    def __init__(self, base_dir: str = ARTIFACTS_DIR):
+        self.base_dir = base_dir
+        self.manifest_path = os.path.join(base_dir, ARTIFACT_MANIFEST_FILE)
+
+    def run_dir(self, run_id: str) -> str:
+        return os.path.join(self.base_dir, run_id)
+
+    # manifest I/O
+
+    def _read(self) -> dict:
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return self._rebuild() if os.path.isdir(self.base_dir) else _empty_manifest()
+        cached = _cache.get(self.manifest_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(self.manifest_path) as f:
+            manifest = yaml.safe_load(f) or _empty_manifest()
+        _cache[self.manifest_path] = (mtime, manifest)
+        return manifest
+
+    def _write(self, manifest: dict) -> None:
+        os.makedirs(self.base_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            yaml.safe_dump(manifest, f, sort_keys=False)
+        os.replace(tmp_path, self.manifest_path)
+        _cache[self.manifest_path] = (os.stat(self.manifest_path).st_mtime_ns, manifest)
+
+    @contextmanager
+    def _update(self):
+        """Yields a private copy of the manifest and writes it back when the block succeeds."""
+        with _write_lock:
+            os.makedirs(self.base_dir, exist_ok=True)
+            with open(f"{self.manifest_path}.lock", "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Another process may have written since our cached read
+                _cache.pop(self.manifest_path, None)
+                manifest = yaml.safe_load(yaml.safe_dump(self._read()))
+                yield manifest
+                self._write(manifest)
+
+    def _rebuild(self) -> dict:
+        """Indexes existing run directories; used once when artifacts/ has no manifest yet."""
+        manifest = _empty_manifest()
+        for run_id in sorted(os.listdir(self.base_dir)):
+            run_dir = self.run_dir(run_id)
+            if not os.path.isdir(run_dir) or run_id == ARTIFACT_BLOB_DIR or run_id.startswith(("_", ".")):
+                continue
+            stages = {}
+            for stage, stage_dir in STAGE_DIRS.items():
+                marker_path = os.path.join(run_dir, PIPELINE_STAGE_MARKER_DIR, f"{stage}.yaml")
+                if os.path.exists(marker_path):
+                    with open(marker_path) as f:
+                        stages[stage] = (yaml.safe_load(f) or {}).get("status", "completed")
+                elif os.path.isdir(os.path.join(run_dir, stage_dir)):
+                    stages[stage] = "completed"
+            manifest["runs"][run_id] = {
+                "created_at": datetime.datetime.fromtimestamp(os.stat(run_dir).st_mtime).isoformat(timespec="seconds"),
+                "stages": stages,
+                "size_bytes": _dir_size(run_dir),
+            }
+            manifest["latest"] = run_id
+            for stage, status in stages.items():
+                if status == "completed":
+                    manifest["latest_completed"][stage] = run_id
+        if manifest["runs"]:
+            logging.info(f"Indexed {len(manifest['runs'])} existing runs into {self.manifest_path}")
+            self._write(manifest)
+        return manifest
+
+    # updates
+
+    def register_run(self, run_id: str) -> None:
+        with self._update() as manifest:
+            manifest["runs"].setdefault(run_id, {
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "stages": {},
+                "size_bytes": 0,
+            })
+            if manifest["latest"] is None or run_id > manifest["latest"]:
+                manifest["latest"] = run_id
+
+    def set_stage_status(self, run_id: str, stage: str, status: str) -> None:
+        """Records running/completed/failed for a stage; completion also refreshes the run size."""
+        size = _dir_size(self.run_dir(run_id)) if status == "completed" else None
+        with self._update() as manifest:
+            run = manifest["runs"].setdefault(run_id, {
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "stages": {},
+                "size_bytes": 0,
+            })
+            run["stages"][stage] = status
+            if size is not None:
+                run["size_bytes"] = size
+            if manifest["latest"] is None or run_id > manifest["latest"]:
+                manifest["latest"] = run_id
+            latest_completed = manifest["latest_completed"]
+            if status == "completed" and (latest_completed.get(stage) is None or run_id >= latest_completed[stage]):
+                latest_completed[stage] = run_id
+            elif status != "completed" and latest_completed.get(stage) == run_id:
+                latest_completed[stage] = self._newest_completed(manifest, stage, exclude=run_id)
+
+    def promote(self, run_id: str) -> None:
+        with self._update() as manifest:
+            if run_id not in manifest["runs"]:
+                raise ValueError(f"Unknown run '{run_id}'.")
+            manifest["promoted"] = run_id
+        logging.info(f"Promoted run {run_id}")
+
+    def promote_if(self, run_id: str, expected=None) -> str:
+        """
+        Promotes run_id only while the promoted run is still expected (None: none promoted yet),
+        so replicas racing to set the first champion settle on one run. Returns the promoted run.
+        """
+        with self._update() as manifest:
+            if run_id not in manifest["runs"]:
+                raise ValueError(f"Unknown run '{run_id}'.")
+            if manifest["promoted"] == expected:
+                manifest["promoted"] = run_id
+                logging.info(f"Promoted run {run_id}")
+            promoted = manifest["promoted"]
+        return promoted
+
+    def pin(self, run_id: str) -> None:
+        with self._update() as manifest:
+            if run_id not in manifest["runs"]:
+                raise ValueError(f"Unknown run '{run_id}'.")
+            if run_id not in manifest["pinned"]:
+                manifest["pinned"].append(run_id)
+
+    def unpin(self, run_id: str) -> None:
+        with self._update() as manifest:
+            if run_id in manifest["pinned"]:
+                manifest["pinned"].remove(run_id)
+
+    # lookups
+
+    @staticmethod
+    def _newest_completed(manifest: dict, stage: str, exclude: str = None):
+        for run_id in sorted(manifest["runs"], reverse=True):
+            if run_id != exclude and manifest["runs"][run_id]["stages"].get(stage) == "completed":
+                return run_id
+        return None
+
+    def manifest(self) -> dict:
+        return self._read()
+
+    def latest_run_id(self, stage: str = None):
+        """Latest registered run, or the latest run that completed stage."""
+        manifest = self._read()
+        if stage is None:
+            return manifest["latest"]
+        return manifest["latest_completed"].get(stage)
+
+    def latest_run_dir(self, stage: str = None) -> str:
+        run_id = self.latest_run_id(stage)
+        if run_id is None:
+            what = f"with a completed {stage} stage" if stage else "registered"
+            raise FileNotFoundError(f"No run {what} in {self.manifest_path}.")
+        return self.run_dir(run_id)
+
+    def promoted_run_id(self):
+        return self._read()["promoted"]
+
+    def previous_run_ids(self, before: str, stage: str) -> list:
+        """Runs older than before that completed stage, newest first."""
+        runs = self._read()["runs"]
+        return [
+            run_id for run_id in sorted(runs, reverse=True)
+            if run_id < before and runs[run_id]["stages"].get(stage) == "completed"
+        ]
+
+    # retention
+
+    def _stage_started_at(self, run_id: str, run: dict, stage: str) -> datetime.datetime:
+        """When the stage was last marked: its marker file's mtime, else the run's creation time."""
+        marker_path = os.path.join(self.run_dir(run_id), PIPELINE_STAGE_MARKER_DIR, f"{stage}.yaml")
+        try:
+            return datetime.datetime.fromtimestamp(os.stat(marker_path).st_mtime)
+        except FileNotFoundError:
+            return datetime.datetime.fromisoformat(run["created_at"])
+
+    def garbage_collect(self, keep_last: int = ARTIFACT_RETENTION_KEEP_LAST,
+                        max_age_days: float = ARTIFACT_RETENTION_MAX_AGE_DAYS, dry_run: bool = False,
+                        pinned: list = MODEL_VERSIONS_PINNED) -> list:
+        """
+        Deletes runs outside the retention policy and returns their ids.
+
+        Kept: the keep_last newest runs, runs younger than max_age_days (when set), the promoted
+        run, runs pinned in the manifest or in pinned (the serving pins, MODEL_VERSIONS_PINNED),
+        the latest run of every completed stage, and runs with a stage still running. A stage
+        marked running for longer than the retention window belongs to a killed process: it is
+        recorded as failed and its run is judged by the other rules.
+        """
+        now = datetime.datetime.now()
+        stale_after = (datetime.timedelta(days=max_age_days) if max_age_days is not None
+                       else datetime.timedelta(hours=ARTIFACT_RETENTION_STALE_RUNNING_HOURS))
+        with self._update() as manifest:
+            runs = manifest["runs"]
+            stale = {
+                (run_id, stage) for run_id, info in runs.items() for stage, status in info["stages"].items()
+                if status == "running" and now - self._stage_started_at(run_id, info, stage) > stale_after
+            }
+            for run_id, stage in sorted(stale):
+                logging.warning(f"Run {run_id}: stage {stage} has been running since before the "
+                                f"retention window; treating it as failed")
+                if not dry_run:
+                    runs[run_id]["stages"][stage] = "failed"
+            keep = set(sorted(runs, reverse=True)[:keep_last])
+            keep.update(manifest["pinned"])
+            keep.update(r for r in (pinned or []) if r in runs)
+            keep.update(r for r in [manifest["promoted"], *manifest["latest_completed"].values()] if r)
+            keep.update(r for r, info in runs.items()
+                        if any(status == "running" and (r, stage) not in stale
+                               for stage, status in info["stages"].items()))
+            if max_age_days is not None:
+                cutoff = now - datetime.timedelta(days=max_age_days)
+                keep.update(r for r, info in runs.items()
+                            if datetime.datetime.fromisoformat(info["created_at"]) >= cutoff)
+            removed = sorted(r for r in runs if r not in keep)
+            freed = sum(runs[r].get("size_bytes", 0) for r in removed)
+            if not dry_run:
+                for run_id in removed:
+                    shutil.rmtree(self.run_dir(run_id), ignore_errors=True)
+                    del runs[run_id]
+                if manifest["latest"] not in runs:
+                    manifest["latest"] = max(runs) if runs else None
+        logging.info(f"Artifact GC {'would remove' if dry_run else 'removed'} {len(removed)} runs "
+                     f"({freed / 1e6:.1f} MB): {removed}")
+        if not dry_run:
+            # Deleting runs drops their links; blobs no run references any more can go
+            BlobStore(self.base_dir).garbage_collect()
+        return removed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect and maintain the artifact registry.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="print the manifest")
+    gc = sub.add_parser("gc", help="delete runs outside the retention policy")
+    gc.add_argument("--keep-last", type=int, default=ARTIFACT_RETENTION_KEEP_LAST)
+    gc.add_argument("--max-age-days", type=float, default=ARTIFACT_RETENTION_MAX_AGE_DAYS)
+    gc.add_argument("--dry-run", action="store_true")
+    for command in ("promote", "pin", "unpin"):
+        sub.add_parser(command).add_argument("run_id")
+    args = parser.parse_args()
+
+    try:
+        registry = ArtifactRegistry()
+        if args.command == "list":
+            print(yaml.safe_dump(registry.manifest(), sort_keys=False))
+        elif args.command == "gc":
+            print(registry.garbage_collect(args.keep_last, args.max_age_days, args.dry_run))
+        else:
+            getattr(registry, args.command)(args.run_id)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+if __name__ == "__main__":
+    main()
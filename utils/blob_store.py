@@ -0,0 +1,278 @@
+import io
+import os
+import sys
+import json
+import shutil
+import hashlib
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from logger import logging
+from exception import MyException
+from constants import ARTIFACTS_DIR, ARTIFACT_BLOB_DIR, ARTIFACT_BLOB_CHUNK_ROWS
+
+# A chunked output <path> is the directory <path>.chunks: a link per chunk blob and this manifest
+CHUNKS_SUFFIX = ".chunks"
+CHUNK_MANIFEST_FILE = "manifest.json"
+
+
+class _HashingWriter(io.RawIOBase):
+    """Binary stream that hashes everything written through it into the wrapped file."""
+    def __init__(self, f):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        return self._f.write(data)
+
+
+class _ChunkReader(io.RawIOBase):
+    """Reads a chunked CSV output as one stream: the header, then every chunk in order."""
+    def __init__(self, chunk_dir: str, manifest: dict):
+        self._paths = iter([os.path.join(chunk_dir, chunk["sha256"]) for chunk in manifest["chunks"]])
+        self._current = io.BytesIO(manifest["header"].encode())
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self._current is not None:
+            n = self._current.readinto(buffer)
+            if n:
+                return n
+            self._current.close()
+            path = next(self._paths, None)
+            self._current = open(path, "rb") if path else None
+        return 0
+
+    def close(self) -> None:
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+
+def chunk_manifest(path: str):
+    """The manifest of the chunked output at path, or None when it is a plain file (or missing)."""
+    manifest_path = os.path.join(path + CHUNKS_SUFFIX, CHUNK_MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def output_exists(path: str) -> bool:
+    return os.path.exists(path) or os.path.exists(os.path.join(path + CHUNKS_SUFFIX, CHUNK_MANIFEST_FILE))
+
+
+def open_output(path: str):
+    """Opens a run output for binary reading, whether it is stored as a plain file or in chunks."""
+    manifest = chunk_manifest(path)
+    if manifest is None:
+        return open(path, "rb")
+    return io.BufferedReader(_ChunkReader(path + CHUNKS_SUFFIX, manifest))
+
+
+def read_csv(path: str, **kwargs) -> pd.DataFrame:
+    """pd.read_csv for a CSV run output stored either way (see BlobStore.save_csv)."""
+    with open_output(path) as f:
+        return pd.read_csv(f, **kwargs)
+
+
+def read_csv_chunk(path: str, manifest: dict, chunk: dict, **kwargs) -> pd.DataFrame:
+    """One chunk of the chunked CSV output at path (an entry of manifest["chunks"]), with the output's header."""
+    with open(os.path.join(path + CHUNKS_SUFFIX, chunk["sha256"]), "rb") as f:
+        return pd.read_csv(io.BytesIO(manifest["header"].encode() + f.read()), **kwargs)
+
+
+class BlobStore:
+    """
+    Content-addressable store for run outputs under artifacts/blobs/<sha256[:2]>/<sha256>.
+
+    An output is serialized straight into a temp file in the store while it is hashed, so it is
+    never held in memory as a whole. When a blob with that hash already exists the temp file is
+    dropped; otherwise it is renamed into place. The run directory gets a hard link to the blob
+    (a copy where the filesystem cannot link). Blobs are read-only and links are swapped in
+    with a rename, so rewriting an output never modifies a blob that other runs share. Blobs no
+    run links to any more are removed by garbage_collect().
+
+    Data splits are stored in row chunks instead (save_csv): chunk boundaries fall after rows
+    whose hash hits a fixed residue, so they depend on the rows around them only, and data that
+    gained or changed a few rows (with ingestion's id-sorted, hash-split rows) only stores and
+    writes the chunks holding them. Arrays and models are stored whole: a refitted
+    preprocessor or model changes every byte of them anyway.
+    """
+    def __init__(self, base_dir: str = ARTIFACTS_DIR):
+        self.root = os.path.join(base_dir, ARTIFACT_BLOB_DIR)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _tmp_suffix(self) -> str:
+        return f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _link_blob(self, digest: str, dest: str, incoming: str = None) -> bool:
+        """
+        Hard-links the blob for digest at dest. When there is no such blob, incoming (a temp
+        file holding that content) becomes it, and True is returned; without incoming the
+        FileNotFoundError is raised.
+        """
+        blob = self.blob_path(digest)
+        try:
+            os.link(blob, dest)
+            return False
+        except FileNotFoundError:
+            if incoming is None:
+                raise
+            # New content: link the run to it before it appears in the store, so a
+            # concurrent garbage_collect() never sees it unreferenced
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.chmod(incoming, 0o444)
+            try:
+                os.link(incoming, dest)
+            except OSError:
+                shutil.copyfile(incoming, dest)
+            os.replace(incoming, blob)
+            return True
+        except OSError:
+            # Filesystem without hard links: the run gets its own copy
+            shutil.copyfile(blob, dest)
+            return False
+
+    def put(self, write, dest_path: str) -> str:
+        """
+        Stores what write(f) writes to the binary stream f and links it at dest_path.
+        Returns the sha256 digest.
+        """
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            incoming = os.path.join(self.root, "incoming" + self._tmp_suffix())
+            try:
+                with open(incoming, "wb") as f:
+                    writer = _HashingWriter(f)
+                    write(writer)
+                digest = writer.sha256.hexdigest()
+                os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+                dest_tmp = dest_path + self._tmp_suffix()
+                stored = self._link_blob(digest, dest_tmp, incoming)
+                logging.info(f"{'Stored' if stored else 'Reusing'} blob {digest[:12]} for {dest_path}")
+                os.replace(dest_tmp, dest_path)
+                return digest
+            finally:
+                if os.path.exists(incoming):
+                    os.remove(incoming)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _put_chunk(self, data: bytes, chunk_dir: str) -> tuple:
+        """Links the blob holding data into chunk_dir, writing it only when no blob has it. Returns (digest, stored)."""
+        digest = hashlib.sha256(data).hexdigest()
+        dest = os.path.join(chunk_dir, digest)
+        if os.path.exists(dest):
+            # The same rows twice in one output
+            return digest, False
+        try:
+            return digest, self._link_blob(digest, dest)
+        except FileNotFoundError:
+            pass
+        incoming = os.path.join(self.root, "incoming" + self._tmp_suffix())
+        try:
+            with open(incoming, "wb") as f:
+                f.write(data)
+            return digest, self._link_blob(digest, dest, incoming)
+        finally:
+            if os.path.exists(incoming):
+                os.remove(incoming)
+
+    @staticmethod
+    def chunk_bounds(df: pd.DataFrame, chunk_rows: int = None) -> list:
+        """
+        Content-defined row ranges: a chunk ends after a row whose hash is divisible by
+        chunk_rows (ARTIFACT_BLOB_CHUNK_ROWS by default), or at 4 * chunk_rows rows.
+        """
+        chunk_rows = chunk_rows or ARTIFACT_BLOB_CHUNK_ROWS
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        ends = (np.flatnonzero(row_hashes % np.uint64(chunk_rows) == 0) + 1).tolist()
+        bounds, start = [], 0
+        for end in ends + [len(df)]:
+            while end - start > 4 * chunk_rows:
+                bounds.append((start, start + 4 * chunk_rows))
+                start += 4 * chunk_rows
+            if end > start:
+                bounds.append((start, end))
+                start = end
+        return bounds
+
+    def save_csv(self, df: pd.DataFrame, dest_path: str, chunk_rows: int = None) -> dict:
+        """
+        Stores df as CSV in row chunks under dest_path + ".chunks" (read it back with read_csv
+        or open_output). Each chunk is serialized in memory and written to the store only when
+        no blob holds it yet. Returns the chunk manifest.
+        """
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            chunk_dir = dest_path + CHUNKS_SUFFIX
+            tmp_dir = chunk_dir + self._tmp_suffix()
+            os.makedirs(tmp_dir)
+            try:
+                chunks, new_chunks, new_bytes = [], 0, 0
+                for start, end in self.chunk_bounds(df, chunk_rows):
+                    data = df.iloc[start:end].to_csv(index=False, header=False).encode()
+                    digest, stored = self._put_chunk(data, tmp_dir)
+                    chunks.append({"sha256": digest, "rows": end - start})
+                    new_chunks += stored
+                    new_bytes += len(data) if stored else 0
+                manifest = {"format": "csv", "header": df.iloc[:0].to_csv(index=False),
+                            "rows": int(len(df)), "chunks": chunks}
+                with open(os.path.join(tmp_dir, CHUNK_MANIFEST_FILE), "w") as f:
+                    json.dump(manifest, f)
+                # Swap the new chunk directory in; a plain file from before chunking goes
+                old_dir = None
+                if os.path.isdir(chunk_dir):
+                    old_dir = chunk_dir + ".old" + self._tmp_suffix()
+                    os.rename(chunk_dir, old_dir)
+                os.rename(tmp_dir, chunk_dir)
+                if old_dir is not None:
+                    shutil.rmtree(old_dir)
+                if os.path.exists(dest_path):
+                    os.remove(dest_path)
+            finally:
+                if os.path.isdir(tmp_dir):
+                    shutil.rmtree(tmp_dir)
+            logging.info(f"Stored {new_chunks} new of {len(chunks)} chunks ({new_bytes / 1e6:.1f} MB) for {dest_path}")
+            return manifest
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def put_bytes(self, data, dest_path: str) -> str:
+        """Stores data (bytes or a buffer) and links it at dest_path. Returns the sha256 digest."""
+        return self.put(lambda f: f.write(data), dest_path)
+
+    def save_numpy(self, array: np.ndarray, dest_path: str) -> str:
+        return self.put(lambda f: np.save(f, array), dest_path)
+
+    def save_object(self, obj, dest_path: str) -> str:
+        return self.put(lambda f: joblib.dump(obj, f), dest_path)
+
+    def garbage_collect(self) -> tuple:
+        """Removes blobs that no run links to any more. Returns (count, bytes)."""
+        removed, freed = 0, 0
+        if not os.path.isdir(self.root):
+            return removed, freed
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(root, name)
+                st = os.lstat(path)
+                if st.st_nlink == 1 and not name.endswith(".tmp"):
+                    os.remove(path)
+                    removed += 1
+                    freed += st.st_size
+        logging.info(f"Blob GC removed {removed} unreferenced blobs ({freed / 1e6:.1f} MB)")
+        return removed, freed
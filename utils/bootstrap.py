@@ -0,0 +1,153 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+# Kept free of the logger and sklearn so spawned workers start quickly.
+
+METRICS = ("accuracy", "precision", "recall_positive", "f1_positive", "roc_auc", "pr_auc")
+
+# Per-process state, set once by _init_worker
+_state = {}
+
+# Peak bytes a block holds per resampled row: the int64 draws and counts plus about ten float64
+# (n_replicates, n_rows) arrays in bootstrap_metrics (weights, weighted labels, cumulative sums)
+_BYTES_PER_CELL = 96
+
+
+def _init_worker(y_sorted: np.ndarray, pred_sorted: np.ndarray, cut: np.ndarray) -> None:
+    _state.update(y=y_sorted, pred=pred_sorted, cut=cut)
+
+
+def _safe_divide(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    return np.divide(num, den, out=np.zeros_like(num, dtype=np.float64), where=den > 0)
+
+
+def bootstrap_metrics(weights: np.ndarray, y_sorted: np.ndarray, pred_sorted: np.ndarray, cut: np.ndarray) -> dict:
+    """
+    Metrics for a block of bootstrap replicates at once.
+
+    weights has shape (n_replicates, n_rows): how often each row was drawn. Rows are sorted by
+    descending score and cut marks the last row of each run of tied scores, so the ROC and PR
+    curves of every replicate are column slices of weighted cumulative sums.
+    """
+    n = weights.sum(axis=1)
+    w_pos = weights * y_sorted
+    w_neg = weights - w_pos
+
+    support_pos = w_pos.sum(axis=1)
+    support_neg = n - support_pos
+    tp = (w_pos * pred_sorted).sum(axis=1)
+    predicted_pos = (weights * pred_sorted).sum(axis=1)
+    tn = (w_neg * (1 - pred_sorted)).sum(axis=1)
+    predicted_neg = n - predicted_pos
+
+    precision = (support_pos * _safe_divide(tp, predicted_pos) + support_neg * _safe_divide(tn, predicted_neg)) / n
+
+    tps = np.cumsum(w_pos, axis=1)[:, cut]
+    fps = np.cumsum(w_neg, axis=1)[:, cut]
+    tpr = np.c_[np.zeros(len(n)), _safe_divide(tps, support_pos[:, None])]
+    fpr = np.c_[np.zeros(len(n)), _safe_divide(fps, support_neg[:, None])]
+    roc_auc = np.sum(np.diff(fpr, axis=1) * (tpr[:, 1:] + tpr[:, :-1]) / 2, axis=1)
+    curve_precision = _safe_divide(tps, tps + fps)
+    pr_auc = np.sum(np.diff(tpr, axis=1) * curve_precision, axis=1)
+
+    return {
+        "accuracy": (tp + tn) / n,
+        "precision": precision,
+        "recall_positive": _safe_divide(tp, support_pos),
+        "f1_positive": _safe_divide(2 * tp, predicted_pos + support_pos),
+        "roc_auc": roc_auc,
+        "pr_auc": pr_auc,
+    }
+
+
+def _bootstrap_task(seed: int, n_replicates: int) -> dict:
+    y, pred, cut = _state["y"], _state["pred"], _state["cut"]
+    n_rows = len(y)
+    rng = np.random.default_rng(seed)
+    # Draw all resampling indices for the block at once and turn them into per-row counts
+    idx = rng.integers(0, n_rows, size=(n_replicates, n_rows))
+    idx += np.arange(n_replicates)[:, None] * n_rows
+    weights = np.bincount(idx.ravel(), minlength=n_replicates * n_rows).reshape(n_replicates, n_rows)
+    return bootstrap_metrics(weights.astype(np.float64), y, pred, cut)
+
+
+def bootstrap_confidence_intervals(y_true: np.ndarray, score: np.ndarray, y_pred: np.ndarray,
+                                   n_replicates: int, time_budget: float, confidence: float = 0.95,
+                                   n_workers: int = None, max_cells_per_task: int = 5_000_000,
+                                   memory_limit_mb: float = 1024, seed: int = 0) -> dict:
+    """
+    Percentile bootstrap intervals for the binary evaluation metrics.
+
+    y_true and y_pred are 0/1 arrays and score is the positive-class probability from a single
+    prediction pass. Replicates are spread over a process pool in blocks of at most
+    max_cells_per_task resampled rows. Blocks and workers are sized so that all blocks running
+    at once stay within memory_limit_mb: the block shrinks first, down to one replicate, then
+    fewer workers run. When time_budget seconds have passed, queued blocks are cancelled and
+    running ones terminated; the intervals use the replicates that finished.
+    """
+    order = np.argsort(-score, kind="mergesort")
+    score_sorted = score[order]
+    y_sorted = y_true[order].astype(np.float64)
+    pred_sorted = y_pred[order].astype(np.float64)
+    cut = np.r_[np.flatnonzero(np.diff(score_sorted)), len(score_sorted) - 1]
+
+    n_rows = max(len(y_true), 1)
+    n_workers = n_workers or os.cpu_count()
+    memory_cells = int(memory_limit_mb * 2**20) // _BYTES_PER_CELL
+    # One replicate per block is the least a worker can hold: beyond that, run fewer workers
+    n_workers = int(max(1, min(n_workers, memory_cells // n_rows)))
+    per_task = int(max(1, min(n_replicates, max_cells_per_task // n_rows, memory_cells // (n_workers * n_rows))))
+    blocks = [min(per_task, n_replicates - start) for start in range(0, n_replicates, per_task)]
+    seeds = np.random.SeedSequence(seed).generate_state(len(blocks))
+
+    start = time.perf_counter()
+    deadline = time.monotonic() + time_budget
+    results = []
+    budget_exhausted = False
+    # spawn: evaluation may run beside other pipeline stages in threads, where fork is unsafe
+    executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(y_sorted, pred_sorted, cut))
+    try:
+        pending = {executor.submit(_bootstrap_task, int(s), b) for s, b in zip(seeds, blocks)}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                budget_exhausted = True
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            results.extend(f.result() for f in done)
+    finally:
+        if budget_exhausted:
+            # Blocks still running past the budget are stopped: they would otherwise keep their
+            # cores beside later stages, and the interpreter would wait for them at exit.
+            # concurrent.futures has no public way to reach them.
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    completed = sum(len(r["accuracy"]) for r in results)
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for metric in METRICS:
+        if not results:
+            break
+        values = np.concatenate([r[metric] for r in results])
+        intervals[metric] = {
+            "lower": round(float(np.quantile(values, alpha)), 6),
+            "upper": round(float(np.quantile(values, 1 - alpha)), 6),
+            "std": round(float(values.std(ddof=1)) if len(values) > 1 else 0.0, 6),
+        }
+    return {
+        "confidence": confidence,
+        "replicates_requested": int(n_replicates),
+        "replicates_completed": int(completed),
+        "budget_exhausted": budget_exhausted,
+        "workers": n_workers,
+        "replicates_per_task": per_task,
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+        "intervals": intervals,
+    }
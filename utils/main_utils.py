@@ -2,7 +2,6 @@ import os
 import sys
 
 import numpy as np
-import dill
 import yaml
 
 from exception import MyException
@@ -37,6 +36,7 @@ def load_object(file_path: str) -> object:
     return: Model/Obj
     """
     try:
+        import dill  # only needed for dill-pickled objects; kept off the import path
         with open(file_path, "rb") as file_obj:
             obj = dill.load(file_obj)
         return obj
@@ -75,6 +75,7 @@ def save_object(file_path: str, obj: object) -> None:
     logging.info("Entered the save_object method of utils")
 
     try:
+        import dill
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, "wb") as file_obj:
             dill.dump(obj, file_obj)
@@ -85,3 +86,18 @@ def save_object(file_path: str, obj: object) -> None:
         raise MyException(e, sys) from e
 
 
+def latency_summary(latencies) -> dict:
+    """
+    Count, mean, p50 and p95 in milliseconds of a window of latencies in seconds
+    latencies: iterable of float seconds, e.g. a bounded deque
+    return: dict with count 0 alone when the window is empty
+    """
+    if not latencies:
+        return {"count": 0}
+    values = np.fromiter(latencies, dtype=np.float64) * 1e3
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+    }
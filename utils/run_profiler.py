@@ -0,0 +1,232 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import platform
+import datetime
+import resource
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import yaml
+
+from logger import logging
+from exception import MyException
+from utils.artifact_registry import STAGE_DIRS
+from utils.blob_store import chunk_manifest, open_output, output_exists
+from constants import (
+    PIPELINE_PROFILE_FILE, PIPELINE_PROFILE_SAMPLE_SECONDS, PIPELINE_PROFILE_DEEP_DIR
+)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+# Data each stage reads or produces, relative to the run directory; its rows are the stage's row count
+STAGE_ROW_SOURCES = {
+    "data_ingestion": [os.path.join(STAGE_DIRS["data_ingestion"], "raw", "raw_data.csv")],
+    "data_validation": [
+        os.path.join(STAGE_DIRS["data_ingestion"], "split", "train", "train.csv"),
+        os.path.join(STAGE_DIRS["data_ingestion"], "split", "test", "test.csv"),
+    ],
+    "data_transformation": [
+        os.path.join(STAGE_DIRS["data_transformation"], "train.npy"),
+        os.path.join(STAGE_DIRS["data_transformation"], "test.npy"),
+    ],
+    "model_tuning": [os.path.join(STAGE_DIRS["data_transformation"], "train.npy")],
+    "model_training": [os.path.join(STAGE_DIRS["data_transformation"], "train.npy")],
+    "model_cross_validation": [os.path.join(STAGE_DIRS["data_transformation"], "train.npy")],
+    "model_evaluation": [os.path.join(STAGE_DIRS["data_transformation"], "test.npy")],
+    "model_compaction": [os.path.join(STAGE_DIRS["data_transformation"], "test.npy")],
+}
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+def _io_counters() -> dict:
+    """rchar/wchar count every read/write call, read_bytes/write_bytes only what reached storage."""
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(":") for line in f)}
+    except OSError:
+        return {}
+
+
+def _cpu_seconds() -> tuple:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime, children.ru_maxrss
+
+
+def count_rows(path: str):
+    """Rows of a .npy array (read from its header) or a .csv output (its chunk manifest, or lines minus the header)."""
+    if not output_exists(path):
+        return None
+    if path.endswith(".npy"):
+        return int(np.load(path, mmap_mode="r").shape[0])
+    manifest = chunk_manifest(path)
+    if manifest is not None:
+        return manifest["rows"]
+    lines = 0
+    with open_output(path) as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            lines += chunk.count(b"\n")
+    return max(lines - 1, 0)
+
+
+def _mb(value):
+    return None if value is None else round(value / 2**20, 1)
+
+
+class RunProfiler:
+    """
+    Records what each training stage costs into artifacts/<run_id>/run_profile.yaml.
+
+    Per stage: wall time, CPU time of this process and of the worker processes it waited for
+    (process pools), peak resident memory (sampled), bytes read/written and the row count of
+    the stage's data. CPU, memory and I/O counters are process-wide, so for stages that ran
+    at the same time (listed under overlapped_with) they include each other's work.
+
+    deep_stage additionally runs that stage under cProfile and tracemalloc and writes the
+    dumps to artifacts/<run_id>/_profile.
+    """
+    def __init__(self, run_dir: str, deep_stage: str = None, sample_seconds: float = PIPELINE_PROFILE_SAMPLE_SECONDS):
+        self.run_dir = run_dir
+        self.deep_stage = deep_stage
+        self.sample_seconds = sample_seconds
+        self.profile_path = os.path.join(run_dir, PIPELINE_PROFILE_FILE)
+        self._lock = threading.Lock()
+        self._active = {}
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.profile_path):
+            return {}
+        with open(self.profile_path) as f:
+            return yaml.safe_load(f) or {}
+
+    def _record(self, stage: str, entry: dict) -> None:
+        with self._lock:
+            profile = self._read()
+            profile.setdefault("host", {
+                "hostname": platform.node(),
+                "cpu_count": os.cpu_count(),
+                "python": platform.python_version(),
+            })
+            profile.setdefault("stages", {})[stage] = entry
+            os.makedirs(self.run_dir, exist_ok=True)
+            tmp_path = f"{self.profile_path}.tmp"
+            with open(tmp_path, "w") as f:
+                yaml.safe_dump(profile, f, sort_keys=False)
+            os.replace(tmp_path, self.profile_path)
+
+    def _sample_rss(self, state: dict, stop: threading.Event) -> None:
+        while not stop.wait(self.sample_seconds):
+            rss = _rss_bytes()
+            if rss is not None and rss > state["peak_rss"]:
+                state["peak_rss"] = rss
+
+    @contextmanager
+    def _deep(self, stage: str):
+        out_dir = os.path.join(self.run_dir, PIPELINE_PROFILE_DEEP_DIR)
+        os.makedirs(out_dir, exist_ok=True)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            profiler.dump_stats(os.path.join(out_dir, f"{stage}.prof"))
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(40)
+            with open(os.path.join(out_dir, f"{stage}_cprofile.txt"), "w") as f:
+                f.write(summary.getvalue())
+            with open(os.path.join(out_dir, f"{stage}_tracemalloc.txt"), "w") as f:
+                f.write(f"traced peak: {traced_peak} bytes\n\n")
+                for stat in snapshot.statistics("lineno")[:40]:
+                    f.write(f"{stat}\n")
+            logging.info(f"Deep profile of stage {stage} written to {out_dir}")
+
+    @contextmanager
+    def profile(self, stage: str, rows: int = None):
+        """
+        Measures the enclosed stage and records it, also when the stage raises. rows overrides
+        the count taken from STAGE_ROW_SOURCES (steps outside the pipeline, e.g. batch scoring).
+        """
+        with self._lock:
+            self._active[stage] = overlapped = set(self._active)
+            for other in self._active.values():
+                other.add(stage)
+            overlapped.discard(stage)
+        state = {"peak_rss": _rss_bytes() or 0}
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample_rss, args=(state, stop), daemon=True)
+        sampler.start()
+        io_before = _io_counters()
+        cpu_before, children_before, _ = _cpu_seconds()
+        thread_cpu_before = time.thread_time()
+        started_at = datetime.datetime.now().isoformat(timespec="seconds")
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            if stage == self.deep_stage:
+                with self._deep(stage):
+                    yield
+            else:
+                yield
+            status = "completed"
+        finally:
+            wall = time.perf_counter() - start
+            cpu_after, children_after, children_maxrss = _cpu_seconds()
+            thread_cpu = time.thread_time() - thread_cpu_before
+            io_after = _io_counters()
+            stop.set()
+            sampler.join()
+            with self._lock:
+                overlapped = sorted(self._active.pop(stage))
+            try:
+                counts = [rows] if rows is not None else [
+                    count_rows(os.path.join(self.run_dir, p)) for p in STAGE_ROW_SOURCES.get(stage, [])
+                ]
+                io_delta = {key: io_after[key] - io_before.get(key, 0) for key in io_after}
+                cpu = (cpu_after - cpu_before) + (children_after - children_before)
+                entry = {
+                    "status": status,
+                    "started_at": started_at,
+                    "wall_seconds": round(wall, 3),
+                    "cpu_seconds": round(cpu, 3),
+                    "cpu_seconds_workers": round(children_after - children_before, 3),
+                    "cpu_seconds_stage_thread": round(thread_cpu, 3),
+                    "cpu_utilization": round(cpu / wall, 2) if wall > 0 else None,
+                    "peak_rss_mb": _mb(max(state["peak_rss"], _rss_bytes() or 0)),
+                    # Largest worker process reaped so far in this run, not only in this stage
+                    "worker_max_rss_mb": _mb(children_maxrss * _MAXRSS_UNIT) if children_maxrss else None,
+                    "bytes_read": io_delta.get("rchar"),
+                    "bytes_written": io_delta.get("wchar"),
+                    "storage_bytes_read": io_delta.get("read_bytes"),
+                    "storage_bytes_written": io_delta.get("write_bytes"),
+                    "rows": None if None in counts or not counts else sum(counts),
+                    "overlapped_with": overlapped,
+                }
+                self._record(stage, entry)
+                logging.info(f"Stage {stage} profile: {entry['wall_seconds']}s wall, {entry['cpu_seconds']}s CPU, "
+                             f"peak RSS {entry['peak_rss_mb']} MB, rows {entry['rows']}")
+            except Exception as e:
+                # Profiling must never fail the stage it measures
+                logging.warning(f"Could not record the profile of stage {stage}: {MyException(e, sys)}")
@@ -0,0 +1,171 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from logger import logging
+from exception import MyException
+from utils.main_utils import read_yaml_file
+
+# Marginals follow the public vehicle insurance cross-sell data this project is built on
+GENDERS = (["Male", "Female"], [0.54, 0.46])
+VEHICLE_AGES = (["1-2 Year", "< 1 Year", "> 2 Years"], [0.525, 0.433, 0.042])
+# Region 28 alone holds over a quarter of the customers
+REGION_CODES = np.arange(53)
+SALES_CHANNELS = (np.array([152, 26, 124, 160, 156, 122, 157, 154, 151, 163]),
+                  [0.354, 0.209, 0.194, 0.057, 0.028, 0.026, 0.017, 0.016, 0.010, 0.008])
+# Share of rows with the flat minimum premium
+MIN_PREMIUM, MIN_PREMIUM_SHARE = 2630.0, 0.17
+DEFAULT_POSITIVE_RATIO = 0.123
+
+_PANDAS_DTYPES = {"int": "int64", "float": "float64", "category": "object"}
+
+
+class SyntheticDataGenerator:
+    """
+    Generates vehicle insurance rows that conform to schema.yaml (columns, order and types).
+
+    Features are drawn from marginals close to the real data, with its main dependencies:
+    vehicle damage is rare for previously insured customers, younger customers own newer
+    vehicles. Response comes from a logistic model over those features whose intercept is
+    calibrated so the positive share matches positive_ratio.
+
+    Rows are produced in chunks, so files and collections of tens of millions of rows can be
+    written without holding them in memory. The same seed always yields the same rows.
+    """
+    def __init__(self, schema_path: str = "schema.yaml", positive_ratio: float = DEFAULT_POSITIVE_RATIO, seed: int = 0):
+        try:
+            if not 0 < positive_ratio < 1:
+                raise ValueError(f"positive_ratio must be between 0 and 1, got {positive_ratio}")
+            schema = read_yaml_file(schema_path)
+            self.columns = [(name, dtype) for column in schema["columns"] for name, dtype in column.items()]
+            self.target_column = schema["target_column"]
+            self.positive_ratio = positive_ratio
+            self.seed = seed
+            self._intercept = self._calibrate_intercept()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _features(self, rng: np.random.Generator, n: int, start_id: int) -> pd.DataFrame:
+        age = np.where(rng.random(n) < 0.55, rng.integers(20, 30, n), rng.integers(30, 86, n))
+        previously_insured = (rng.random(n) < np.where(age < 30, 0.6, 0.35)).astype(np.int64)
+        damage = rng.random(n) < np.where(previously_insured == 1, 0.01, 0.92)
+        vehicle_age = np.where(
+            age < 30,
+            rng.choice(VEHICLE_AGES[0], n, p=[0.15, 0.84, 0.01]),
+            rng.choice(VEHICLE_AGES[0], n, p=[0.82, 0.11, 0.07]),
+        )
+        region_weights = np.full(len(REGION_CODES), 0.72 / (len(REGION_CODES) - 1))
+        region_weights[28] = 0.28
+        channel = np.where(
+            rng.random(n) < sum(SALES_CHANNELS[1]),
+            rng.choice(SALES_CHANNELS[0], n, p=np.array(SALES_CHANNELS[1]) / sum(SALES_CHANNELS[1])),
+            rng.integers(1, 164, n),
+        )
+        premium = np.where(
+            rng.random(n) < MIN_PREMIUM_SHARE,
+            MIN_PREMIUM,
+            np.clip(rng.lognormal(np.log(31000), 0.35, n), MIN_PREMIUM, 540000).round(1),
+        )
+        return pd.DataFrame({
+            "id": np.arange(start_id, start_id + n, dtype=np.int64),
+            "Gender": rng.choice(GENDERS[0], n, p=GENDERS[1]),
+            "Age": age.astype(np.int64),
+            "Driving_License": (rng.random(n) < 0.998).astype(np.int64),
+            "Region_Code": rng.choice(REGION_CODES, n, p=region_weights).astype(np.float64),
+            "Previously_Insured": previously_insured,
+            "Vehicle_Age": vehicle_age,
+            "Vehicle_Damage": np.where(damage, "Yes", "No"),
+            "Annual_Premium": premium,
+            "Policy_Sales_Channel": channel.astype(np.float64),
+            "Vintage": rng.integers(10, 300, n).astype(np.int64),
+        })
+
+    @staticmethod
+    def _logit(df: pd.DataFrame) -> np.ndarray:
+        return (
+            2.6 * (df["Vehicle_Damage"] == "Yes").to_numpy()
+            - 3.0 * df["Previously_Insured"].to_numpy()
+            + 0.9 * np.exp(-((df["Age"].to_numpy() - 45) / 15.0) ** 2)
+            + 0.5 * (df["Vehicle_Age"] == "> 2 Years").to_numpy()
+            - 0.6 * np.isin(df["Policy_Sales_Channel"].to_numpy(), [152, 160]).astype(float)
+            + 0.3 * (df["Region_Code"] == 28).to_numpy()
+            + 1e-6 * (df["Annual_Premium"].to_numpy() - 31000)
+        )
+
+    def _calibrate_intercept(self) -> float:
+        """Bisects the intercept so the mean response probability equals positive_ratio."""
+        logit = self._logit(self._features(np.random.default_rng([self.seed, 1]), 200_000, 1))
+        low, high = -20.0, 20.0
+        for _ in range(60):
+            mid = (low + high) / 2
+            if np.mean(1 / (1 + np.exp(-(logit + mid)))) < self.positive_ratio:
+                low = mid
+            else:
+                high = mid
+        return (low + high) / 2
+
+    def generate(self, n_rows: int, start_id: int = 1, chunk_index: int = 0) -> pd.DataFrame:
+        """Returns n_rows rows with ids from start_id, in schema.yaml column order and types."""
+        rng = np.random.default_rng([self.seed, 2, chunk_index])
+        df = self._features(rng, n_rows, start_id)
+        probability = 1 / (1 + np.exp(-(self._logit(df) + self._intercept)))
+        df[self.target_column] = (rng.random(n_rows) < probability).astype(np.int64)
+        return df[[name for name, _ in self.columns]].astype(
+            {name: _PANDAS_DTYPES[dtype] for name, dtype in self.columns}
+        )
+
+    def iter_chunks(self, n_rows: int, chunk_rows: int = 500_000):
+        """Yields consecutive chunks that together hold n_rows rows with ids 1..n_rows."""
+        for chunk_index, start in enumerate(range(0, n_rows, chunk_rows)):
+            yield self.generate(min(chunk_rows, n_rows - start), start_id=start + 1, chunk_index=chunk_index)
+
+    def write_csv(self, path: str, n_rows: int, chunk_rows: int = 500_000) -> str:
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            for i, chunk in enumerate(self.iter_chunks(n_rows, chunk_rows)):
+                chunk.to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            os.replace(tmp_path, path)
+            logging.info(f"Wrote {n_rows} synthetic rows to {path}")
+            return path
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_mongo(self, n_rows: int, collection_name: str = None, chunk_rows: int = 100_000, drop: bool = True) -> int:
+        """
+        Inserts n_rows rows into the MongoDB collection that DataIngestion reads (COLLECTION_NAME),
+        e.g. a local mongod started as a stand-in with CONNECTION_URL=mongodb://localhost:27017
+        and MONGODB_TLS=false.
+        """
+        try:
+            from configration.mongo_db_connection import MongoDBConnection
+
+            collection = MongoDBConnection().db[collection_name or os.getenv("COLLECTION_NAME")]
+            if drop:
+                collection.drop()
+            for chunk in self.iter_chunks(n_rows, chunk_rows):
+                collection.insert_many(chunk.to_dict(orient="records"), ordered=False)
+            logging.info(f"Inserted {n_rows} synthetic rows into {collection.full_name}")
+            return n_rows
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate schema.yaml-conformant synthetic vehicle insurance data.")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--positive-ratio", type=float, default=DEFAULT_POSITIVE_RATIO)
+    parser.add_argument("--seed", type=int, default=0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--csv", metavar="PATH", help="write the rows to this CSV file")
+    target.add_argument("--mongo", nargs="?", const="", metavar="COLLECTION",
+                        help="insert the rows into MongoDB (default collection: $COLLECTION_NAME)")
+    args = parser.parse_args()
+    generator = SyntheticDataGenerator(positive_ratio=args.positive_ratio, seed=args.seed)
+    if args.csv:
+        generator.write_csv(args.csv, args.rows)
+    else:
+        generator.load_mongo(args.rows, collection_name=args.mongo or None)